@@ -6,5 +6,19 @@ Contains modules for AI-powered code analysis and modification.
 from .search import SearchService
 from .context_manager import ContextManager
 from .diff_highlighter import DiffHighlighter
+from .semantic import SemanticIndex
+from .ann_index import IVFIndex
+from .chunker import CodeChunker, CodeChunk
+from .cache import LRUCache
+from .walker import WorkspaceWalker
+from .content_store import ContentStore
+from .inverted_index import TermTable, InvertedIndex
+from .trigram_index import TrigramIndex
+from .pager import ResultPager
+from .context_packer import ContextPacker, PackedContext, estimate_tokens
+from .line_diff import diff_opcodes, unified_diff
 
-__all__ = ['SearchService', 'ContextManager', 'DiffHighlighter'] 
\ No newline at end of file
+__all__ = ['SearchService', 'ContextManager', 'DiffHighlighter', 'SemanticIndex', 'IVFIndex',
+           'CodeChunker', 'CodeChunk', 'LRUCache', 'ContentStore',
+           'WorkspaceWalker', 'TermTable', 'InvertedIndex', 'TrigramIndex', 'ResultPager',
+           'ContextPacker', 'PackedContext', 'estimate_tokens', 'diff_opcodes', 'unified_diff'] 
\ No newline at end of file
@@ -35,6 +35,8 @@ class AIModelConfig:
     api_key: Optional[str] = None
     temperature: float = 0.7
     max_tokens: int = 1024
+    # Prompt tokens available for file context
+    context_tokens: int = 8000
 
     def validate(self):
         """Validate the configuration settings."""
@@ -44,6 +46,8 @@ class AIModelConfig:
             raise ConfigurationError("Temperature must be a float between 0 and 1")
         if not isinstance(self.max_tokens, int) or self.max_tokens <= 0:
             raise ConfigurationError("Max tokens must be a positive integer")
+        if not isinstance(self.context_tokens, int) or self.context_tokens <= 0:
+            raise ConfigurationError("Context tokens must be a positive integer")
 
 class AIModelService:
     def __init__(self, config: Optional[AIModelConfig] = None):
@@ -63,7 +67,8 @@ class AIModelService:
                 model_name=os.getenv('AI_MODEL_NAME', 'gemini-pro'),
                 api_key=os.getenv('AI_API_KEY'),
                 temperature=float(os.getenv('AI_TEMPERATURE', '0.7')),
-                max_tokens=int(os.getenv('AI_MAX_TOKENS', '1024'))
+                max_tokens=int(os.getenv('AI_MAX_TOKENS', '1024')),
+                context_tokens=int(os.getenv('AI_CONTEXT_TOKENS', '8000'))
             )
             return config
         except ValueError as e:
@@ -39,7 +39,9 @@ class AIPipeline:
         # 4. Create CodeChange objects with diffs
         self.current_changes = []
         for path, new_content in changes.items():
-            original = self.context_manager.file_contexts[path].content
+            original = self.context_manager.get_context_content(path)
+            if original is None:
+                continue
             diff = self.context_manager.generate_diff(original, new_content)
             change = CodeChange(path, original, new_content, diff)
             self.current_changes.append(change)
@@ -56,11 +58,11 @@ class AIPipeline:
         Generate changes using AI model (GPT-4 or Gemini).
         Returns a dictionary of file paths to their modified content.
         """
-        # Convert FileContext objects to dictionary format expected by AIModelService
-        context_data = [
-            {"path": fc.path, "content": fc.content}
-            for fc in context_files
-        ]
+        # Pack the most relevant snippets into the prompt's token budget
+        packed = self.context_manager.pack_contexts(
+            query, context_files, self.ai_config.context_tokens
+        )
+        context_data = packed.to_prompt_contexts()
         
         # Use AIModelService to generate changes
         async with AIModelService(self.ai_config) as ai_service:
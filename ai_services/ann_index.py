@@ -0,0 +1,221 @@
+"""
+Approximate Nearest Neighbour Index
+Inverted-file (IVF) index over normalized embedding vectors, implemented
+with NumPy. Vectors are clustered with spherical k-means and a query only
+scans the n_probe closest clusters, trading recall for latency.
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+class IVFIndex:
+    # Vectors needed before clustering; below this the index is searched exactly
+    MIN_TRAIN_SIZE = 1024
+    # Retrain once the index has grown this many times past its training size
+    RETRAIN_GROWTH = 4.0
+    # Rows assigned per matrix product during training, to bound memory
+    ASSIGN_BATCH = 8192
+
+    def __init__(self, dim: int, n_lists: Optional[int] = None, n_probe: int = 16,
+                 train_iterations: int = 10, seed: int = 0):
+        """
+        n_lists is the number of clusters (defaults to ~sqrt(size) at training
+        time); n_probe is how many clusters a query scans. Raising n_probe
+        increases recall and latency.
+        """
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iterations = train_iterations
+        self.seed = seed
+
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.keys: List[Optional[str]] = []
+        self.key_to_row: Dict[str, int] = {}
+        self.free_rows: List[int] = []
+        self.assignments = np.zeros(0, dtype=np.int32)
+
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[Set[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+        self.trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self.key_to_row)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key_to_row
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _live_rows(self) -> np.ndarray:
+        return np.fromiter(self.key_to_row.values(), dtype=np.int64, count=len(self.key_to_row))
+
+    def _allocate_rows(self, count: int) -> List[int]:
+        """Reuse freed rows first, then grow the vector storage geometrically."""
+        rows = [self.free_rows.pop() for _ in range(min(count, len(self.free_rows)))]
+        needed = count - len(rows)
+        if needed:
+            start = len(self.keys)
+            if start + needed > len(self.vectors):
+                capacity = max(start + needed, len(self.vectors) * 2, 64)
+                grown = np.zeros((capacity, self.dim), dtype=np.float32)
+                grown[:len(self.vectors)] = self.vectors
+                self.vectors = grown
+                assignments = np.full(capacity, -1, dtype=np.int32)
+                assignments[:len(self.assignments)] = self.assignments
+                self.assignments = assignments
+            rows.extend(range(start, start + needed))
+            self.keys.extend([None] * needed)
+        return rows
+
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        """Assign vectors to their most similar centroid in bounded batches."""
+        result = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), self.ASSIGN_BATCH):
+            batch = vectors[start:start + self.ASSIGN_BATCH]
+            result[start:start + len(batch)] = np.argmax(batch @ self.centroids.T, axis=1)
+        return result
+
+    def _add_to_list(self, row: int, list_id: int):
+        self.assignments[row] = list_id
+        self.lists[list_id].add(row)
+        self._list_arrays.pop(list_id, None)
+
+    def train(self):
+        """Cluster the live vectors with spherical k-means and rebuild the lists."""
+        rows = self._live_rows()
+        if len(rows) == 0:
+            return
+        data = self.vectors[rows]
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(rows))))
+        n_lists = min(n_lists, len(rows))
+
+        rng = np.random.default_rng(self.seed)
+        centroids = data[rng.choice(len(rows), n_lists, replace=False)].copy()
+        self.centroids = centroids
+        for _ in range(self.train_iterations):
+            labels = self._nearest_centroids(data)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty clusters with random points
+            if empty.any():
+                sums[empty] = data[rng.choice(len(rows), int(empty.sum()))]
+                norms[empty] = np.linalg.norm(sums[empty], axis=1, keepdims=True)
+            centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+            self.centroids = centroids
+
+        labels = self._nearest_centroids(data)
+        self.lists = [set() for _ in range(n_lists)]
+        self._list_arrays = {}
+        self.assignments[:] = -1
+        for row, list_id in zip(rows.tolist(), labels.tolist()):
+            self._add_to_list(row, list_id)
+        self.trained_size = len(rows)
+
+    def add(self, keys: List[str], vectors: np.ndarray):
+        """Insert or replace vectors (expected to be L2-normalized) by key."""
+        if not keys:
+            return
+        self.remove([key for key in keys if key in self.key_to_row])
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keys), self.dim)
+
+        rows = self._allocate_rows(len(keys))
+        for key, row in zip(keys, rows):
+            self.keys[row] = key
+            self.key_to_row[key] = row
+        self.vectors[rows] = vectors
+
+        if self.is_trained and len(self) < self.trained_size * self.RETRAIN_GROWTH:
+            for row, list_id in zip(rows, self._nearest_centroids(vectors).tolist()):
+                self._add_to_list(row, list_id)
+        elif len(self) >= self.MIN_TRAIN_SIZE:
+            self.train()
+
+    def remove(self, keys: Iterable[str]):
+        """Delete vectors by key; unknown keys are ignored."""
+        for key in keys:
+            row = self.key_to_row.pop(key, None)
+            if row is None:
+                continue
+            list_id = int(self.assignments[row])
+            if list_id >= 0:
+                self.lists[list_id].discard(row)
+                self._list_arrays.pop(list_id, None)
+                self.assignments[row] = -1
+            self.keys[row] = None
+            self.free_rows.append(row)
+
+    def _list_rows(self, list_id: int) -> np.ndarray:
+        rows = self._list_arrays.get(list_id)
+        if rows is None:
+            rows = np.fromiter(self.lists[list_id], dtype=np.int64, count=len(self.lists[list_id]))
+            self._list_arrays[list_id] = rows
+        return rows
+
+    def search(self, query: np.ndarray, k: int = 10,
+               n_probe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Return up to k (key, similarity) pairs for a normalized query vector.
+        Untrained indexes fall back to exact search.
+        """
+        if not len(self):
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+
+        if self.is_trained:
+            n_probe = min(n_probe or self.n_probe, len(self.centroids))
+            centroid_scores = self.centroids @ query
+            probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+            candidate_rows = [self._list_rows(int(list_id)) for list_id in probe]
+            rows = np.concatenate(candidate_rows) if candidate_rows else np.zeros(0, dtype=np.int64)
+        else:
+            rows = self._live_rows()
+        if len(rows) == 0:
+            return []
+
+        scores = self.vectors[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[rows[i]], float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        """Write the index to a .npz file."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        rows = self._live_rows()
+        np.savez(
+            path,
+            dim=np.int64(self.dim),
+            params=np.array([self.n_lists or 0, self.n_probe, self.train_iterations, self.seed,
+                             self.trained_size], dtype=np.int64),
+            keys=np.array([self.keys[row] for row in rows.tolist()], dtype=str),
+            vectors=self.vectors[rows],
+            assignments=self.assignments[rows],
+            centroids=self.centroids if self.is_trained else np.zeros((0, self.dim), dtype=np.float32)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'IVFIndex':
+        """Read an index written by save()."""
+        with np.load(path) as data:
+            n_lists, n_probe, train_iterations, seed, trained_size = data['params'].tolist()
+            index = cls(int(data['dim']), n_lists or None, n_probe, train_iterations, seed)
+            keys = data['keys'].tolist()
+            rows = index._allocate_rows(len(keys))
+            index.vectors[rows] = data['vectors']
+            for key, row in zip(keys, rows):
+                index.keys[row] = key
+                index.key_to_row[key] = row
+            if len(data['centroids']):
+                index.centroids = data['centroids'].astype(np.float32)
+                index.lists = [set() for _ in range(len(index.centroids))]
+                for row, list_id in zip(rows, data['assignments'].tolist()):
+                    index._add_to_list(row, list_id)
+                index.trained_size = trained_size
+        return index
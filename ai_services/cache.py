@@ -0,0 +1,89 @@
+"""
+LRU Cache
+Small size-bounded least-recently-used cache with hit/miss counters, shared
+by the services that memoize expensive results. Besides an entry count, the
+cache can be bounded by a total weight, such as the bytes held by its values.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class LRUCache:
+    def __init__(self, max_entries: Optional[int] = 128, max_weight: Optional[int] = None,
+                 weigher: Optional[Callable[[Any], int]] = None):
+        """
+        max_entries and max_weight bound the cache (None disables a bound);
+        weigher returns the weight of a value and is required for max_weight.
+        """
+        if max_weight is not None and weigher is None:
+            raise ValueError("max_weight requires a weigher")
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self._entries: OrderedDict = OrderedDict()
+        self._weights: Dict[Hashable, int] = {}
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value and mark it as recently used."""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _over_limit(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.max_weight is not None and self.weight > self.max_weight
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries if full."""
+        if self.weigher is not None:
+            self.weight -= self._weights.get(key, 0)
+            self._weights[key] = self.weigher(value)
+            self.weight += self._weights[key]
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while self._entries and self._over_limit():
+            evicted, _ = self._entries.popitem(last=False)
+            self.weight -= self._weights.pop(evicted, 0)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        self.weight -= self._weights.pop(key, 0)
+        return self._entries.pop(key, default)
+
+    def clear(self):
+        """Drop every entry; counters are kept."""
+        self._entries.clear()
+        self._weights.clear()
+        self.weight = 0
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Return hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hit_rate': self.hits / lookups if lookups else None
+        }
+        if self.weigher is not None:
+            stats['weight'] = self.weight
+            stats['max_weight'] = self.max_weight
+        return stats
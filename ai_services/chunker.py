@@ -0,0 +1,159 @@
+"""
+Code Chunker
+Splits source files into function, class and module level chunks with
+line spans. Python files are split with the ast module; other languages
+fall back to an indentation heuristic.
+"""
+
+import os
+import re
+import ast
+from typing import List, Optional, Tuple
+
+class CodeChunk:
+    def __init__(self, path: str, kind: str, name: Optional[str], start_line: int, end_line: int,
+                 text: str = ''):
+        self.path = path
+        self.kind = kind
+        self.name = name
+        # 1-based, inclusive
+        self.start_line = start_line
+        self.end_line = end_line
+        self.text = text
+
+    def __repr__(self):
+        return f"CodeChunk({self.path}:{self.start_line}-{self.end_line} {self.kind} {self.name})"
+
+class CodeChunker:
+    # Chunks longer than this are split into consecutive pieces
+    MAX_CHUNK_LINES = 120
+    # Heuristic chunks are not closed before reaching this many lines
+    MIN_CHUNK_LINES = 5
+
+    DECLARATION_PATTERN = re.compile(
+        r'^(?:export\s+)?(?:default\s+)?(?:async\s+)?'
+        r'(?:function\*?|class|interface|struct|enum|def|func|fn|module|type)\s+([A-Za-z_$][\w$]*)'
+    )
+    ASSIGNED_FUNCTION_PATTERN = re.compile(
+        r'^(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:function|\()'
+    )
+
+    def chunk(self, path: str, content: str) -> List[CodeChunk]:
+        """
+        Split a file into chunks. Together the chunks cover every non-blank
+        line of the file exactly once.
+        """
+        lines = content.splitlines()
+        if not lines:
+            return []
+
+        spans = None
+        if os.path.splitext(path)[1].lower() == '.py':
+            spans = self._python_spans(content, len(lines))
+        if spans is None:
+            spans = self._heuristic_spans(lines)
+
+        chunks = []
+        for kind, name, start, end in self._split_long(spans):
+            text = '\n'.join(lines[start - 1:end])
+            if text.strip():
+                chunks.append(CodeChunk(path, kind, name, start, end, text))
+        return chunks
+
+    def _fill_gaps(self, spans: List[Tuple[str, Optional[str], int, int]], start: int, end: int,
+                   kind: str, name: Optional[str]) -> List[Tuple[str, Optional[str], int, int]]:
+        """Cover the lines between start and end that no span claims."""
+        filled = []
+        cursor = start
+        for span in sorted(spans, key=lambda s: s[2]):
+            if span[2] > cursor:
+                filled.append((kind, name, cursor, span[2] - 1))
+            filled.append(span)
+            cursor = max(cursor, span[3] + 1)
+        if cursor <= end:
+            filled.append((kind, name, cursor, end))
+        return filled
+
+    def _node_span(self, node: ast.AST) -> Tuple[int, int]:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        return start, node.end_lineno
+
+    def _python_spans(self, content: str, line_count: int) -> Optional[List[Tuple[str, Optional[str], int, int]]]:
+        """Split Python code at top-level definitions, and large classes at their methods."""
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return None
+
+        functions = (ast.FunctionDef, ast.AsyncFunctionDef)
+        spans = []
+        for node in tree.body:
+            if isinstance(node, functions):
+                start, end = self._node_span(node)
+                spans.append(('function', node.name, start, end))
+            elif isinstance(node, ast.ClassDef):
+                start, end = self._node_span(node)
+                if end - start + 1 <= self.MAX_CHUNK_LINES:
+                    spans.append(('class', node.name, start, end))
+                    continue
+                methods = []
+                for child in node.body:
+                    if isinstance(child, functions):
+                        child_start, child_end = self._node_span(child)
+                        methods.append(('method', f'{node.name}.{child.name}', child_start, child_end))
+                spans.extend(self._fill_gaps(methods, start, end, 'class', node.name))
+        return self._fill_gaps(spans, 1, line_count, 'module', None)
+
+    def _declared_name(self, line: str) -> Optional[str]:
+        match = self.DECLARATION_PATTERN.match(line) or self.ASSIGNED_FUNCTION_PATTERN.match(line)
+        return match.group(1) if match else None
+
+    def _heuristic_spans(self, lines: List[str]) -> List[Tuple[str, Optional[str], int, int]]:
+        """
+        Start a new chunk at unindented lines that do not close a block, once
+        the current chunk is long enough or the line opens a declaration.
+        """
+        spans = []
+        start = 1
+        name = self._declared_name(lines[0].strip())
+        for number, line in enumerate(lines[1:], 2):
+            stripped = line.strip()
+            if not stripped or line[0].isspace() or stripped[0] in '}])' or stripped.startswith('</'):
+                continue
+            declared = self._declared_name(line)
+            if declared or number - start >= self.MIN_CHUNK_LINES:
+                spans.append(('block', name, start, number - 1))
+                start = number
+                name = declared
+        spans.append(('block', name, start, len(lines)))
+        return spans
+
+    def signatures(self, path: str, content: str) -> List[Tuple[int, int]]:
+        """
+        Return the 1-based inclusive line spans of every function and class
+        header, nested ones included, for signature-only summaries.
+        """
+        lines = content.splitlines()
+        if os.path.splitext(path)[1].lower() == '.py':
+            try:
+                tree = ast.parse(content)
+            except (SyntaxError, ValueError):
+                tree = None
+            if tree is not None:
+                spans = []
+                for node in ast.walk(tree):
+                    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                        # The header runs up to the line before the body starts
+                        end = max(node.lineno, node.body[0].lineno - 1)
+                        spans.append((node.lineno, min(end, node.lineno + 10)))
+                return sorted(spans)
+        return [
+            (number, number) for number, line in enumerate(lines, 1)
+            if self._declared_name(line.strip())
+        ]
+
+    def _split_long(self, spans: List[Tuple[str, Optional[str], int, int]]):
+        """Cut spans longer than MAX_CHUNK_LINES into consecutive pieces."""
+        for kind, name, start, end in spans:
+            for piece_start in range(start, end + 1, self.MAX_CHUNK_LINES):
+                yield kind, name, piece_start, min(end, piece_start + self.MAX_CHUNK_LINES - 1)
@@ -0,0 +1,129 @@
+"""
+Content Store
+Decoded workspace file contents shared by every service. A file's encoding
+is detected once per version (mtime and size), and the decoded text is
+kept once per content hash in a byte-capped LRU cache, so identical files
+and repeated reads share a single string.
+"""
+
+import os
+import sys
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+from .cache import LRUCache
+from .walker import WorkspaceWalker
+
+def content_hash(content: str) -> str:
+    """Hash decoded file content for change detection and sharing."""
+    return hashlib.sha1(content.encode('utf-8', 'surrogatepass')).hexdigest()
+
+class ContentStore:
+    MAX_BYTES = 32 * 1024 * 1024
+    # Tried in order; latin1 decodes any byte string, so it always ends the search
+    ENCODINGS = ('utf-8', 'latin1')
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        # content hash -> decoded text
+        self.texts = LRUCache(None, max_weight=max_bytes, weigher=sys.getsizeof)
+        # path -> (mtime_ns, size, encoding, content hash); encoding is None for binary files
+        self.versions: Dict[str, Tuple[int, int, Optional[str], str]] = {}
+        # Reads arrive from eel handler threads and file watcher callbacks
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _decode(self, data: bytes, encoding: Optional[str] = None) -> Tuple[Optional[str], str]:
+        """Decode file bytes, translating newlines as text-mode open() does."""
+        if b'\0' in data[:WorkspaceWalker.SNIFF_BYTES]:
+            return None, ''
+        for candidate in ((encoding,) if encoding else self.ENCODINGS):
+            try:
+                text = data.decode(candidate)
+            except UnicodeDecodeError:
+                continue
+            return candidate, text.replace('\r\n', '\n').replace('\r', '\n')
+        return None, ''
+
+    def read(self, path: str, stat: Optional[os.stat_result] = None) -> str:
+        """
+        Return a file's decoded text; binary and unreadable files read as
+        empty. The file is only opened when its version is new or its text
+        has been evicted, and a known version skips encoding detection.
+        """
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return ''
+        with self._lock:
+            version = self.versions.get(path)
+            known_encoding = None
+            if version and version[:2] == (stat.st_mtime_ns, stat.st_size):
+                text = self.texts.get(version[3]) if version[2] else ''
+                if text is not None:
+                    self.hits += 1
+                    return text
+                known_encoding = version[2]
+            self.misses += 1
+
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return ''
+        encoding, text = self._decode(data, known_encoding)
+        if encoding is None and known_encoding is not None:
+            # The file changed without its mtime or size changing
+            encoding, text = self._decode(data)
+
+        with self._lock:
+            digest = content_hash(text) if encoding else ''
+            self.versions[path] = (stat.st_mtime_ns, stat.st_size, encoding, digest)
+            if encoding:
+                # Identical content already cached under this hash is shared
+                shared = self.texts.get(digest)
+                if shared is None:
+                    self.texts.put(digest, text)
+                else:
+                    text = shared
+        return text
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return cached text by content hash, or None if it is not resident."""
+        with self._lock:
+            text = self.texts.get(digest)
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return text
+
+    def forget(self, path: str):
+        """Drop a file's version record; its text stays until evicted."""
+        with self._lock:
+            self.versions.pop(path, None)
+
+    def clear(self):
+        """Drop every cached text and version record; counters are kept."""
+        with self._lock:
+            self.texts.clear()
+            self.versions.clear()
+
+    @property
+    def bytes_resident(self) -> int:
+        return self.texts.weight
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Return hit/miss/eviction counters, bytes resident and the byte cap."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.texts.evictions,
+                'entries': len(self.texts),
+                'files': len(self.versions),
+                'bytes': self.texts.weight,
+                'max_bytes': self.texts.max_weight,
+                'hit_rate': self.hits / lookups if lookups else None
+            }
@@ -3,72 +3,208 @@ Context Manager for AI Services
 Handles file context collection and analysis for AI operations.
 """
 
-import os
-import difflib
-from typing import List, Dict, Tuple, Optional
+import sys
+import time
+import threading
+from typing import Any, List, Dict, Iterator, Tuple, Optional, Callable
 from .search import SearchService
 from .diff_highlighter import DiffHighlighter
+from .line_diff import Opcode, unified_diff, diff_opcodes, grouped_opcodes, diff_stats, format_unified
+from .cache import LRUCache
+from .content_store import content_hash
+from .context_packer import ContextPacker, PackedContext
+
+def _diff_weight(value: Any) -> int:
+    """Bytes held by a rendered diff or by a tuple of rendered (header, html) hunks."""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    return sum(sys.getsizeof(header) + sys.getsizeof(html) for header, html in value)
 
 class FileContext:
-    def __init__(self, path: str, content: str, relevance_score: float = 0.0):
+    __slots__ = ('path', 'content_hash', 'relevance_score')
+
+    def __init__(self, path: str, content_hash: str, relevance_score: float = 0.0):
         self.path = path
-        self.content = content
+        # Hash of the content when collected; the text itself stays in the content store
+        self.content_hash = content_hash
         self.relevance_score = relevance_score
 
 class ContextManager:
-    def __init__(self, workspace_path: str):
+    CONTEXT_CACHE_SIZE = 32
+    # Bytes of rendered diff HTML kept for proposals shown again
+    DIFF_CACHE_BYTES = 16 * 1024 * 1024
+    # Seconds change analysis may run before the least relevant files are dropped
+    ANALYSIS_TIMEOUT = 2.0
+    # Section score above which a file is considered for modification
+    CHANGE_THRESHOLD = 0.5
+    # Best-ranked chunks offered to the packer alongside the files' sections
+    PACKED_CHUNKS = 20
+
+    def __init__(self, workspace_path: str, workers: Optional[int] = None,
+                 progress: Optional[Callable[[int, int], None]] = None, background: bool = False):
+        """
+        Index the workspace, calling progress(done, total) as files are
+        tokenized. With background=True the index is built on a worker
+        thread and queries are answered from the files indexed so far.
+        """
         self.workspace_path = workspace_path
         self.file_contexts: Dict[str, FileContext] = {}
-        self.search_service = SearchService()
+        self.search_service = SearchService(workers=workers)
         self.diff_highlighter = DiffHighlighter()
-        self.search_service.index_workspace(workspace_path)
+        self.context_packer = ContextPacker(self.search_service)
+        # Collected contexts keyed on (index generation, normalized query)
+        self.context_cache = LRUCache(self.CONTEXT_CACHE_SIZE)
+        self._context_generation = 0
+        # Highlighted diffs keyed on (original hash, modified hash, filename)
+        self.diff_cache = LRUCache(None, max_weight=self.DIFF_CACHE_BYTES, weigher=_diff_weight)
+        # Proposed changes awaiting review: path -> (original, modified, grouped opcodes)
+        self.proposals: Dict[str, Tuple[str, str, List[List[Opcode]]]] = {}
+        # (files done, files to index) of the current build
+        self.index_progress = (0, 0)
+        self.index_error: Optional[str] = None
+        self._progress = progress
+        self._index_thread: Optional[threading.Thread] = None
+        if background:
+            self._index_thread = threading.Thread(target=self._build_index, daemon=True)
+            self._index_thread.start()
+        else:
+            self.search_service.index_workspace(workspace_path, progress=self._report_progress)
+    
+    def _report_progress(self, done: int, total: int):
+        self.index_progress = (done, total)
+        if self._progress:
+            self._progress(done, total)
+    
+    def _build_index(self):
+        """Index the workspace on the background thread."""
+        try:
+            self.search_service.index_workspace(self.workspace_path, progress=self._report_progress)
+        except Exception as e:
+            self.index_error = str(e)
+            print(f"Error indexing workspace: {e}")
+    
+    @property
+    def indexing(self) -> bool:
+        """True while a background build runs and queries see a partial index."""
+        return self._index_thread is not None and self._index_thread.is_alive()
+    
+    def cancel(self):
+        """Stop the index build and its progress reports, e.g. when another workspace is opened."""
+        self._progress = None
+        self.search_service.cancel()
+    
+    def wait_until_indexed(self, timeout: Optional[float] = None) -> bool:
+        """Block until the background build finishes; returns False on timeout."""
+        if self._index_thread is not None:
+            self._index_thread.join(timeout)
+        return not self.indexing
+    
+    def index_status(self) -> Dict:
+        """Return build progress as {'indexing', 'done', 'total', 'files', 'error'}."""
+        done, total = self.index_progress
+        return {
+            'indexing': self.indexing,
+            'done': done,
+            'total': total,
+            'files': len(self.search_service.documents),
+            'error': self.index_error
+        }
+    
+    def refresh_index(self, paths: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Bring the search index up to date with the workspace.
+        If the changed paths are known, only those are re-indexed; otherwise
+        the workspace is walked and only modified files are re-tokenized,
+        after any background build has finished.
+        """
+        if paths is not None:
+            return self.search_service.update_paths(paths)
+        self.wait_until_indexed()
+        return self.search_service.index_workspace(self.workspace_path)
     
     def collect_file_contexts(self, query: str) -> List[FileContext]:
         """
         Collect and analyze files that are relevant to the given query.
         Returns a list of FileContext objects sorted by relevance.
         """
+        key = (self.search_service.generation, self.search_service.normalize_query(query))
+        cached = self.context_cache.get(key)
+        if cached is not None:
+            for context in cached:
+                self.file_contexts[context.path] = context
+            return list(cached)
+        
         # Search for relevant files
         relevant_files = self.search_service.search(query)
         
         # Create FileContext objects for each relevant file
         contexts = []
         for file_path, score in relevant_files:
-            abs_path = os.path.join(self.workspace_path, file_path)
-            content = self._read_file(abs_path)
+            # Shares the search service's cached copy instead of reading the file again
+            content = self.search_service.get_content(file_path)
             if content:
-                context = FileContext(file_path, content, score)
+                context = FileContext(file_path, content_hash(content), score)
                 self.file_contexts[file_path] = context
                 contexts.append(context)
         
-        return sorted(contexts, key=lambda x: x.relevance_score, reverse=True)
+        contexts = sorted(contexts, key=lambda x: x.relevance_score, reverse=True)
+        if self._context_generation != self.search_service.generation:
+            self.context_cache.clear()
+            self._context_generation = self.search_service.generation
+        self.context_cache.put(key, tuple(contexts))
+        return contexts
     
-    def analyze_changes_needed(self, query: str) -> List[str]:
+    def pack_contexts(self, query: str, contexts: List[FileContext],
+                      token_budget: int = ContextPacker.DEFAULT_TOKEN_BUDGET) -> PackedContext:
+        """
+        Fit the given contexts into a token budget for the model prompt.
+        The query's best code chunks in those files are offered to the
+        packer with the files' sections. The packed context holds only the
+        snippets that fit; diffs read the full files through the content store.
+        """
+        ranked = [(context.path, context.relevance_score) for context in contexts]
+        paths = {path for path, _ in ranked}
+        chunks = [chunk for chunk in self.search_service.search_chunks(query, self.PACKED_CHUNKS)
+                  if chunk[0] in paths]
+        return self.context_packer.pack(query, ranked, token_budget, chunks)
+    
+    def analyze_sections(self, query: str,
+                         timeout: Optional[float] = ANALYSIS_TIMEOUT) -> Dict[str, List[Tuple[float, int, int]]]:
+        """
+        Score the relevant sections of every file collected for the query.
+        Files are scored in relevance order within timeout seconds; files
+        left when time runs out are omitted. Returns
+        {path: [(score, start_line, end_line)]}.
+        """
+        contexts = self.collect_file_contexts(query)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        return self.search_service.score_sections([context.path for context in contexts], query, deadline)
+    
+    def analyze_changes_needed(self, query: str, timeout: Optional[float] = ANALYSIS_TIMEOUT) -> List[str]:
         """
         Analyze which files need to be modified based on the query.
         Returns a list of file paths that should be modified.
         """
-        files_to_modify = []
-        
-        # Check each file in the context for relevant sections
-        for file_path, context in self.file_contexts.items():
-            sections = self.search_service.get_relevant_sections(
-                os.path.join(self.workspace_path, file_path),
-                query
-            )
-            
+        return [
+            file_path
+            for file_path, sections in self.analyze_sections(query, timeout).items()
             # If any section has high relevance, the file might need modification
-            if sections and any(score > 0.5 for _, score in sections):
-                files_to_modify.append(file_path)
-        
-        return files_to_modify
+            if any(score > self.CHANGE_THRESHOLD for score, _, _ in sections)
+        ]
     
     def generate_diff(self, original: str, modified: str, filename: str = "") -> str:
         """
         Generate a syntax-highlighted diff between original and modified content.
+        Rendered diffs are cached by content, so showing the same proposal
+        again skips diffing and highlighting.
         """
-        # First generate the unified diff
-        diff = difflib.unified_diff(
+        key = (content_hash(original), content_hash(modified), filename)
+        cached = self.diff_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # First generate the unified diff; large files fall back to a bounded-time alignment
+        diff = unified_diff(
             original.splitlines(keepends=True),
             modified.splitlines(keepends=True),
             fromfile='Original',
@@ -77,8 +213,19 @@ class ContextManager:
         )
         diff_text = ''.join(diff)
         
-        # Then apply syntax highlighting
-        return self.diff_highlighter.highlight_diff(diff_text, filename)
+        # Then apply syntax highlighting, tokenizing each version once
+        html = self.diff_highlighter.highlight_diff(diff_text, filename, original, modified)
+        self.diff_cache.put(key, html)
+        return html
+    
+    def get_context_content(self, path: str) -> Optional[str]:
+        """
+        Return the text of a collected file through the shared content
+        store, as it is on disk now, or None if the file was not collected.
+        """
+        if path not in self.file_contexts:
+            return None
+        return self.search_service.get_content(path)
     
     def apply_changes(self, changes: Dict[str, str]) -> Dict[str, str]:
         """
@@ -87,22 +234,66 @@ class ContextManager:
         """
         diffs = {}
         for path, new_content in changes.items():
-            if path in self.file_contexts:
-                original = self.file_contexts[path].content
+            original = self.get_context_content(path)
+            if original is not None:
                 diffs[path] = self.generate_diff(original, new_content, path)
         return diffs
     
+    def propose_changes(self, changes: Dict[str, str]) -> List[Dict]:
+        """
+        Record proposed changes and summarize their diffs without rendering
+        them. Returns {'file_path', 'hunks', 'added', 'removed'} for each
+        changed file; iter_diff_hunks renders the hunks on demand.
+        """
+        self.proposals = {}
+        summaries = []
+        for path, new_content in changes.items():
+            original = self.get_context_content(path)
+            if original is None:
+                continue
+            groups = list(grouped_opcodes(diff_opcodes(original.splitlines(keepends=True),
+                                                       new_content.splitlines(keepends=True))))
+            self.proposals[path] = (original, new_content, groups)
+            hunks, added, removed = diff_stats(groups)
+            summaries.append({'file_path': path, 'hunks': hunks, 'added': added, 'removed': removed})
+        return summaries
+    
+    def iter_diff_hunks(self, path: str) -> Iterator[Dict]:
+        """
+        Yield {'index', 'header', 'html'} for each hunk of a proposed change.
+        Nothing is highlighted until the first hunk is taken; once every
+        hunk has been rendered they are cached by content like whole diffs.
+        """
+        proposal = self.proposals.get(path)
+        if proposal is None:
+            return
+        original, modified, groups = proposal
+        key = (content_hash(original), content_hash(modified), path, 'hunks')
+        cached = self.diff_cache.get(key)
+        if cached is not None:
+            for index, (header, html) in enumerate(cached):
+                yield {'index': index, 'header': header, 'html': html}
+            return
+        
+        diff_text = ''.join(format_unified(original.splitlines(keepends=True),
+                                           modified.splitlines(keepends=True),
+                                           groups, 'Original', 'Modified'))
+        rendered = []
+        for index, (header, html) in enumerate(
+                self.diff_highlighter.iter_hunks(diff_text, path, original, modified)):
+            rendered.append((header, html))
+            yield {'index': index, 'header': header, 'html': html}
+        self.diff_cache.put(key, tuple(rendered))
+    
+    def cache_stats(self) -> Dict[str, Dict]:
+        """Return hit/miss counters for the query, context, content and diff caches."""
+        return {
+            'search': self.search_service.cache_stats(),
+            'contexts': self.context_cache.stats(),
+            'content': self.search_service.content_store.stats(),
+            'diffs': self.diff_cache.stats()
+        }
+    
     def get_diff_css(self) -> str:
         """Get the CSS required for diff highlighting."""
         return self.diff_highlighter.get_css()
-    
-    def _read_file(self, file_path: str) -> Optional[str]:
-        """Read file content with multiple encoding attempts."""
-        encodings = ['utf-8', 'latin1', 'cp1252']
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
-            except (UnicodeDecodeError, IOError):
-                continue
-        return None 
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+Context Packer
+Fits the context sent to the model into a token budget. The most relevant
+sections and code chunks of the top-ranked files are added greedily by value; lower-ranked
+files are summarized by their function and class signatures. Overlapping
+spans are clipped so no line is sent twice, and every file's token cost is
+reported.
+"""
+
+import re
+from bisect import bisect
+from typing import Callable, Dict, List, Optional, Tuple
+from .search import SearchService
+
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate a model token count as the number of words and punctuation
+    marks, which tracks BPE tokenizers closely for source code.
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+class PackedSnippet:
+    __slots__ = ('path', 'kind', 'start_line', 'end_line', 'text', 'value')
+
+    def __init__(self, path: str, kind: str, start_line: int, end_line: int, text: str,
+                 value: float):
+        self.path = path
+        # 'file', 'section', 'chunk' or 'signature'
+        self.kind = kind
+        # 1-based, inclusive
+        self.start_line = start_line
+        self.end_line = end_line
+        self.text = text
+        self.value = value
+
+class PackedContext:
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+        self.snippets: Dict[str, List[PackedSnippet]] = {}
+        # Tokens charged to each file, including its header in the prompt
+        self.file_tokens: Dict[str, int] = {}
+        self.total_tokens = 0
+        # Ranked files that contributed nothing because the budget ran out
+        self.skipped: List[str] = []
+
+    @staticmethod
+    def gap_marker(previous: Optional[PackedSnippet], snippet: PackedSnippet) -> Optional[str]:
+        """Return the marker rendered before a snippet for the lines left out since the previous one."""
+        first_missing = previous.end_line + 1 if previous else 1
+        if snippet.start_line <= first_missing:
+            return None
+        if snippet.kind == 'signature' or (previous and previous.kind == 'signature'):
+            return '...'
+        return f'... lines {first_missing}-{snippet.start_line - 1} omitted ...'
+
+    def render(self, path: str) -> str:
+        """Join a file's snippets in line order, marking the lines left out."""
+        parts = []
+        last = None
+        for snippet in sorted(self.snippets.get(path, []), key=lambda s: s.start_line):
+            marker = self.gap_marker(last, snippet)
+            if marker:
+                parts.append(marker)
+            parts.append(snippet.text)
+            last = snippet
+        return '\n'.join(parts)
+
+    def to_prompt_contexts(self) -> List[Dict[str, str]]:
+        """Return {'path', 'content'} dicts in the format AIModelService expects."""
+        return [{'path': path, 'content': self.render(path)} for path in self.snippets]
+
+    def report(self) -> List[Dict]:
+        """Per-file token usage, largest first."""
+        return [
+            {'path': path, 'tokens': tokens, 'snippets': len(self.snippets[path])}
+            for path, tokens in sorted(self.file_tokens.items(), key=lambda x: x[1], reverse=True)
+        ]
+
+class ContextPacker:
+    DEFAULT_TOKEN_BUDGET = 8000
+    # Files ranked below this only contribute signature summaries
+    DETAILED_FILES = 5
+    # Files at most this many tokens are offered whole instead of as sections
+    SMALL_FILE_TOKENS = 300
+    # Largest share of the budget a single file may take
+    MAX_FILE_SHARE = 0.5
+    # Value of a signature summary relative to a fully relevant section
+    SIGNATURE_WEIGHT = 0.2
+
+    def __init__(self, search_service: SearchService,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        self.search_service = search_service
+        self.count_tokens = count_tokens
+
+    def _marker_tokens(self, previous: Optional[PackedSnippet], snippet: PackedSnippet) -> int:
+        marker = PackedContext.gap_marker(previous, snippet)
+        return self.count_tokens(marker) if marker else 0
+
+    def _insert_cost(self, snippets: List[PackedSnippet], index: int, piece: PackedSnippet,
+                     piece_tokens: int) -> int:
+        """
+        Return the tokens a file's rendering grows by when piece is inserted
+        at index of its line-ordered snippets: the piece, the marker before
+        it, and the change of the marker before the snippet that follows.
+        """
+        previous = snippets[index - 1] if index else None
+        cost = piece_tokens + self._marker_tokens(previous, piece)
+        if index < len(snippets):
+            following = snippets[index]
+            cost += self._marker_tokens(piece, following) - self._marker_tokens(previous, following)
+        return cost
+
+    def _header_tokens(self, path: str) -> int:
+        """Tokens of the per-file wrapper AIModelService puts around the content."""
+        return self.count_tokens(f"File: {path}\n```\n\n```\n\n")
+
+    def _candidates(self, query: str, ranked: List[Tuple[str, float]],
+                    file_lines: Dict[str, List[str]],
+                    chunks: List[Tuple[str, int, int, float]]) -> List[PackedSnippet]:
+        """
+        Build the snippets each ranked file could contribute, valued by
+        relevance. Each file's lines are stored in file_lines.
+        """
+        candidates = []
+        top_score = max((score for _, score in ranked), default=0.0) or 1.0
+        top_chunk_score = max((score for _, _, _, score in chunks), default=0.0) or 1.0
+        file_chunks: Dict[str, List[Tuple[int, int, float]]] = {}
+        for path, start, end, score in chunks:
+            file_chunks.setdefault(path, []).append((start, end, score))
+        for rank, (path, score) in enumerate(ranked):
+            weight = max(score, 0.0) / top_score
+            content = self.search_service.get_content(path)
+            if not content:
+                continue
+            lines = file_lines[path] = content.splitlines()
+
+            if rank < self.DETAILED_FILES:
+                if self.count_tokens(content) <= self.SMALL_FILE_TOKENS:
+                    candidates.append(self._snippet(path, 'file', 1, len(lines), lines, weight))
+                    continue
+                for _, section_score, start, end in self.search_service.get_relevant_sections(path, query):
+                    candidates.append(self._snippet(path, 'section', start, end, lines,
+                                                    weight * section_score))
+                for start, end, chunk_score in file_chunks.get(path, []):
+                    candidates.append(self._snippet(path, 'chunk', start, end, lines,
+                                                    weight * chunk_score / top_chunk_score))
+
+            # Signatures keep file order among themselves, earlier ones first
+            signatures = self.search_service.chunker.signatures(path, content)
+            for i, (start, end) in enumerate(signatures):
+                value = weight * self.SIGNATURE_WEIGHT * (1 - i / (2 * len(signatures)))
+                candidates.append(self._snippet(path, 'signature', start, end, lines, value))
+        return candidates
+
+    def _snippet(self, path: str, kind: str, start: int, end: int, lines: List[str],
+                 value: float) -> PackedSnippet:
+        return PackedSnippet(path, kind, start, end, '\n'.join(lines[start - 1:end]), value)
+
+    @staticmethod
+    def _uncovered(start: int, end: int, covered: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Return the parts of [start, end] not already covered by accepted spans."""
+        pieces = []
+        cursor = start
+        for covered_start, covered_end in sorted(covered):
+            if covered_end < cursor or covered_start > end:
+                continue
+            if covered_start > cursor:
+                pieces.append((cursor, covered_start - 1))
+            cursor = max(cursor, covered_end + 1)
+        if cursor <= end:
+            pieces.append((cursor, end))
+        return pieces
+
+    def pack(self, query: str, ranked: List[Tuple[str, float]],
+             token_budget: int = DEFAULT_TOKEN_BUDGET,
+             chunks: Optional[List[Tuple[str, int, int, float]]] = None) -> PackedContext:
+        """
+        Fill token_budget with the highest-value snippets of the ranked
+        (path, relevance_score) files, best first. Ranked code chunks, as
+        (path, start_line, end_line, relevance_score), are offered alongside
+        the sections of the top files they belong to. A file's cost is the
+        token count of its rendered content plus its prompt header; each
+        snippet is counted once and the cost is updated as snippets are
+        added. If no snippet fits, the best snippet of the top file is sent
+        truncated to the budget. Raises ValueError if not even that fits.
+        """
+        packed = PackedContext(token_budget)
+        file_cap = max(1, int(token_budget * self.MAX_FILE_SHARE))
+        file_lines: Dict[str, List[str]] = {}
+        covered: Dict[str, List[Tuple[int, int]]] = {}
+        # Start lines of each file's packed snippets, which are kept in line order
+        starts: Dict[str, List[int]] = {}
+        candidates = sorted(self._candidates(query, ranked, file_lines, chunks or []),
+                            key=lambda s: s.value, reverse=True)
+
+        for candidate in candidates:
+            path = candidate.path
+            spans = covered.setdefault(path, [])
+            pieces = self._uncovered(candidate.start_line, candidate.end_line, spans)
+            if candidate.kind == 'signature' and pieces != [(candidate.start_line, candidate.end_line)]:
+                # Part of the signature is already shown in a section
+                continue
+
+            for start, end in pieces:
+                piece = self._snippet(path, candidate.kind, start, end, file_lines[path], candidate.value)
+                if not piece.text.strip():
+                    continue
+                snippets = packed.snippets.get(path, [])
+                file_starts = starts.get(path, [])
+                index = bisect(file_starts, start)
+                old_cost = packed.file_tokens.get(path, 0)
+                new_cost = ((old_cost or self._header_tokens(path))
+                            + self._insert_cost(snippets, index, piece, self.count_tokens(piece.text)))
+                if new_cost > file_cap or packed.total_tokens - old_cost + new_cost > token_budget:
+                    continue
+                packed.snippets.setdefault(path, snippets).insert(index, piece)
+                starts.setdefault(path, file_starts).insert(index, start)
+                packed.file_tokens[path] = new_cost
+                packed.total_tokens += new_cost - old_cost
+                spans.append((start, end))
+
+        if not packed.snippets and file_lines:
+            self._pack_truncated(packed, ranked, candidates, file_lines)
+        packed.skipped = [path for path, _ in ranked if path not in packed.snippets]
+        return packed
+
+    def _pack_truncated(self, packed: PackedContext, ranked: List[Tuple[str, float]],
+                        candidates: List[PackedSnippet], file_lines: Dict[str, List[str]]):
+        """Pack the leading lines of the best snippet of the top file that has one."""
+        best = next((candidate for path, _ in ranked for candidate in candidates
+                     if candidate.path == path and candidate.text.strip()), None)
+        if best is None:
+            raise ValueError(f"None of the ranked files has a snippet to fit into "
+                             f"the token budget of {packed.token_budget} tokens")
+        path = best.path
+        lines = file_lines[path]
+        cost = self._header_tokens(path)
+        if best.start_line > 1:
+            cost += self.count_tokens(PackedContext.gap_marker(None, best))
+        end = best.start_line - 1
+        while end < best.end_line and cost + self.count_tokens(lines[end]) <= packed.token_budget:
+            cost += self.count_tokens(lines[end])
+            end += 1
+        if end < best.start_line:
+            raise ValueError(f"Token budget of {packed.token_budget} tokens is too small "
+                             f"for any context from {path}")
+        packed.snippets[path] = [self._snippet(path, best.kind, best.start_line, end, lines, best.value)]
+        packed.file_tokens[path] = cost
+        packed.total_tokens = cost
@@ -3,97 +3,301 @@ Diff Highlighter Module
 Provides syntax highlighting for code diffs using Pygments.
 """
 
+import os
 import re
-from typing import List, Tuple
-from pygments import highlight
-from pygments.lexers import get_lexer_for_filename, TextLexer, DiffLexer
+import bisect
+import itertools
+from html import escape
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from pygments.lexers import get_lexer_for_filename, TextLexer
 from pygments.formatters import HtmlFormatter
+from pygments.token import STANDARD_TYPES
 from pygments.util import ClassNotFound
+from .cache import LRUCache
+
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+# The line boundaries str.splitlines uses, which number the lines of a diff
+LINE_BREAK = re.compile('\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+# Escapes used by pygments' HtmlFormatter
+HTML_ESCAPES = {ord('&'): '&amp;', ord('<'): '&lt;', ord('>'): '&gt;', ord('"'): '&quot;', ord("'"): '&#39;'}
+
+def _token_class(ttype) -> str:
+    """CSS class of a token type: its nearest standard type's class plus the subtype path."""
+    name = STANDARD_TYPES.get(ttype)
+    suffix = ''
+    while name is None:
+        suffix = '-' + ttype[-1] + suffix
+        ttype = ttype.parent
+        name = STANDARD_TYPES.get(ttype)
+    return name + suffix
+
+def _token_classes(ttype) -> str:
+    """CSS classes HtmlFormatter puts on a token: its own and those of its non-standard parents."""
+    classes = _token_class(ttype)
+    while ttype not in STANDARD_TYPES:
+        ttype = ttype.parent
+        classes = _token_class(ttype) + ' ' + classes
+    return classes
+
+class LineStream:
+    """
+    The highlighted HTML of a document's lines, rendered from a single
+    lexer pass only as far as lines are asked for.
+    """
+    def __init__(self, text: str, lexer, classes: Callable[[object], str]):
+        self._lines: List[str] = []
+        self._source = self._render(lexer.get_tokens(text), classes)
+
+    @staticmethod
+    def _merged(tokens, classes) -> Iterator[Tuple[str, str]]:
+        """Yield (css_class, text) with adjacent tokens of the same class joined, as the formatter does."""
+        last_class, values = None, []
+        for ttype, value in tokens:
+            css_class = classes(ttype)
+            if css_class != last_class and values:
+                yield last_class, ''.join(values)
+                values = []
+            last_class = css_class
+            values.append(value)
+        if values:
+            yield last_class, ''.join(values)
+
+    @classmethod
+    def _render(cls, tokens, classes) -> Iterator[str]:
+        parts = []
+        for css_class, value in cls._merged(tokens, classes):
+            for k, piece in enumerate(value.translate(HTML_ESCAPES).split('\n')):
+                if k:
+                    yield ''.join(parts)
+                    parts = []
+                if piece:
+                    parts.append(f'<span class="{css_class}">{piece}</span>' if css_class else piece)
+        if parts:
+            yield ''.join(parts)
+
+    def line(self, index: int) -> Optional[str]:
+        """Return the HTML of a 0-based line, or None past the end of the document."""
+        while len(self._lines) <= index:
+            html = next(self._source, None)
+            if html is None:
+                return None
+            self._lines.append(html)
+        return self._lines[index]
+
+class HunkLines:
+    """
+    The highlighted HTML of the lines a diff shows, indexed in diff order,
+    with each hunk lexed on its own when it is first asked for.
+    """
+    def __init__(self, hunks: List[List[str]], lexer, classes: Callable[[object], str]):
+        self._hunks = hunks
+        self._lexer = lexer
+        self._classes = classes
+        self._starts = list(itertools.accumulate([0] + [len(lines) for lines in hunks]))
+        self._streams: Dict[int, LineStream] = {}
+
+    def line(self, index: int) -> Optional[str]:
+        hunk = bisect.bisect_right(self._starts, index) - 1
+        if hunk >= len(self._hunks):
+            return None
+        stream = self._streams.get(hunk)
+        if stream is None:
+            stream = self._streams[hunk] = LineStream('\n'.join(self._hunks[hunk]) + '\n', self._lexer,
+                                                      self._classes)
+        return stream.line(index - self._starts[hunk])
 
 class DiffHighlighter:
+    LEXER_CACHE_SIZE = 64
+    # Bytes of a file, up to its last line a diff shows, above which only the shown lines are tokenized
+    MAX_LEX_BYTES = 512 * 1024
+    # Pygments classes for diff lines that are not code
+    META_CLASSES = {'---': 'gd', '+++': 'gi'}
+    MARKERS = {'add': '+', 'remove': '-', 'context': ' '}
+    
     def __init__(self):
         self.formatter = HtmlFormatter(style='monokai', cssclass='source')
-        self.diff_lexer = DiffLexer()
+        # Resolved lexers keyed by file name; resolution scans every lexer's patterns
+        self._lexers = LRUCache(self.LEXER_CACHE_SIZE)
+        # Token type -> CSS classes, as the formatter names them
+        self._classes: Dict[object, str] = {}
+        self._css: Optional[str] = None
     
     def _get_lexer_for_file(self, filename: str):
         """Get the appropriate lexer for a given filename."""
-        try:
-            return get_lexer_for_filename(filename)
-        except ClassNotFound:
-            return TextLexer()
+        name = os.path.basename(filename)
+        lexer = self._lexers.get(name)
+        if lexer is None:
+            # Leading and trailing blank lines are kept so line numbers stay aligned
+            try:
+                lexer = get_lexer_for_filename(name, stripnl=False)
+            except ClassNotFound:
+                lexer = TextLexer(stripnl=False)
+            self._lexers.put(name, lexer)
+        return lexer
     
-    def _split_diff_chunks(self, diff_text: str) -> List[Tuple[str, str]]:
-        """Split diff into chunks of (type, content)."""
-        chunks = []
-        current_type = None
-        current_lines = []
-        
-        for line in diff_text.splitlines(True):  # keepends=True
-            if line.startswith('+++') or line.startswith('---'):
-                line_type = 'meta'
-            elif line.startswith('+'):
-                line_type = 'add'
-            elif line.startswith('-'):
-                line_type = 'remove'
-            elif line.startswith('@@'):
-                line_type = 'header'
-            else:
-                line_type = 'context'
+    def _token_classes(self, ttype) -> str:
+        classes = self._classes.get(ttype)
+        if classes is None:
+            classes = self._classes[ttype] = _token_classes(ttype)
+        return classes
+    
+    def _file_lines(self, text: Optional[str], end: int, lexer):
+        """
+        Lex a file up to the end of its 0-based line end. Returns None when
+        that part is too large or binary, so only the shown lines are lexed.
+        """
+        if text is None:
+            return None
+        offset = 0
+        if end:
+            breaks = itertools.islice(LINE_BREAK.finditer(text), end - 1, None)
+            match = next(breaks, None)
+            offset = match.end() if match is not None else len(text)
+        head = text[:offset]
+        if '\0' in head or len(head.encode('utf-8', 'surrogatepass')) > self.MAX_LEX_BYTES:
+            return None
+        # Pygments only splits on newlines; other boundaries would shift the line numbers
+        return LineStream(LINE_BREAK.sub('\n', head), lexer, self._token_classes)
+    
+    def _parse_diff(self, diff_text: str) -> Tuple[List[Tuple[str, str, int]], List[List[str]], List[List[str]]]:
+        """
+        Walk a unified diff using its hunk line counts. Returns rows of
+        (type, text, line) and, per hunk, the old and new lines it shows;
+        for code rows, line is the 0-based line in the file, or -1 elsewhere.
+        """
+        rows = []
+        old_hunks: List[List[str]] = []
+        new_hunks: List[List[str]] = []
+        old_line = new_line = old_left = new_left = 0
+        for line in diff_text.splitlines():
+            marker = line[:1]
+            if old_left or new_left:
+                code = line[1:]
+                if marker == ' ':
+                    rows.append(('context', code, old_line))
+                    old_hunks[-1].append(code)
+                    new_hunks[-1].append(code)
+                    old_line, new_line = old_line + 1, new_line + 1
+                    old_left, new_left = old_left - 1, new_left - 1
+                    continue
+                if marker == '-' and old_left:
+                    rows.append(('remove', code, old_line))
+                    old_hunks[-1].append(code)
+                    old_line, old_left = old_line + 1, old_left - 1
+                    continue
+                if marker == '+' and new_left:
+                    rows.append(('add', code, new_line))
+                    new_hunks[-1].append(code)
+                    new_line, new_left = new_line + 1, new_left - 1
+                    continue
             
-            if line_type != current_type:
-                if current_lines:
-                    chunks.append((current_type, ''.join(current_lines)))
-                current_type = line_type
-                current_lines = [line]
+            match = HUNK_HEADER.match(line)
+            if match:
+                old_count = int(match.group(2) or 1)
+                new_count = int(match.group(4) or 1)
+                # An empty range names the line before it
+                old_line = int(match.group(1)) - (1 if old_count else 0)
+                new_line = int(match.group(3)) - (1 if new_count else 0)
+                old_left, new_left = old_count, new_count
+                old_hunks.append([])
+                new_hunks.append([])
+                rows.append(('header', line, -1))
             else:
-                current_lines.append(line)
-        
-        if current_lines:
-            chunks.append((current_type, ''.join(current_lines)))
-        
-        return chunks
+                rows.append(('meta', line, -1))
+        return rows, old_hunks, new_hunks
     
-    def highlight_diff(self, diff_text: str, filename: str) -> str:
+    def _tokenize(self, diff_text: str, filename: str, original: Optional[str],
+                  modified: Optional[str]):
         """
-        Highlight a diff with syntax highlighting for the code content.
-        Returns HTML with appropriate CSS classes.
+        Parse a diff and prepare the highlighting of both of its sides.
+        Returns the rows and, per side, an object whose line(i) gives the
+        HTML of line i as the rows index it. Each side is lexed once, and
+        only as far as the lines rendered so far.
         """
-        if not diff_text:
-            return ''
-        
         # Get the appropriate lexer for the file type
         code_lexer = self._get_lexer_for_file(filename)
+        rows, old_hunks, new_hunks = self._parse_diff(diff_text)
+        # Lexing runs forward, so each file is tokenized up to the last line shown
+        old_end = max((line + 1 for row_type, _, line in rows if row_type in ('remove', 'context')), default=0)
+        new_end = max((line + 1 for row_type, _, line in rows if row_type == 'add'), default=0)
+        old_lines = self._file_lines(original, old_end, code_lexer)
+        new_lines = self._file_lines(modified, new_end, code_lexer)
+        if old_lines is not None and new_lines is not None:
+            return rows, old_lines, new_lines
         
-        # Split the diff into chunks
-        chunks = self._split_diff_chunks(diff_text)
-        
-        # Process each chunk
+        # Without the files, or for huge or binary ones, each hunk is lexed on its own
+        # so a string opened in one cannot run into the next
+        old_lines = HunkLines(old_hunks, code_lexer, self._token_classes)
+        new_lines = HunkLines(new_hunks, code_lexer, self._token_classes)
+        # Rows index the lines the diff shows
+        old_index = new_index = 0
+        for k, (row_type, text, _) in enumerate(rows):
+            if row_type == 'add':
+                rows[k] = (row_type, text, new_index)
+                new_index += 1
+            elif row_type in ('remove', 'context'):
+                rows[k] = (row_type, text, old_index)
+                old_index += 1
+                new_index += row_type == 'context'
+        return rows, old_lines, new_lines
+    
+    def _render_rows(self, rows: List[Tuple[str, str, int]], old_lines, new_lines) -> str:
+        """Render rows inside a source block, wrapping runs of same-type lines in chunks."""
         highlighted_chunks = []
-        for chunk_type, content in chunks:
-            if chunk_type in ('add', 'remove'):
-                # Remove the first character (+ or -) for syntax highlighting
-                code = ''.join(line[1:] for line in content.splitlines(True))
-                highlighted_code = highlight(code, code_lexer, self.formatter)
-                
-                # Wrap in appropriate div and add back the diff markers
-                chunk_html = f'<div class="diff-chunk diff-{chunk_type}">'
-                for line in highlighted_code.splitlines(True):
-                    if line.strip():  # Skip empty lines
-                        marker = '+' if chunk_type == 'add' else '-'
-                        chunk_html += f'<div class="diff-line">{marker} {line}</div>'
-                chunk_html += '</div>'
-                highlighted_chunks.append(chunk_html)
+        current_type = None
+        for row_type, text, line in rows:
+            if row_type != current_type:
+                if current_type is not None:
+                    highlighted_chunks.append('</div>')
+                highlighted_chunks.append(f'<div class="diff-chunk diff-{row_type}">')
+                current_type = row_type
+            if row_type in self.MARKERS:
+                code = (new_lines if row_type == 'add' else old_lines).line(line)
+                if code is None:
+                    code = escape(text)
+                highlighted_chunks.append(f'<div class="diff-line">{self.MARKERS[row_type]} {code}</div>')
             else:
-                # Highlight meta information with diff lexer
-                highlighted = highlight(content, self.diff_lexer, self.formatter)
+                css_class = 'gu' if row_type == 'header' else self.META_CLASSES.get(text[:3], 'gh')
                 highlighted_chunks.append(
-                    f'<div class="diff-chunk diff-{chunk_type}">{highlighted}</div>'
+                    f'<div class="diff-line"><span class="{css_class}">{escape(text)}</span></div>'
                 )
+        highlighted_chunks.append('</div>')
         
-        return ''.join(highlighted_chunks)
+        return f'<div class="source">{"".join(highlighted_chunks)}</div>'
+    
+    def highlight_diff(self, diff_text: str, filename: str, original: Optional[str] = None,
+                       modified: Optional[str] = None) -> str:
+        """
+        Highlight a diff with syntax highlighting for the code content.
+        Each side is tokenized in one pass over the original or modified
+        file, up to its last line the diff shows, which keeps multi-line
+        strings and comments correct. Without the files, or when they are
+        binary or that part exceeds MAX_LEX_BYTES, each hunk is tokenized
+        on its own. Returns HTML with appropriate CSS classes.
+        """
+        if not diff_text:
+            return ''
+        return self._render_rows(*self._tokenize(diff_text, filename, original, modified))
+    
+    def iter_hunks(self, diff_text: str, filename: str, original: Optional[str] = None,
+                   modified: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Yield (header, html) for each hunk of a diff, without the file
+        header lines. Each hunk is highlighted only when it is taken, and
+        each side's token stream is lexed only as far as that hunk's lines,
+        so the first page does not pay for the whole diff.
+        """
+        if not diff_text:
+            return
+        rows, old_lines, new_lines = self._tokenize(diff_text, filename, original, modified)
+        starts = [k for k, row in enumerate(rows) if row[0] == 'header'] + [len(rows)]
+        for start, end in zip(starts, starts[1:]):
+            yield rows[start][1], self._render_rows(rows[start:end], old_lines, new_lines)
     
     def get_css(self) -> str:
-        """Get the CSS required for the highlighted diff."""
+        """Get the CSS required for the highlighted diff; it is built once."""
+        if self._css is not None:
+            return self._css
         base_css = self.formatter.get_style_defs('.source')
         
         # Add custom CSS for diff display
@@ -108,4 +312,5 @@ class DiffHighlighter:
             .diff-line:hover { background-color: rgba(255, 255, 255, 0.1); }
         """
         
-        return base_css + custom_css 
\ No newline at end of file
+        self._css = base_css + custom_css
+        return self._css
@@ -0,0 +1,102 @@
+"""
+Index Store
+Persists the search index under the workspace so it can be reused across
+process starts. Entries are validated against file fingerprints on load.
+"""
+
+import os
+import json
+import sqlite3
+from typing import Iterable, Iterator, Optional, Tuple
+
+class IndexStore:
+    # Bump whenever the schema or the tokenizer output changes
+    VERSION = 2
+    DIR_NAME = '.nakul'
+    FILE_NAME = 'search_index.sqlite'
+
+    def __init__(self, workspace_path: str):
+        self.directory = os.path.join(workspace_path, self.DIR_NAME)
+        self.path = os.path.join(self.directory, self.FILE_NAME)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database lazily, recreating it if the version is stale."""
+        if self._conn is not None:
+            return self._conn
+
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != str(self.VERSION):
+            conn.execute('DROP TABLE IF EXISTS files')
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                         (str(self.VERSION),))
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                chunks TEXT NOT NULL
+            )
+        ''')
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    def load(self) -> Iterator[Tuple[str, Tuple[float, int, str], list]]:
+        """
+        Yield (path, fingerprint, chunks) for every stored file, where chunks
+        are (kind, name, start_line, end_line, terms) tuples.
+        Yields nothing if the store cannot be opened.
+        """
+        try:
+            rows = self._connect().execute(
+                'SELECT path, mtime, size, hash, chunks FROM files'
+            ).fetchall()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error loading search index: {e}")
+            return
+        for path, mtime, size, content_hash, chunks in rows:
+            yield path, (mtime, size, content_hash), [tuple(chunk) for chunk in json.loads(chunks)]
+
+    def save(self, entries: Iterable[Tuple[str, Tuple[float, int, str], Optional[list]]],
+             removed: Iterable[str] = ()):
+        """
+        Write changed entries and delete removed paths in one transaction.
+        Entries whose chunks are None only have their fingerprint updated.
+        """
+        entries = list(entries)
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany('DELETE FROM files WHERE path = ?', ((p,) for p in removed))
+                conn.executemany(
+                    'INSERT OR REPLACE INTO files (path, mtime, size, hash, chunks) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    ((path, fp[0], fp[1], fp[2], json.dumps(chunks))
+                     for path, fp, chunks in entries if chunks is not None)
+                )
+                conn.executemany(
+                    'UPDATE files SET mtime = ?, size = ?, hash = ? WHERE path = ?',
+                    ((fp[0], fp[1], fp[2], path) for path, fp, chunks in entries if chunks is None)
+                )
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error saving search index: {e}")
+
+    def clear(self):
+        """Remove every stored entry."""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM files')
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error clearing search index: {e}")
+
+    def close(self):
+        """Close the underlying database connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
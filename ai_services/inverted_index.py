@@ -0,0 +1,191 @@
+"""
+Inverted Index
+Compact BM25 index over integer document ids. Terms are interned to ids,
+postings and document lengths live in typed arrays, and deletes are
+tombstoned and compacted in bulk so removing a document is O(1).
+Compaction renumbers the live documents, so callers holding document ids
+remap them with the table it returns.
+"""
+
+import math
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+class TermTable:
+    """Interns term strings to dense integer ids shared between indexes."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.terms: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def intern(self, term: str) -> int:
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            term = sys.intern(term)
+            self.ids[term] = term_id
+            self.terms.append(term)
+        return term_id
+
+    def get(self, term: str) -> Optional[int]:
+        return self.ids.get(term)
+
+    def clear(self):
+        self.ids.clear()
+        self.terms.clear()
+
+class InvertedIndex:
+    # Compact once this fraction of the postings or documents belongs to removed documents
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, term_table: TermTable, k1: float = 1.2, b: float = 0.75):
+        self.term_table = term_table
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def clear(self):
+        # Per term id: document ids and matching term frequencies
+        self.doc_postings: List[Optional[array]] = []
+        self.freq_postings: List[Optional[array]] = []
+        # Per document id: length in terms, and whether it is still live
+        self.lengths = array('I')
+        self.alive = bytearray()
+        self.live_count = 0
+        self.total_length = 0
+        self.total_postings = 0
+        self.dead_postings = 0
+        # Posting count per document, needed to track dead postings
+        self.posting_counts = array('I')
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    def is_alive(self, doc_id: int) -> bool:
+        return doc_id < len(self.alive) and bool(self.alive[doc_id])
+
+    def add(self, terms: Dict[str, int]) -> int:
+        """Add a document given its {term: frequency} counts and return its id."""
+        doc_id = len(self.lengths)
+        length = sum(terms.values())
+        self.lengths.append(length)
+        self.alive.append(1)
+        self.posting_counts.append(len(terms))
+        self.live_count += 1
+        self.total_length += length
+        self.total_postings += len(terms)
+
+        for term, freq in terms.items():
+            term_id = self.term_table.intern(term)
+            if term_id >= len(self.doc_postings):
+                missing = term_id + 1 - len(self.doc_postings)
+                self.doc_postings.extend([None] * missing)
+                self.freq_postings.extend([None] * missing)
+            if self.doc_postings[term_id] is None:
+                self.doc_postings[term_id] = array('I')
+                self.freq_postings[term_id] = array('I')
+            self.doc_postings[term_id].append(doc_id)
+            self.freq_postings[term_id].append(freq)
+        return doc_id
+
+    def remove(self, doc_id: int):
+        """Tombstone a document; it is dropped at the next compaction."""
+        if not self.is_alive(doc_id):
+            return
+        self.alive[doc_id] = 0
+        self.live_count -= 1
+        self.total_length -= self.lengths[doc_id]
+        self.dead_postings += self.posting_counts[doc_id]
+
+    def needs_compaction(self) -> bool:
+        """True once removed documents hold COMPACT_RATIO of the postings or of the document ids."""
+        dead_docs = len(self.lengths) - self.live_count
+        return (self.dead_postings > self.total_postings * self.COMPACT_RATIO
+                or dead_docs > len(self.lengths) * self.COMPACT_RATIO)
+
+    def compact(self) -> np.ndarray:
+        """
+        Drop removed documents, their postings and their per-document
+        entries, renumbering the live documents in order from 0.
+        Returns the new id of every old document id, -1 for removed ones.
+        """
+        alive = np.frombuffer(self.alive, dtype=np.uint8).view(bool)
+        remap = np.full(len(alive), -1, dtype=np.int64)
+        remap[alive] = np.arange(self.live_count)
+        for term_id, docs in enumerate(self.doc_postings):
+            if docs is None:
+                continue
+            doc_ids = np.frombuffer(docs, dtype=np.uint32)
+            keep = alive[doc_ids]
+            freqs = np.frombuffer(self.freq_postings[term_id], dtype=np.uint32)[keep]
+            doc_ids = remap[doc_ids[keep]].astype(np.uint32)
+            if len(doc_ids):
+                self.doc_postings[term_id] = array('I', doc_ids.tobytes())
+                self.freq_postings[term_id] = array('I', freqs.tobytes())
+            else:
+                self.doc_postings[term_id] = None
+                self.freq_postings[term_id] = None
+        self.lengths = array('I', np.frombuffer(self.lengths, dtype=np.uint32)[alive].tobytes())
+        self.posting_counts = array('I', np.frombuffer(self.posting_counts, dtype=np.uint32)[alive].tobytes())
+        self.alive = bytearray(b'\x01') * self.live_count
+        self.total_postings -= self.dead_postings
+        self.dead_postings = 0
+        return remap
+
+    def search(self, query_weights: Dict[str, float], limit: int) -> List[Tuple[int, float]]:
+        """
+        Rank live documents with BM25, weighting each query term's
+        contribution. Only the posting lists of the query terms are read.
+        Returns (doc_id, score) pairs, best first.
+        """
+        if not self.live_count:
+            return []
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        alive = np.frombuffer(self.alive, dtype=np.uint8).view(bool)
+        avg_length = self.total_length / self.live_count or 1.0
+        k1, b = self.k1, self.b
+
+        doc_parts = []
+        score_parts = []
+        for term, query_weight in query_weights.items():
+            term_id = self.term_table.get(term)
+            if term_id is None or term_id >= len(self.doc_postings) or self.doc_postings[term_id] is None:
+                continue
+            docs = np.frombuffer(self.doc_postings[term_id], dtype=np.uint32)
+            freqs = np.frombuffer(self.freq_postings[term_id], dtype=np.uint32)
+            if self.dead_postings:
+                # Skip tombstoned documents so they count towards neither idf nor scores
+                live = alive[docs]
+                docs, freqs = docs[live], freqs[live]
+            doc_freq = len(docs)
+            if not doc_freq:
+                continue
+            freqs = freqs.astype(np.float64)
+            idf = math.log(1 + (self.live_count - doc_freq + 0.5) / (doc_freq + 0.5)) * query_weight
+            norm = k1 * (1 - b + b * lengths[docs] / avg_length)
+            doc_parts.append(docs)
+            score_parts.append(idf * freqs * (k1 + 1) / (freqs + norm))
+        if not doc_parts:
+            return []
+
+        # Sum per-term contributions for each candidate document
+        candidates, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+
+        limit = min(limit, len(candidates))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        # Best score first, ties in indexing order
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the posting and document arrays."""
+        postings = sum(
+            docs.itemsize * len(docs) * 2 for docs in self.doc_postings if docs is not None
+        )
+        return postings + self.lengths.itemsize * len(self.lengths) * 2 + len(self.alive)
@@ -0,0 +1,289 @@
+"""
+Line Diff
+Fast line diffing for proposed changes. Lines are interned to integer ids
+and aligned with the histogram algorithm: each region is split on the
+longest matching run anchored on a low-occurrence line, so repeated lines
+such as braces or JSON punctuation never anchor an alignment on their own.
+Past a size limit, or once the time budget is spent, regions are aligned
+on lines unique to both sides (patience anchors) in O(n log n) instead.
+Output uses difflib.unified_diff's format, but hunks can differ from
+difflib's: both sides are aligned on rare lines rather than on the longest
+matching block, so either may report a few more changed lines than the other.
+"""
+
+import time
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# (tag, i1, i2, j1, j2) as produced by difflib.SequenceMatcher.get_opcodes()
+Opcode = Tuple[str, int, int, int, int]
+
+# Occurrences above which a line is never used to anchor a histogram split
+MAX_CHAIN = 64
+# Combined line count above which only patience anchors are used
+HISTOGRAM_MAX_LINES = 200000
+# Seconds of histogram splitting before the remaining regions use patience anchors
+DIFF_TIMEOUT = 1.0
+# Largest region, in lines times lines, handed to SequenceMatcher when no line can anchor a split
+MATCHER_MAX_CELLS = 250000
+
+def intern_lines(a: Sequence[str], b: Sequence[str]) -> Tuple[List[int], List[int]]:
+    """Map the lines of both sides to integer ids; equal lines share an id."""
+    ids: Dict[str, int] = {}
+    a_ids = [ids.setdefault(line, len(ids)) for line in a]
+    b_ids = [ids.setdefault(line, len(ids)) for line in b]
+    return a_ids, b_ids
+
+def _histogram_split(a: List[int], b: List[int], a0: int, a1: int, b0: int,
+                     b1: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Find the longest matching region anchored on a line of a[a0:a1] that
+    also occurs in b[b0:b1]. Once a region is found, only lines occurring
+    at most as often as its anchor are tried, as in git's histogram diff.
+    Returns (a_start, a_end, b_start, b_end) or None if no line qualifies.
+    """
+    positions: Dict[int, List[int]] = {}
+    for i in range(a0, a1):
+        positions.setdefault(a[i], []).append(i)
+
+    best = None
+    best_count = MAX_CHAIN + 1
+    best_length = 0
+    j = b0
+    while j < b1:
+        candidates = positions.get(b[j])
+        next_j = j + 1
+        if candidates is not None and len(candidates) <= min(best_count, MAX_CHAIN):
+            count = len(candidates)
+            for i in candidates:
+                start_a, start_b = i, j
+                while start_a > a0 and start_b > b0 and a[start_a - 1] == b[start_b - 1]:
+                    start_a -= 1
+                    start_b -= 1
+                end_a, end_b = i + 1, j + 1
+                while end_a < a1 and end_b < b1 and a[end_a] == b[end_b]:
+                    end_a += 1
+                    end_b += 1
+                length = end_a - start_a
+                if length > best_length:
+                    best = (start_a, end_a, start_b, end_b)
+                    best_count, best_length = count, length
+                # Lines inside a matched region cannot anchor a better one
+                next_j = max(next_j, end_b)
+        j = next_j
+    return best
+
+def _patience_anchors(a: List[int], b: List[int], a0: int, a1: int, b0: int,
+                      b1: int) -> List[Tuple[int, int]]:
+    """
+    Return (i, j) pairs of lines unique to both regions that form the
+    longest increasing sequence in both, found by patience sorting.
+    """
+    counts: Dict[int, int] = {}
+    for i in range(a0, a1):
+        counts[a[i]] = counts.get(a[i], 0) + 1
+    unique_a = {a[i]: i for i in range(a0, a1) if counts[a[i]] == 1}
+    b_counts: Dict[int, int] = {}
+    for j in range(b0, b1):
+        b_counts[b[j]] = b_counts.get(b[j], 0) + 1
+    pairs = sorted((unique_a[b[j]], j) for j in range(b0, b1)
+                   if b_counts[b[j]] == 1 and b[j] in unique_a)
+
+    # Longest increasing subsequence of b positions, in a order
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pile = bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[pile] = j
+            tail_index[pile] = k
+        previous[k] = tail_index[pile - 1] if pile else -1
+
+    anchors = []
+    k = tail_index[-1] if tail_index else -1
+    while k != -1:
+        anchors.append(pairs[k])
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+def _patience_opcodes(a: List[int], b: List[int], a0: int, a1: int, b0: int, b1: int,
+                      out: List[Opcode]):
+    """Align a region on its unique lines, growing each anchor over equal neighbours."""
+    i, j = a0, b0
+    for anchor_a, anchor_b in _patience_anchors(a, b, a0, a1, b0, b1) + [(a1, b1)]:
+        if anchor_a < i:
+            # Already covered by the previous anchor's forward extension
+            continue
+        # Extend forward from the last match, then backward from the anchor
+        start_i, start_j = i, j
+        while i < anchor_a and j < anchor_b and a[i] == b[j]:
+            i += 1
+            j += 1
+        if i > start_i:
+            out.append(('equal', start_i, i, start_j, j))
+        end_a, end_b = anchor_a, anchor_b
+        while end_a > i and end_b > j and a[end_a - 1] == b[end_b - 1]:
+            end_a -= 1
+            end_b -= 1
+        _emit_change(i, end_a, j, end_b, out)
+        i, j = end_a, end_b
+        while i < a1 and j < b1 and a[i] == b[j]:
+            i += 1
+            j += 1
+        if i > end_a:
+            out.append(('equal', end_a, i, end_b, j))
+
+def _emit_change(i1: int, i2: int, j1: int, j2: int, out: List[Opcode]):
+    if i1 < i2 and j1 < j2:
+        out.append(('replace', i1, i2, j1, j2))
+    elif i1 < i2:
+        out.append(('delete', i1, i2, j1, j1))
+    elif j1 < j2:
+        out.append(('insert', i1, i1, j1, j2))
+
+def diff_opcodes(a: Sequence[str], b: Sequence[str],
+                 timeout: Optional[float] = DIFF_TIMEOUT) -> List[Opcode]:
+    """
+    Return difflib-style opcodes turning the lines a into b.
+    Regions are split by histogram diff until timeout seconds have passed
+    (None for no limit) or when the inputs exceed HISTOGRAM_MAX_LINES;
+    the rest are aligned on patience anchors.
+    """
+    a_ids, b_ids = intern_lines(a, b)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    use_histogram = len(a) + len(b) <= HISTOGRAM_MAX_LINES
+
+    out: List[Opcode] = []
+    # Regions still to align, and equal runs to emit, in reverse output order
+    stack: List[Opcode] = [('region', 0, len(a), 0, len(b))]
+    while stack:
+        tag, a0, a1, b0, b1 = stack.pop()
+        if tag == 'equal':
+            out.append((tag, a0, a1, b0, b1))
+            continue
+
+        # Common prefix and suffix are matched without searching
+        prefix = 0
+        while a0 + prefix < a1 and b0 + prefix < b1 and a_ids[a0 + prefix] == b_ids[b0 + prefix]:
+            prefix += 1
+        suffix = 0
+        while (a1 - suffix > a0 + prefix and b1 - suffix > b0 + prefix
+               and a_ids[a1 - suffix - 1] == b_ids[b1 - suffix - 1]):
+            suffix += 1
+        if prefix:
+            out.append(('equal', a0, a0 + prefix, b0, b0 + prefix))
+        if suffix:
+            stack.append(('equal', a1 - suffix, a1, b1 - suffix, b1))
+        a0, b0, a1, b1 = a0 + prefix, b0 + prefix, a1 - suffix, b1 - suffix
+        if a0 == a1 or b0 == b1:
+            _emit_change(a0, a1, b0, b1, out)
+            continue
+
+        if use_histogram and (deadline is None or time.monotonic() < deadline):
+            split = _histogram_split(a_ids, b_ids, a0, a1, b0, b1)
+            if split is None and (a1 - a0) * (b1 - b0) <= MATCHER_MAX_CELLS:
+                # Only frequent lines in common: small regions are matched exhaustively
+                matcher = SequenceMatcher(None, a_ids[a0:a1], b_ids[b0:b1], autojunk=False)
+                out.extend((tag, i1 + a0, i2 + a0, j1 + b0, j2 + b0)
+                           for tag, i1, i2, j1, j2 in matcher.get_opcodes())
+            elif split is None:
+                _emit_change(a0, a1, b0, b1, out)
+            else:
+                start_a, end_a, start_b, end_b = split
+                stack.append(('region', end_a, a1, end_b, b1))
+                stack.append(('equal', start_a, end_a, start_b, end_b))
+                stack.append(('region', a0, start_a, b0, start_b))
+            continue
+        _patience_opcodes(a_ids, b_ids, a0, a1, b0, b1, out)
+
+    # Merge adjacent operations of the same kind, as SequenceMatcher does
+    merged: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in out:
+        if merged and (merged[-1][0] == tag or (tag != 'equal' and merged[-1][0] != 'equal')):
+            previous = merged[-1]
+            if tag == 'equal':
+                merged[-1] = (tag, previous[1], i2, previous[3], j2)
+            else:
+                merged.pop()
+                _emit_change(previous[1], i2, previous[3], j2, merged)
+        else:
+            merged.append((tag, i1, i2, j1, j2))
+    return merged
+
+def grouped_opcodes(codes: List[Opcode], n: int = 3) -> Iterator[List[Opcode]]:
+    """Split opcodes into hunks with n lines of context, as SequenceMatcher.get_grouped_opcodes."""
+    if not codes:
+        codes = [('equal', 0, 1, 0, 1)]
+    codes = list(codes)
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        # Start a new hunk at every unchanged run longer than twice the context
+        if tag == 'equal' and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        yield group
+
+def _format_range(start: int, stop: int) -> str:
+    """Format a hunk range in unified diff notation."""
+    length = stop - start
+    if length == 1:
+        return f'{start + 1}'
+    return f'{start + 1 if length else start},{length}'
+
+def diff_stats(groups: List[List[Opcode]]) -> Tuple[int, int, int]:
+    """Return (hunks, lines added, lines removed) for grouped opcodes."""
+    added = removed = 0
+    for group in groups:
+        for tag, i1, i2, j1, j2 in group:
+            if tag in ('replace', 'delete'):
+                removed += i2 - i1
+            if tag in ('replace', 'insert'):
+                added += j2 - j1
+    return len(groups), added, removed
+
+def format_unified(a: Sequence[str], b: Sequence[str], groups: Iterable[List[Opcode]],
+                   fromfile: str = '', tofile: str = '', lineterm: str = '\n') -> Iterator[str]:
+    """Format grouped opcodes as unified diff lines."""
+    started = False
+    for group in groups:
+        if not started:
+            started = True
+            yield f'--- {fromfile}{lineterm}'
+            yield f'+++ {tofile}{lineterm}'
+
+        first, last = group[0], group[-1]
+        yield f'@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@{lineterm}'
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                continue
+            if tag in ('replace', 'delete'):
+                for line in a[i1:i2]:
+                    yield '-' + line
+            if tag in ('replace', 'insert'):
+                for line in b[j1:j2]:
+                    yield '+' + line
+
+def unified_diff(a: Sequence[str], b: Sequence[str], fromfile: str = '', tofile: str = '',
+                 n: int = 3, lineterm: str = '\n',
+                 timeout: Optional[float] = DIFF_TIMEOUT) -> Iterator[str]:
+    """Format diff_opcodes hunks like difflib.unified_diff, with the same arguments."""
+    yield from format_unified(a, b, grouped_opcodes(diff_opcodes(a, b, timeout), n), fromfile, tofile, lineterm)
@@ -0,0 +1,68 @@
+"""
+Result Pager
+Hands results from lazy iterators to the frontend one page at a time.
+Each stream keeps its iterator open between calls so the first page is
+returned as soon as it fills up, or as soon as its time budget runs out.
+Iterators that can spend a long time between results may yield None to
+let the pager check its budget; None is never returned as an item.
+"""
+
+import time
+import itertools
+from typing import Any, Dict, Iterator, Optional
+from .cache import LRUCache
+
+class ResultPager:
+    PAGE_SIZE = 100
+    # Seconds a page may spend waiting for results before it is returned short
+    PAGE_BUDGET = 0.05
+    # Open streams kept, None for no limit; the least recently read one is dropped beyond this
+    MAX_STREAMS = 16
+
+    def __init__(self, page_size: int = PAGE_SIZE, page_budget: float = PAGE_BUDGET,
+                 max_streams: Optional[int] = MAX_STREAMS):
+        self.page_size = page_size
+        self.page_budget = page_budget
+        self._streams = LRUCache(max_streams)
+        self._ids = itertools.count(1)
+
+    def start(self, results: Iterator[Any], page_size: Optional[int] = None) -> Dict[str, Any]:
+        """Register a result iterator and return its first page."""
+        stream_id = next(self._ids)
+        self._streams.put(stream_id, (iter(results), page_size or self.page_size))
+        return self.next_page(stream_id)
+
+    def next_page(self, stream_id: int) -> Dict[str, Any]:
+        """
+        Return the next page of a stream as {'id', 'items', 'done'}.
+        A page may be short, or even empty, when the time budget runs out
+        first; 'done' is only set once the iterator is exhausted.
+        Unknown, finished or evicted streams return an empty, done page.
+        """
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return {'id': stream_id, 'items': [], 'done': True}
+        results, page_size = stream
+
+        items = []
+        deadline = time.monotonic() + self.page_budget
+        done = False
+        while len(items) < page_size:
+            try:
+                item = next(results)
+            except StopIteration:
+                done = True
+                break
+            if item is not None:
+                items.append(item)
+            if time.monotonic() > deadline:
+                break
+        if done:
+            self._streams.pop(stream_id)
+        return {'id': stream_id, 'items': items, 'done': done}
+
+    def cancel(self, stream_id: int):
+        """Close a stream that is no longer wanted."""
+        stream = self._streams.pop(stream_id)
+        if stream is not None and hasattr(stream[0], 'close'):
+            stream[0].close()
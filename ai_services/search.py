@@ -6,12 +6,97 @@ Uses advanced keyword matching and code-aware text analysis.
 
 import os
 import re
-from typing import List, Tuple, Set, Dict
+import sys
+import time
+import threading
+import heapq
+import itertools
+from array import array
+from typing import List, Tuple, Set, Dict, Optional, Callable, Iterator
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from .inverted_index import TermTable, InvertedIndex
+from .index_store import IndexStore
+from .semantic import SemanticIndex
+from .chunker import CodeChunker
+from .cache import LRUCache
+from .walker import WorkspaceWalker
+from .content_store import ContentStore, content_hash as hash_content
+
+# (kind, name, start_line, end_line, {term: frequency}) for one code chunk
+ChunkTerms = Tuple[str, Optional[str], int, int, Dict[str, int]]
 
 class SearchService:
-    def __init__(self):
-        self.file_cache = {}
+    # BM25 tuning parameters
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+
+    # Files per process pool task, and the minimum backlog worth a pool
+    PARALLEL_BATCH_SIZE = 64
+    PARALLEL_MIN_FILES = 256
+    # Lines per scored window in get_relevant_sections, and the minimum score kept
+    SECTION_WINDOW = 5
+    SECTION_THRESHOLD = 0.3
+    # Reciprocal rank fusion constant for hybrid search
+    RRF_K = 60
+    # Bytes of file content kept in memory for sections, chunk text and embeddings
+    CONTENT_CACHE_BYTES = 32 * 1024 * 1024
+    # Chunk kinds produced by CodeChunker, stored by index
+    CHUNK_KINDS = ('module', 'class', 'method', 'function', 'block')
+
+    def __init__(self, persist: bool = True, workers: Optional[int] = None,
+                 semantic: bool = False, embedding_model: str = SemanticIndex.DEFAULT_MODEL,
+                 query_cache_size: int = 256,
+                 max_file_size: Optional[int] = WorkspaceWalker.MAX_FILE_SIZE,
+                 content_cache_bytes: int = CONTENT_CACHE_BYTES,
+                 content_store: Optional[ContentStore] = None):
+        # File and chunk indexes share one table of interned term ids
+        self.terms = TermTable()
+        self.file_index = InvertedIndex(self.terms, self.BM25_K1, self.BM25_B)
+        self.chunk_index = InvertedIndex(self.terms, self.BM25_K1, self.BM25_B)
+        self.chunker = CodeChunker()
+        # path -> (file_doc_id, first_chunk_id, chunk_count); a file's chunks get consecutive ids
+        self.documents: Dict[str, Tuple[int, int, int]] = {}
+        # file_doc_id -> path, None once the document is removed
+        self.doc_paths: List[Optional[str]] = []
+        # Per chunk id: owning file doc id, 1-based inclusive line span, kind and name
+        self.chunk_docs = array('I')
+        self.chunk_starts = array('I')
+        self.chunk_ends = array('I')
+        self.chunk_kinds = array('B')
+        self.chunk_names: List[Optional[str]] = []
+        # File content is read lazily and only the most recently used files stay resident;
+        # the store may be shared with other services reading the same workspace
+        self.content_store = content_store or ContentStore(content_cache_bytes)
+        # Bumped on every index change; cached query results are keyed on it
+        self.generation = 0
+        # Queries may run on other threads while a background index build adds files
+        self._lock = threading.RLock()
+        # Held while embeddings are encoded, which happens outside _lock
+        self._semantic_lock = threading.Lock()
+        # Index generation the embeddings were last synced at
+        self._embedded_generation = -1
+        self.indexing = False
+        # Set by cancel(); builds stop between files once it is set
+        self._cancelled = threading.Event()
+        self.query_cache = LRUCache(query_cache_size)
+        self._cache_generation = 0
+        # Per-file (mtime, size, content_hash) used for incremental indexing
+        self.fingerprints: Dict[str, Tuple[float, int, str]] = {}
+        self.workspace_path = None
+        # On-disk copy of the index, plus the paths that still need writing
+        self.persist = persist
+        self.store = None
+        self._dirty: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._pending_chunks: Dict[str, List[ChunkTerms]] = {}
+        self.workers = workers or os.cpu_count() or 1
+        # Files larger than this are not indexed (None disables the cap)
+        self.max_file_size = max_file_size
+        # Optional embedding index used by the 'semantic' and 'hybrid' modes
+        self.semantic_index = SemanticIndex(embedding_model) if semantic else None
         self.code_extensions = {
             '.py', '.js', '.html', '.css', '.java', '.cpp', '.h',
             '.jsx', '.ts', '.tsx', '.vue', '.php', '.rb', '.go'
@@ -35,16 +120,9 @@ class SearchService:
         """Check if a file should be indexed based on its extension."""
         return os.path.splitext(filename)[1].lower() in self.code_extensions
     
-    def _get_file_content(self, file_path: str) -> str:
-        """Read file content with multiple encoding attempts."""
-        encodings = ['utf-8', 'latin1', 'cp1252']
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
-            except (UnicodeDecodeError, IOError):
-                continue
-        return ''
+    def _get_file_content(self, file_path: str, stat: Optional[os.stat_result] = None) -> str:
+        """Read file content through the content store. Binary files read as empty."""
+        return self.content_store.read(file_path, stat)
     
     def _extract_code_identifiers(self, text: str) -> Set[str]:
         """Extract code identifiers like variable names, function names, etc."""
@@ -108,123 +186,706 @@ class SearchService:
         
         return keywords
     
-    def index_workspace(self, workspace_path: str):
-        """Index all relevant files in the workspace."""
-        self.file_cache.clear()
+    def _tokenize(self, text: str) -> Counter:
+        """
+        Split text into index terms and count their occurrences.
+        Applies the same stop word and length filters as _extract_keywords.
+        """
+        terms = Counter()
+        for word in re.findall(r'\b\w+\b', text.lower()):
+            if word in self.code_terms:
+                terms[word] += 1
+            elif len(word) > 2 and word not in self.stop_words:
+                terms[word] += 1
+        return terms
+    
+    def _tokenize_chunks(self, path: str, content: str) -> List[ChunkTerms]:
+        """
+        Split a file into code chunks and tokenize each one.
+        Returns (kind, name, start_line, end_line, terms) tuples; the file's
+        own term counts are the sum over its chunks.
+        """
+        return [
+            (chunk.kind, chunk.name, chunk.start_line, chunk.end_line, dict(self._tokenize(chunk.text)))
+            for chunk in self.chunker.chunk(path, content)
+        ]
+    
+    def _add_document(self, path: str, content: str):
+        """Tokenize a file and add it to the inverted index."""
+        self._add_chunks(path, self._tokenize_chunks(path, content))
+    
+    def _add_chunks(self, path: str, chunks: List[ChunkTerms]):
+        """Add an already tokenized file and its chunks to the file and chunk indexes."""
+        terms = Counter()
+        for _, _, _, _, chunk_terms in chunks:
+            terms.update(chunk_terms)
+        doc_id = self.file_index.add(terms)
+        self.doc_paths.append(path)
         
-        for root, _, files in os.walk(workspace_path):
-            for file in files:
-                if self._should_index_file(file):
-                    full_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(full_path, workspace_path)
-                    content = self._get_file_content(full_path)
+        first_chunk_id = len(self.chunk_docs)
+        for kind, name, start, end, chunk_terms in chunks:
+            self.chunk_index.add(chunk_terms)
+            self.chunk_docs.append(doc_id)
+            self.chunk_starts.append(start)
+            self.chunk_ends.append(end)
+            self.chunk_kinds.append(self.CHUNK_KINDS.index(kind))
+            self.chunk_names.append(sys.intern(name) if name else None)
+        self.documents[path] = (doc_id, first_chunk_id, len(chunks))
+        self.generation += 1
+    
+    def get_content(self, path: str) -> str:
+        """
+        Return a workspace file's content from the shared content store,
+        reading it from disk only if it changed or was evicted.
+        """
+        return self.content_store.read(os.path.join(self.workspace_path, path))
+    
+    def _remove_document(self, path: str):
+        """Tombstone a file and its chunks in the inverted indexes."""
+        entry = self.documents.pop(path, None)
+        if entry is None:
+            return
+        doc_id, first_chunk_id, chunk_count = entry
+        self.generation += 1
+        self.file_index.remove(doc_id)
+        for chunk_id in range(first_chunk_id, first_chunk_id + chunk_count):
+            self.chunk_index.remove(chunk_id)
+            self.chunk_names[chunk_id] = None
+        self.doc_paths[doc_id] = None
+        if self.workspace_path:
+            self.content_store.forget(os.path.join(self.workspace_path, path))
+        if self.file_index.needs_compaction() or self.chunk_index.needs_compaction():
+            self._compact()
+    
+    def _compact(self):
+        """
+        Compact both indexes together and renumber the per-document and
+        per-chunk arrays, freeing every entry of the removed files.
+        """
+        doc_remap = self.file_index.compact()
+        chunk_remap = self.chunk_index.compact()
+        live = chunk_remap >= 0
+        chunk_docs = doc_remap[np.frombuffer(self.chunk_docs, dtype=np.uint32)[live]]
+        self.chunk_docs = array('I', chunk_docs.astype(np.uint32).tobytes())
+        self.chunk_starts = array('I', np.frombuffer(self.chunk_starts, dtype=np.uint32)[live].tobytes())
+        self.chunk_ends = array('I', np.frombuffer(self.chunk_ends, dtype=np.uint32)[live].tobytes())
+        self.chunk_kinds = array('B', np.frombuffer(self.chunk_kinds, dtype=np.uint8)[live].tobytes())
+        self.chunk_names = [name for name, keep in zip(self.chunk_names, live) if keep]
+        self.doc_paths = [path for path in self.doc_paths if path is not None]
+        self.documents = {
+            path: (int(doc_remap[doc_id]), int(chunk_remap[first_chunk_id]) if chunk_count else 0, chunk_count)
+            for path, (doc_id, first_chunk_id, chunk_count) in self.documents.items()
+        }
+    
+    def _clear_index(self):
+        """Drop every document, chunk and cached file from memory."""
+        self.terms.clear()
+        self.file_index.clear()
+        self.chunk_index.clear()
+        self.documents.clear()
+        self.doc_paths.clear()
+        self.chunk_docs = array('I')
+        self.chunk_starts = array('I')
+        self.chunk_ends = array('I')
+        self.chunk_kinds = array('B')
+        self.chunk_names.clear()
+        self.content_store.clear()
+    
+    def index_stats(self) -> Dict[str, int]:
+        """Return document, chunk and term counts plus approximate index memory in bytes."""
+        chunk_arrays = sum(
+            a.itemsize * len(a)
+            for a in (self.chunk_docs, self.chunk_starts, self.chunk_ends, self.chunk_kinds)
+        )
+        return {
+            'files': len(self.documents),
+            'chunks': len(self.chunk_index),
+            'terms': len(self.terms),
+            'postings_bytes': self.file_index.memory_bytes() + self.chunk_index.memory_bytes(),
+            'chunk_bytes': chunk_arrays,
+            'content_bytes': self.content_store.bytes_resident
+        }
+    
+    def _content_hash(self, content: str) -> str:
+        """Hash decoded file content for change detection."""
+        return hash_content(content)
+    
+    def _is_unchanged(self, rel_path: str, stat: os.stat_result) -> bool:
+        """Check whether a file's mtime and size still match its fingerprint."""
+        fingerprint = self.fingerprints.get(rel_path)
+        return bool(fingerprint) and fingerprint[0] == stat.st_mtime and fingerprint[1] == stat.st_size
+    
+    def _apply_tokens(self, rel_path: str, stat: os.stat_result, content_hash: str,
+                      chunks: List[ChunkTerms]) -> bool:
+        """
+        Merge a freshly tokenized file into the index.
+        Returns True if the file's postings had to be replaced.
+        """
+        fingerprint = self.fingerprints.get(rel_path)
+        self.fingerprints[rel_path] = (stat.st_mtime, stat.st_size, content_hash)
+        self._dirty.add(rel_path)
+        
+        if not content_hash:
+            # Remember empty/unreadable files so they are not re-read every pass
+            self._remove_document(rel_path)
+            self._pending_chunks[rel_path] = []
+            return False
+        
+        if fingerprint and fingerprint[2] == content_hash and rel_path in self.documents:
+            # Touched but not modified, keep the existing postings
+            return False
+        
+        self._remove_document(rel_path)
+        self._add_chunks(rel_path, chunks)
+        if self.store is not None:
+            # Chunk terms are only kept in memory until they are written out
+            self._pending_chunks[rel_path] = chunks
+        return True
+    
+    def _refresh_file(self, full_path: str, rel_path: str, stat: os.stat_result) -> bool:
+        """
+        Re-index a single file if its fingerprint changed.
+        Returns True if the file had to be re-tokenized.
+        """
+        if self._is_unchanged(rel_path, stat):
+            return False
+        
+        content = self._get_file_content(full_path, stat)
+        if not content:
+            return self._apply_tokens(rel_path, stat, '', [])
+        return self._apply_tokens(rel_path, stat, self._content_hash(content),
+                                  self._tokenize_chunks(rel_path, content))
+    
+    def _forget_file(self, rel_path: str):
+        """Drop a file from the index and the fingerprint table."""
+        self._remove_document(rel_path)
+        self.fingerprints.pop(rel_path, None)
+        self._dirty.discard(rel_path)
+        self._pending_chunks.pop(rel_path, None)
+        self._removed.add(rel_path)
+    
+    def _load_store(self):
+        """Populate the in-memory index from the on-disk store."""
+        for rel_path, fingerprint, chunks in self.store.load():
+            self.fingerprints[rel_path] = fingerprint
+            if fingerprint[2]:
+                self._add_chunks(rel_path, chunks)
+    
+    def _flush_store(self):
+        """Write changed and removed files back to the on-disk store."""
+        if self.store is None or not (self._dirty or self._removed):
+            return
+        entries = [
+            (rel_path, self.fingerprints[rel_path], self._pending_chunks.get(rel_path))
+            for rel_path in self._dirty if rel_path in self.fingerprints
+        ]
+        self.store.save(entries, self._removed)
+        self._dirty.clear()
+        self._removed.clear()
+        self._pending_chunks.clear()
+    
+    def _tokenize_serial(self, pending: List[Tuple[str, str, os.stat_result]],
+                         progress: Optional[Callable[[int, int], None]] = None):
+        """Read and tokenize stale files in the current process."""
+        total = len(pending)
+        for done, (rel_path, full_path, stat) in enumerate(pending, 1):
+            if self._cancelled.is_set():
+                return
+            content = self._get_file_content(full_path, stat)
+            if content:
+                yield rel_path, stat, self._content_hash(content), self._tokenize_chunks(rel_path, content)
+            else:
+                yield rel_path, stat, '', []
+            if progress and (done % self.PARALLEL_BATCH_SIZE == 0 or done == total):
+                progress(done, total)
+    
+    def _tokenize_parallel(self, stale: Iterator[Tuple[str, str, os.stat_result]], workers: int,
+                           progress: Optional[Callable[[int, int], None]] = None):
+        """
+        Read and tokenize stale files in batches on a process pool.
+        Batches are submitted while the walk is still producing files; small
+        backlogs are tokenized in-process to avoid the pool start-up cost.
+        File content is not shipped back; it is read lazily when needed.
+        """
+        backlog = list(itertools.islice(stale, self.PARALLEL_MIN_FILES))
+        if len(backlog) < self.PARALLEL_MIN_FILES:
+            yield from self._tokenize_serial(backlog, progress)
+            return
+        
+        stats_by_path = {}
+        merged = set()
+        total = 0
+        done = 0
+        entries = itertools.chain(backlog, stale)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                try:
+                    futures = []
+                    batch = []
+                    for rel_path, full_path, stat in entries:
+                        stats_by_path[rel_path] = stat
+                        batch.append((rel_path, full_path))
+                        if len(batch) == self.PARALLEL_BATCH_SIZE:
+                            futures.append(pool.submit(_tokenize_batch, batch))
+                            batch = []
+                    if batch:
+                        futures.append(pool.submit(_tokenize_batch, batch))
+                    total = len(stats_by_path)
                     
-                    if content:
-                        self.file_cache[rel_path] = {
-                            'content': content,
-                            'keywords': self._extract_keywords(content)
-                        }
+                    for future in as_completed(futures):
+                        if self._cancelled.is_set():
+                            return
+                        batch_results = future.result()
+                        for rel_path, content_hash, chunks in batch_results:
+                            merged.add(rel_path)
+                            yield rel_path, stats_by_path[rel_path], content_hash, chunks
+                        done += len(batch_results)
+                        if progress:
+                            progress(done, total)
+                finally:
+                    if self._cancelled.is_set():
+                        # Queued batches are dropped; only those already running are waited for
+                        pool.shutdown(wait=False, cancel_futures=True)
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Parallel indexing failed, falling back to serial: {e}")
+            remaining = [
+                (rel_path, os.path.join(self.workspace_path, rel_path), stat)
+                for rel_path, stat in stats_by_path.items() if rel_path not in merged
+            ]
+            # Finish the walk too; files it never reached would count as deleted
+            remaining.extend(entries)
+            yield from self._tokenize_serial(remaining, progress)
     
-    def _calculate_relevance_score(self, query_keywords: Dict[str, float], 
-                                 file_keywords: Dict[str, float]) -> float:
+    def _walk_stale(self, workspace_path: str, seen: Set[str], stats: Dict[str, int]):
         """
-        Calculate a weighted relevance score between query and file keywords.
-        Uses both keyword presence and importance weights.
+        Walk the workspace and yield (rel_path, full_path, stat) for every
+        indexable file whose fingerprint is stale.
         """
-        if not query_keywords or not file_keywords:
-            return 0.0
+        # Binary files are rejected when read, so unchanged files cost only a stat
+        walker = WorkspaceWalker(workspace_path, max_file_size=self.max_file_size,
+                                 skip_binary=False, file_filter=self._should_index_file)
+        for entry in walker.walk():
+            if self._cancelled.is_set():
+                return
+            seen.add(entry.rel_path)
+            if self._is_unchanged(entry.rel_path, entry.stat):
+                stats['unchanged'] += 1
+            else:
+                yield entry.rel_path, entry.path, entry.stat
+    
+    def index_workspace(self, workspace_path: str, incremental: bool = True,
+                        workers: Optional[int] = None,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """
+        Index all relevant files in the workspace.
+        In incremental mode only added or changed files are re-tokenized and
+        deleted files are dropped; otherwise the index is rebuilt from scratch.
+        Stale files are tokenized on a process pool of `workers` processes
+        (defaults to the service setting) and progress(done, total) is called
+        as batches are merged. Queries on other threads see the files indexed
+        so far, and `indexing` is set until the build finishes. cancel()
+        stops the build between files.
+        Returns counts of {'indexed', 'unchanged', 'removed'} files.
+        """
+        workspace_path = os.path.abspath(workspace_path)
+        self.indexing = True
+        try:
+            with self._lock:
+                self._prepare_workspace(workspace_path, incremental)
+            return self._index_stale(workspace_path, workers, progress)
+        finally:
+            self.indexing = False
+    
+    def _prepare_workspace(self, workspace_path: str, incremental: bool):
+        """Reset the index and its store when switching workspace or rebuilding."""
+        if not incremental or workspace_path != self.workspace_path:
+            self._clear_index()
+            self.fingerprints.clear()
+            self._dirty.clear()
+            self._removed.clear()
+            self._pending_chunks.clear()
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+            if self.semantic_index is not None:
+                self.semantic_index.clear()
+                self._embedded_generation = -1
+            if self.persist:
+                self.store = IndexStore(workspace_path)
+                if incremental:
+                    # Stored entries are validated by the stat walk below
+                    self._load_store()
+                    if self.semantic_index is not None:
+                        self.semantic_index.load(self.store.directory)
+                else:
+                    self.store.clear()
+        self.workspace_path = workspace_path
+    
+    def _index_stale(self, workspace_path: str, workers: Optional[int],
+                     progress: Optional[Callable[[int, int], None]]) -> Dict[str, int]:
+        """
+        Tokenize new and changed files and drop deleted ones. Files are
+        added one at a time under the lock, so queries see a partial index.
+        """
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        seen = set()
+        stale = self._walk_stale(workspace_path, seen, stats)
+        workers = self.workers if workers is None else workers
+        if workers > 1:
+            results = self._tokenize_parallel(stale, workers, progress)
+        else:
+            results = self._tokenize_serial(list(stale), progress)
         
-        score = 0.0
-        total_weight = 0.0
+        for rel_path, stat, content_hash, chunks in results:
+            if self._cancelled.is_set():
+                break
+            with self._lock:
+                applied = self._apply_tokens(rel_path, stat, content_hash, chunks)
+            if applied:
+                stats['indexed'] += 1
+            else:
+                stats['unchanged'] += 1
         
-        # Calculate weighted score for matching keywords
-        for word, query_weight in query_keywords.items():
-            if word in file_keywords:
-                # Combine weights from query and file
-                combined_weight = (query_weight + file_keywords[word]) / 2
-                score += combined_weight
-            total_weight += query_weight
+        with self._lock:
+            if self._cancelled.is_set():
+                # The walk is incomplete, so files it did not reach are not deleted
+                self._flush_store()
+                return stats
+            for rel_path in set(self.fingerprints) - seen:
+                self._forget_file(rel_path)
+                stats['removed'] += 1
+            self._flush_store()
+        return stats
+    
+    def cancel(self):
+        """Stop a running build for good, for example when another workspace is opened."""
+        self._cancelled.set()
+    
+    def update_paths(self, paths: List[str]) -> Dict[str, int]:
+        """
+        Re-index only the given paths without walking the workspace.
+        Paths may be absolute or relative to the workspace. A folder path
+        re-indexes the files below it; files and folders that no longer
+        exist are dropped from the index.
+        Returns counts of {'indexed', 'unchanged', 'removed'} files.
+        """
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        if not self.workspace_path:
+            return stats
+        
+        with self._lock:
+            walker = WorkspaceWalker(self.workspace_path, max_file_size=self.max_file_size,
+                                     skip_binary=False, file_filter=self._should_index_file)
+            for path in paths:
+                full_path = os.path.abspath(os.path.join(self.workspace_path, path))
+                # Indexed paths use '/' like the walker's
+                rel_path = os.path.relpath(full_path, self.workspace_path).replace(os.sep, '/')
+                if rel_path.startswith(os.pardir) or rel_path == os.curdir:
+                    continue
+                if os.path.isdir(full_path):
+                    seen = set()
+                    if not walker.is_ignored(rel_path, True):
+                        for entry in walker.walk(rel_path):
+                            seen.add(entry.rel_path)
+                            self._update_path(walker, entry.path, entry.rel_path, stats)
+                    self._forget_below(rel_path, seen, stats)
+                elif os.path.exists(full_path):
+                    self._update_path(walker, full_path, rel_path, stats)
+                else:
+                    # A deleted file, or a deleted or renamed folder
+                    self._update_path(walker, full_path, rel_path, stats)
+                    self._forget_below(rel_path, set(), stats)
+            
+            self._flush_store()
+        return stats
+    
+    def _update_path(self, walker: WorkspaceWalker, full_path: str, rel_path: str, stats: Dict[str, int]):
+        """Re-index one file, or drop it if it is gone, ignored or too large."""
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            stat = None
         
-        # Normalize score
-        if total_weight > 0:
-            score = score / total_weight
+        if (stat is None or not self._should_index_file(full_path)
+                or walker.is_ignored(rel_path, False)
+                or (self.max_file_size is not None and stat.st_size > self.max_file_size)):
+            if rel_path in self.fingerprints or rel_path in self.documents:
+                self._forget_file(rel_path)
+                stats['removed'] += 1
+            return
         
-        return score
+        if self._refresh_file(full_path, rel_path, stat):
+            stats['indexed'] += 1
+        else:
+            stats['unchanged'] += 1
     
-    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+    def _forget_below(self, rel_dir: str, keep: Set[str], stats: Dict[str, int]):
+        """Drop indexed files under a folder that are not in keep."""
+        prefix = rel_dir.rstrip('/') + '/'
+        for rel_path in [path for path in self.fingerprints if path.startswith(prefix) and path not in keep]:
+            self._forget_file(rel_path)
+            stats['removed'] += 1
+    
+    def _keyword_search(self, query: str, limit: int) -> List[Tuple[str, float]]:
         """
-        Search for relevant files based on weighted keyword matching.
-        Returns a list of (file_path, relevance_score) tuples.
+        Rank files with BM25 over the inverted index.
+        Only the posting lists of the query terms are visited.
         """
         query_keywords = self._extract_keywords(query)
         if not query_keywords:
             return []
+        return [(self.doc_paths[doc_id], score)
+                for doc_id, score in self.file_index.search(query_keywords, limit)]
+    
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize case and whitespace so equivalent queries share cache entries."""
+        return ' '.join(query.lower().split())
+    
+    def _cache_results(self, key: tuple, results: list):
+        """Cache query results, dropping entries from older index generations."""
+        if self._cache_generation != self.generation:
+            self.query_cache.clear()
+            self._cache_generation = self.generation
+        self.query_cache.put(key, tuple(results))
+    
+    def cache_stats(self) -> Dict[str, Optional[float]]:
+        """Return query cache hit/miss counters and the current index generation."""
+        stats = self.query_cache.stats()
+        stats['generation'] = self.generation
+        return stats
+    
+    def search_chunks(self, query: str, limit: int = 10) -> List[Tuple[str, int, int, float]]:
+        """
+        Rank individual function/class/module chunks with BM25.
+        Returns (file_path, start_line, end_line, relevance_score) tuples with
+        1-based inclusive line numbers.
+        """
+        with self._lock:
+            key = (self.generation, 'chunks', self.normalize_query(query), limit)
+            results = self.query_cache.get(key)
+            if results is None:
+                results = self._chunk_search(query, limit)
+                self._cache_results(key, results)
+        return list(results)
+    
+    def _chunk_search(self, query: str, limit: int) -> List[Tuple[str, int, int, float]]:
+        """Rank chunks with BM25 over the chunk postings."""
+        query_keywords = self._extract_keywords(query)
+        if not query_keywords:
+            return []
+        return [
+            (self.doc_paths[self.chunk_docs[chunk_id]], self.chunk_starts[chunk_id],
+             self.chunk_ends[chunk_id], score)
+            for chunk_id, score in self.chunk_index.search(query_keywords, limit)
+        ]
+    
+    def _sync_embeddings(self):
+        """
+        Embed files changed since the last sync. The files are snapshotted
+        under the lock but encoded outside it, so the indexer and other
+        queries are not blocked while the model runs.
+        """
+        with self._semantic_lock:
+            with self._lock:
+                if self._embedded_generation == self.generation:
+                    return
+                generation = self.generation
+                file_hashes = {path: fp[2] for path, fp in self.fingerprints.items() if fp[2]}
+            plan = self.semantic_index.prepare(file_hashes, self.get_content)
+            with self._lock:
+                if plan.version != self.semantic_index.version:
+                    # The workspace was switched or rebuilt while encoding
+                    return
+                if self.semantic_index.apply(plan) and self.store is not None:
+                    self.semantic_index.save(self.store.directory)
+                self._embedded_generation = generation
+    
+    def _semantic_search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """Rank files by embedding similarity, as of the last embedding sync."""
+        return self.semantic_index.search(query, limit)
+    
+    def search(self, query: str, limit: int = 10, mode: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Search for relevant files.
+        mode is 'keyword' (BM25), 'semantic' (embeddings) or 'hybrid', which
+        fuses both rankings by reciprocal rank. Defaults to 'hybrid' when
+        semantic search is enabled and 'keyword' otherwise.
+        Returns a list of (file_path, relevance_score) tuples.
+        """
+        if mode is None:
+            mode = 'hybrid' if self.semantic_index is not None else 'keyword'
+        if mode not in ('keyword', 'semantic', 'hybrid'):
+            raise ValueError(f"Unknown search mode: {mode}")
+        if mode != 'keyword' and self.semantic_index is None:
+            raise ValueError("Semantic search is not enabled for this SearchService")
+        
+        if mode != 'keyword':
+            self._sync_embeddings()
+        with self._lock:
+            key = (self.generation, mode, self.normalize_query(query), limit)
+            results = self.query_cache.get(key)
+            if results is None:
+                results = self._run_search(query, limit, mode)
+                # Files changed during the sync are embedded by the next query, not cached as current
+                if mode == 'keyword' or self._embedded_generation == self.generation:
+                    self._cache_results(key, results)
+        return list(results)
+    
+    def _run_search(self, query: str, limit: int, mode: str) -> List[Tuple[str, float]]:
+        """Run an uncached search in the given mode."""
+        if mode == 'keyword':
+            return self._keyword_search(query, limit)
+        if mode == 'semantic':
+            return self._semantic_search(query, limit)
         
-        results = []
-        for path, data in self.file_cache.items():
-            score = self._calculate_relevance_score(query_keywords, data['keywords'])
-            if score > 0:
-                results.append((path, score))
+        fused: Dict[str, float] = {}
+        for ranking in (self._keyword_search(query, limit * 2), self._semantic_search(query, limit * 2)):
+            for rank, (path, _) in enumerate(ranking):
+                fused[path] = fused.get(path, 0.0) + 1.0 / (self.RRF_K + rank + 1)
+        return heapq.nlargest(limit, fused.items(), key=lambda x: x[1])
+    
+    def _query_pattern(self, query_keywords: Dict[str, float]) -> Optional[re.Pattern]:
+        """Compile one case-insensitive pattern matching any query term as a whole word."""
+        terms = [term for term in query_keywords if re.fullmatch(r'\w+', term)]
+        if not terms:
+            return None
+        # Longest first so a term is never shadowed by one of its prefixes
+        terms.sort(key=len, reverse=True)
+        return re.compile(r'\b(?:' + '|'.join(map(re.escape, terms)) + r')\b', re.IGNORECASE)
+    
+    def _score_windows(self, lines: List[str], query_keywords: Dict[str, float],
+                       pattern: Optional[re.Pattern] = None) -> np.ndarray:
+        """
+        Score the window of SECTION_WINDOW lines centred on every line.
+        Query terms are found with a single regex scan of the whole text and
+        per-term window counts come from prefix sums, so the whole file is
+        scored in O(text + lines x query terms).
+        """
+        terms = list(query_keywords)
+        term_index = {term: i for i, term in enumerate(terms)}
+        if pattern is None:
+            pattern = self._query_pattern(query_keywords)
         
-        # Sort by score and return top matches
-        return sorted(results, key=lambda x: x[1], reverse=True)[:limit]
+        # hits[i, t] is the number of times query term t occurs on line i
+        hits = np.zeros((len(lines) + 1, len(terms)), dtype=np.int32)
+        if pattern is not None:
+            text = '\n'.join(lines)
+            line_ends = np.cumsum([len(line) + 1 for line in lines])
+            starts, term_ids = [], []
+            for match in pattern.finditer(text):
+                t = term_index.get(match.group().lower())
+                if t is not None:
+                    starts.append(match.start())
+                    term_ids.append(t)
+            if starts:
+                rows = np.searchsorted(line_ends, starts, side='right') + 1
+                np.add.at(hits, (rows, term_ids), 1)
+        prefix = np.cumsum(hits, axis=0)
+        
+        half = self.SECTION_WINDOW // 2
+        rows = np.arange(len(lines))
+        window_start = np.maximum(rows - half, 0)
+        window_end = np.minimum(rows + half + 1, len(lines))
+        present = (prefix[window_end] - prefix[window_start]) > 0
+        
+        # Matched words in a window count as identifiers, as in _extract_keywords
+        query_weights = np.array([query_keywords[term] for term in terms])
+        term_scores = (query_weights + 1.5) / 2 / query_weights.sum()
+        return present @ term_scores
     
-    def get_relevant_sections(self, file_path: str, query: str, context_lines: int = 3) -> List[Tuple[str, float]]:
+    def get_relevant_sections(self, file_path: str, query: str,
+                              context_lines: int = 3) -> List[Tuple[str, float, int, int]]:
         """
         Find relevant sections within a file based on weighted keyword matching.
-        Returns a list of (section_text, relevance_score) tuples.
+        Overlapping windows are merged by line interval, keeping the best score.
+        Returns a list of (section_text, relevance_score, start_line, end_line)
+        tuples sorted by score, with 1-based inclusive line numbers.
         """
-        if file_path not in self.file_cache:
+        if file_path not in self.documents:
             return []
-        
-        content = self.file_cache[file_path]['content']
         query_keywords = self._extract_keywords(query)
-        
         if not query_keywords:
             return []
+        return self._relevant_sections(file_path, query_keywords, self._query_pattern(query_keywords),
+                                       context_lines)
+    
+    def _relevant_sections(self, file_path: str, query_keywords: Dict[str, float],
+                           pattern: Optional[re.Pattern],
+                           context_lines: int = 3) -> List[Tuple[str, float, int, int]]:
+        content = self.get_content(file_path)
+        if not content:
+            return []
         
-        # Split content into lines and analyze each section
         lines = content.splitlines()
-        sections = []
-        
-        # Use a sliding window to analyze sections
-        window_size = 5  # Analyze 5 lines at a time
-        for i in range(len(lines)):
-            # Get the window of lines
-            window_start = max(0, i - window_size // 2)
-            window_end = min(len(lines), i + window_size // 2 + 1)
-            window_text = '\n'.join(lines[window_start:window_end])
-            
-            # Extract keywords from the window
-            window_keywords = self._extract_keywords(window_text)
-            
-            # Calculate relevance score
-            score = self._calculate_relevance_score(query_keywords, window_keywords)
-            
-            if score > 0.3:  # Only keep sections with good relevance
-                # Get context lines
-                context_start = max(0, window_start - context_lines)
-                context_end = min(len(lines), window_end + context_lines)
-                section = '\n'.join(lines[context_start:context_end])
-                
-                sections.append((section, score))
-        
-        # Merge overlapping sections with similar scores
-        merged_sections = []
-        sections.sort(key=lambda x: x[1], reverse=True)
-        
-        for section, score in sections:
-            # Check if this section overlaps with any existing merged section
-            overlap = False
-            for i, (merged_section, merged_score) in enumerate(merged_sections):
-                if section in merged_section or merged_section in section:
-                    # Take the longer section with the higher score
-                    if len(section) > len(merged_section) and score >= merged_score:
-                        merged_sections[i] = (section, score)
-                    overlap = True
-                    break
-            
-            if not overlap:
-                merged_sections.append((section, score))
+        if not lines:
+            return []
+        scores = self._score_windows(lines, query_keywords, pattern)
+        
+        # Expand every relevant window by the context lines, then merge the
+        # resulting intervals in a single pass over the (already sorted) lines
+        half = self.SECTION_WINDOW // 2
+        merged = []
+        for i in np.flatnonzero(scores > self.SECTION_THRESHOLD):
+            start = max(0, int(i) - half - context_lines)
+            end = min(len(lines), int(i) + half + 1 + context_lines)
+            score = float(scores[i])
+            if merged and start < merged[-1][1]:
+                last_start, last_end, last_score = merged[-1]
+                merged[-1] = (last_start, max(last_end, end), max(last_score, score))
+            else:
+                merged.append((start, end, score))
         
-        return merged_sections 
\ No newline at end of file
+        sections = [
+            ('\n'.join(lines[start:end]), score, start + 1, end)
+            for start, end, score in merged
+        ]
+        return sorted(sections, key=lambda x: x[1], reverse=True)
+    
+    def score_sections(self, file_paths: List[str], query: str, deadline: Optional[float] = None,
+                       context_lines: int = 3) -> Dict[str, List[Tuple[float, int, int]]]:
+        """
+        Score the relevant sections of several indexed files in one pass.
+        The query is parsed and compiled once for the whole batch. Files are
+        scored in the given order until time.monotonic() passes deadline;
+        the rest are left out, but at least one file is always scored.
+        Returns {path: [(score, start_line, end_line)]} with each file's
+        sections sorted by score; unindexed paths are skipped.
+        """
+        results: Dict[str, List[Tuple[float, int, int]]] = {}
+        query_keywords = self._extract_keywords(query)
+        if not query_keywords:
+            return results
+        pattern = self._query_pattern(query_keywords)
+        
+        for file_path in file_paths:
+            if deadline is not None and results and time.monotonic() > deadline:
+                break
+            if file_path not in self.documents:
+                continue
+            results[file_path] = [
+                (score, start, end)
+                for _, score, start, end in self._relevant_sections(file_path, query_keywords, pattern,
+                                                                     context_lines)
+            ]
+        return results
+
+# Per-process tokenizer used by the indexing pool
+_worker_service = None
+
+def _tokenize_batch(batch: List[Tuple[str, str]]) -> List[Tuple[str, str, List[ChunkTerms]]]:
+    """Read and tokenize a batch of (rel_path, full_path) pairs in a pool worker."""
+    global _worker_service
+    if _worker_service is None:
+        # Content is not shipped back, so the worker keeps none resident
+        _worker_service = SearchService(persist=False, workers=1, content_cache_bytes=0)
+    
+    results = []
+    for rel_path, full_path in batch:
+        content = _worker_service._get_file_content(full_path)
+        if content:
+            results.append((rel_path, _worker_service._content_hash(content),
+                            _worker_service._tokenize_chunks(rel_path, content)))
+        else:
+            results.append((rel_path, '', []))
+    return results
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+Semantic Index
+Embedding-based retrieval over code chunks using sentence-transformers.
+Chunk vectors live in one contiguous float32 matrix and are cached by
+content hash, so unchanged chunks are never re-encoded. Large chunk sets
+are served from an approximate IVF index instead of exact search.
+"""
+
+import os
+import hashlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+import numpy as np
+from .ann_index import IVFIndex
+from .chunker import CodeChunker
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+class SyncPlan(NamedTuple):
+    """Changes computed by SemanticIndex.prepare, applied by SemanticIndex.apply."""
+    version: int
+    removed: Set[str]
+    # path -> (content hash, chunks)
+    changed: Dict[str, Tuple[str, List[Tuple[str, int, int, str]]]]
+    # chunk hash -> normalized embedding of the chunks that had none
+    embeddings: Dict[str, np.ndarray]
+
+class SemanticIndex:
+    DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+    # Chunks per encoder call
+    BATCH_SIZE = 64
+    # Chunk count at which exact search is replaced by the IVF index
+    ANN_THRESHOLD = 50000
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, ann_threshold: Optional[int] = ANN_THRESHOLD,
+                 n_lists: Optional[int] = None, n_probe: int = 16):
+        """
+        ann_threshold is the chunk count that switches to approximate search
+        (None disables it); n_lists and n_probe tune the IVF index.
+        """
+        if SentenceTransformer is None:
+            raise ImportError("Semantic search requires the 'sentence-transformers' package")
+        self.model_name = model_name
+        self._model = None
+        self.chunker = CodeChunker()
+        self.ann_threshold = ann_threshold
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.version = 0
+        self.clear()
+
+    def clear(self):
+        """Forget every file, chunk and cached embedding."""
+        # Bumped on every clear, so plans prepared before it are not applied after
+        self.version += 1
+        # path -> content hash the chunks were built from
+        self.file_hashes: Dict[str, str] = {}
+        # path -> [(chunk_hash, start_line, end_line, text)]
+        self.file_chunks: Dict[str, List[Tuple[str, int, int, str]]] = {}
+        # chunk_hash -> normalized embedding
+        self.embedding_cache: Dict[str, np.ndarray] = {}
+        # Contiguous search matrix and the (path, start_line, end_line) of each row
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.chunk_meta: List[Tuple[str, int, int]] = []
+        self._matrix_stale = False
+        self.ann: Optional[IVFIndex] = None
+
+    @property
+    def model(self):
+        """Load the embedding model on first use."""
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _chunk(self, path: str, content: str) -> List[Tuple[str, int, int, str]]:
+        """Split content into function/class/module chunks with 1-based inclusive spans."""
+        chunks = []
+        for chunk in self.chunker.chunk(path, content):
+            chunk_hash = hashlib.sha1(chunk.text.encode('utf-8', 'surrogatepass')).hexdigest()
+            chunks.append((chunk_hash, chunk.start_line, chunk.end_line, chunk.text))
+        return chunks
+
+    def sync(self, file_hashes: Dict[str, str], get_content: Callable[[str], str]) -> bool:
+        """
+        Bring the chunk set in line with the given {path: content_hash} map.
+        Only files whose hash changed are re-chunked, and only chunks without
+        a cached embedding are sent to the encoder.
+        Returns True if anything changed.
+        """
+        return self.apply(self.prepare(file_hashes, get_content))
+
+    def prepare(self, file_hashes: Dict[str, str], get_content: Callable[[str], str]) -> SyncPlan:
+        """
+        Chunk changed files and encode the chunks without a cached embedding,
+        without changing the index, so searches can go on meanwhile. Calls
+        must not overlap with each other or with apply().
+        """
+        removed = set(self.file_hashes) - set(file_hashes)
+        changed = {}
+        for path, content_hash in file_hashes.items():
+            if self.file_hashes.get(path) == content_hash:
+                continue
+            content = get_content(path) if content_hash else ''
+            changed[path] = (content_hash, self._chunk(path, content or ''))
+
+        missing = {}
+        for _, chunks in changed.values():
+            for chunk_hash, _, _, text in chunks:
+                if chunk_hash not in self.embedding_cache:
+                    missing[chunk_hash] = text
+        return SyncPlan(self.version, removed, changed, self._encode(missing))
+
+    def apply(self, plan: SyncPlan) -> bool:
+        """
+        Swap prepared chunks and embeddings into the index. Plans prepared
+        before the last clear() are dropped. Returns True if anything changed.
+        """
+        if plan.version != self.version:
+            return False
+        for path in plan.removed:
+            self.file_hashes.pop(path, None)
+            self.file_chunks.pop(path, None)
+            self._matrix_stale = True
+        for path, (content_hash, chunks) in plan.changed.items():
+            self.file_hashes[path] = content_hash
+            self.file_chunks[path] = chunks
+            self._matrix_stale = True
+
+        if not self._matrix_stale:
+            return False
+        self.embedding_cache.update(plan.embeddings)
+        # Drop embeddings for chunks that no longer exist anywhere
+        live = {h for chunks in self.file_chunks.values() for h, _, _, _ in chunks}
+        for chunk_hash in set(self.embedding_cache) - live:
+            del self.embedding_cache[chunk_hash]
+        if self.ann_threshold is not None and self._chunk_count() >= self.ann_threshold:
+            self._sync_ann()
+        else:
+            self.ann = None
+            self._rebuild_matrix()
+        return True
+
+    def _chunk_count(self) -> int:
+        return sum(len(chunks) for chunks in self.file_chunks.values())
+
+    @staticmethod
+    def _chunk_key(path: str, start: int, end: int, chunk_hash: str) -> str:
+        return f'{chunk_hash}:{start}:{end}:{path}'
+
+    @staticmethod
+    def _parse_chunk_key(key: str) -> Tuple[str, int, int]:
+        _, start, end, path = key.split(':', 3)
+        return path, int(start), int(end)
+
+    def _sync_ann(self):
+        """Apply chunk insertions and deletions to the IVF index."""
+        desired = {}
+        for path, chunks in self.file_chunks.items():
+            for chunk_hash, start, end, _ in chunks:
+                desired[self._chunk_key(path, start, end, chunk_hash)] = chunk_hash
+
+        if self.ann is None:
+            if not desired:
+                return
+            dim = len(next(iter(self.embedding_cache.values())))
+            self.ann = IVFIndex(dim, n_lists=self.n_lists, n_probe=self.n_probe)
+        self.ann.remove([key for key in list(self.ann.key_to_row) if key not in desired])
+        added = [key for key in desired if key not in self.ann]
+        if added:
+            self.ann.add(added, np.vstack([self.embedding_cache[desired[key]] for key in added]))
+
+        # The exact-search matrix is not needed while the ANN index serves queries
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.chunk_meta = []
+        self._matrix_stale = False
+
+    def _encode(self, texts: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """Encode {chunk_hash: text} in batches into {chunk_hash: normalized embedding}."""
+        if not texts:
+            return {}
+        hashes = list(texts)
+        embeddings = self.model.encode(
+            [texts[h] for h in hashes],
+            batch_size=self.BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32)
+        return dict(zip(hashes, embeddings))
+
+    def _rebuild_matrix(self):
+        """Stack cached embeddings into the contiguous search matrix."""
+        rows = []
+        self.chunk_meta = []
+        for path, chunks in self.file_chunks.items():
+            for chunk_hash, start, end, _ in chunks:
+                rows.append(self.embedding_cache[chunk_hash])
+                self.chunk_meta.append((path, start, end))
+        if rows:
+            self.vectors = np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+        else:
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._matrix_stale = False
+
+    def search_chunks(self, query: str, limit: int = 10) -> List[Tuple[str, int, int, float]]:
+        """
+        Score the query against every chunk in one matrix-vector product, or
+        against the probed clusters of the IVF index for large chunk sets.
+        Returns (path, start_line, end_line, cosine_similarity) tuples.
+        """
+        if not query.strip() or not (self.chunk_meta or self.ann):
+            return []
+        query_vector = self.model.encode(
+            [query], convert_to_numpy=True, normalize_embeddings=True
+        )[0].astype(np.float32)
+        if self.ann is not None:
+            return [(*self._parse_chunk_key(key), score)
+                    for key, score in self.ann.search(query_vector, limit)]
+
+        scores = self.vectors @ query_vector
+
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(*self.chunk_meta[i], float(scores[i])) for i in top]
+
+    def search(self, query: str, limit: int = 10,
+               chunk_pool: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Rank files by their best matching chunk.
+        Returns a list of (file_path, similarity) tuples.
+        """
+        best: Dict[str, float] = {}
+        for path, _, _, score in self.search_chunks(query, chunk_pool or limit * 4):
+            if score > best.get(path, -1.0):
+                best[path] = score
+        return sorted(best.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+    def save(self, directory: str):
+        """Persist cached embeddings and the IVF index under a directory."""
+        os.makedirs(directory, exist_ok=True)
+        hashes = list(self.embedding_cache)
+        vectors = (np.vstack([self.embedding_cache[h] for h in hashes]) if hashes
+                   else np.zeros((0, 0), dtype=np.float32))
+        np.savez(os.path.join(directory, 'embeddings.npz'),
+                 model=np.array(self.model_name), hashes=np.array(hashes, dtype=str), vectors=vectors)
+        ann_path = os.path.join(directory, 'ann_index.npz')
+        if self.ann is not None:
+            self.ann.save(ann_path)
+        elif os.path.exists(ann_path):
+            os.remove(ann_path)
+
+    def load(self, directory: str) -> bool:
+        """
+        Restore embeddings and the IVF index written by save().
+        Files are re-chunked on the next sync, but no chunk is re-encoded.
+        Returns False if nothing usable was found.
+        """
+        path = os.path.join(directory, 'embeddings.npz')
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            if str(data['model']) != self.model_name:
+                return False
+            for chunk_hash, vector in zip(data['hashes'].tolist(), data['vectors']):
+                self.embedding_cache[chunk_hash] = vector.astype(np.float32)
+        ann_path = os.path.join(directory, 'ann_index.npz')
+        if self.ann_threshold is not None and os.path.exists(ann_path):
+            self.ann = IVFIndex.load(ann_path)
+            self.ann.n_probe = self.n_probe
+        return True
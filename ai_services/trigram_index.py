@@ -0,0 +1,321 @@
+"""
+Trigram Index
+Substring and regex search over workspace file paths and contents. Every
+file is indexed by the byte trigrams of its lowercased path and content;
+a query is narrowed to the files holding all of its literal trigrams by
+intersecting posting lists, and only those candidates are read and
+verified against the full pattern.
+"""
+
+import os
+import re
+import threading
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional
+import numpy as np
+from .walker import WorkspaceWalker
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+def trigrams(data: bytes) -> np.ndarray:
+    """Return the sorted, unique trigrams of a byte string packed into uint32 values."""
+    if len(data) < 3:
+        return np.empty(0, dtype=np.uint32)
+    b = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    return np.unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])
+
+class TrigramPostings:
+    """
+    Posting lists from trigrams to sorted document ids. Merged postings are
+    packed into flat NumPy arrays; recent additions are appended to a small
+    pending buffer that is folded in once it grows past MERGE_THRESHOLD.
+    """
+    MERGE_THRESHOLD = 1 << 18
+
+    def __init__(self):
+        # Packed postings: sorted trigram keys, and the documents of keys[i]
+        # in docs[offsets[i]:offsets[i + 1]]
+        self.keys = np.empty(0, dtype=np.uint32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.docs = np.empty(0, dtype=np.uint32)
+        # (trigram, doc_id) pairs added since the last merge
+        self.pending_grams = array('I')
+        self.pending_docs = array('I')
+
+    def add(self, doc_id: int, grams: np.ndarray):
+        self.pending_grams.frombytes(grams.astype(np.uint32).tobytes())
+        self.pending_docs.frombytes(np.full(len(grams), doc_id, dtype=np.uint32).tobytes())
+
+    def needs_merge(self, relative: bool = False) -> bool:
+        """
+        Check whether pending postings should be merged. With relative=True
+        the threshold grows with the merged postings, so a bulk build
+        merges a logarithmic number of times.
+        """
+        threshold = max(self.MERGE_THRESHOLD, len(self.docs)) if relative else self.MERGE_THRESHOLD
+        return len(self.pending_grams) > threshold
+
+    def lookup(self, gram: int) -> np.ndarray:
+        """Return the sorted ids of documents containing a trigram, removed ones included."""
+        i = int(np.searchsorted(self.keys, gram))
+        if i < len(self.keys) and self.keys[i] == gram:
+            docs = self.docs[self.offsets[i]:self.offsets[i + 1]]
+        else:
+            docs = self.docs[:0]
+        if self.pending_grams:
+            # Pending documents were added after every merged one, so order is kept
+            pending = np.frombuffer(self.pending_grams, dtype=np.uint32) == gram
+            docs = np.concatenate([docs, np.frombuffer(self.pending_docs, dtype=np.uint32)[pending]])
+        return docs
+
+    def merge(self, alive: np.ndarray):
+        """Fold pending postings into the packed arrays, dropping removed documents."""
+        shift = np.uint64(32)
+        packed = (np.repeat(self.keys, np.diff(self.offsets)).astype(np.uint64) << shift) | self.docs
+        pending = ((np.frombuffer(self.pending_grams, dtype=np.uint32).astype(np.uint64) << shift)
+                   | np.frombuffer(self.pending_docs, dtype=np.uint32))
+        pending.sort()
+        packed = np.insert(packed, np.searchsorted(packed, pending), pending)
+
+        docs = (packed & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        live = alive[docs]
+        docs = docs[live]
+        grams = (packed[live] >> shift).astype(np.uint32)
+        self.keys, starts = np.unique(grams, return_index=True)
+        self.offsets = np.append(starts, len(grams)).astype(np.int64)
+        self.docs = docs
+        self.pending_grams = array('I')
+        self.pending_docs = array('I')
+
+class TrigramIndex:
+    # Content matches reported per file before moving on to the next file
+    MAX_MATCHES_PER_FILE = 50
+    # Files indexed per lock hold, and between progress callbacks, during a build
+    BUILD_BATCH = 256
+
+    def __init__(self, root: str, max_file_size: Optional[int] = WorkspaceWalker.MAX_FILE_SIZE,
+                 index_content: bool = True):
+        self.root = os.path.abspath(root)
+        self.max_file_size = max_file_size
+        self.index_content = index_content
+        # Updates may arrive from a file watcher thread while searches run
+        self._lock = threading.RLock()
+        self._cancelled = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self.walker = WorkspaceWalker(self.root, max_file_size=self.max_file_size, skip_binary=False)
+        # doc_id -> workspace-relative path using '/', None once removed
+        self.paths: List[Optional[str]] = []
+        self.doc_ids: Dict[str, int] = {}
+        self.alive = bytearray()
+        self.path_postings = TrigramPostings()
+        self.content_postings = TrigramPostings()
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def _read(self, full_path: str) -> Optional[bytes]:
+        """Read a file for indexing; binary, oversized and unreadable files return None."""
+        try:
+            with open(full_path, 'rb') as f:
+                data = f.read() if self.max_file_size is None else f.read(self.max_file_size + 1)
+        except OSError:
+            return None
+        if self.max_file_size is not None and len(data) > self.max_file_size:
+            return None
+        if b'\0' in data[:WorkspaceWalker.SNIFF_BYTES]:
+            return None
+        return data
+
+    def _add(self, rel_path: str, data: bytes):
+        doc_id = len(self.paths)
+        self.paths.append(rel_path)
+        self.doc_ids[rel_path] = doc_id
+        self.alive.append(1)
+        self.path_postings.add(doc_id, trigrams(rel_path.lower().encode('utf-8')))
+        if self.index_content:
+            self.content_postings.add(doc_id, trigrams(data.lower()))
+
+    def _remove(self, rel_path: str):
+        doc_id = self.doc_ids.pop(rel_path, None)
+        if doc_id is not None:
+            self.alive[doc_id] = 0
+            self.paths[doc_id] = None
+
+    def _merge_if_needed(self, force: bool = False, relative: bool = False):
+        stale = [postings for postings in (self.path_postings, self.content_postings)
+                 if force or postings.needs_merge(relative)]
+        if stale:
+            alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).view(bool)
+            for postings in stale:
+                postings.merge(alive)
+
+    def build(self, progress: Optional[Callable[[int, int], None]] = None):
+        """
+        Index every file the walker accepts, replacing the current index.
+        Files are added in small batches under the lock, so searches on other
+        threads see the files indexed so far; `ready` is set once the build
+        completes. progress(done, total) is called after every BUILD_BATCH
+        files. cancel() stops the build early.
+        """
+        with self._lock:
+            self._reset()
+        entries = list(self.walker.walk())
+        total = len(entries)
+        for start in range(0, total, self.BUILD_BATCH):
+            if self._cancelled.is_set():
+                return
+            with self._lock:
+                for entry in entries[start:start + self.BUILD_BATCH]:
+                    rel_path = entry.rel_path.replace(os.sep, '/')
+                    # update_paths may have indexed the file already
+                    self._remove(rel_path)
+                    data = self._read(entry.path)
+                    if data is not None:
+                        self._add(rel_path, data)
+                self._merge_if_needed(relative=True)
+            if progress:
+                progress(min(start + self.BUILD_BATCH, total), total)
+        with self._lock:
+            self._merge_if_needed(force=True)
+            self.ready = True
+
+    def cancel(self):
+        """Stop a running build, for example when the workspace is closed."""
+        self._cancelled.set()
+
+    def _refresh(self, rel_path: str, full_path: str):
+        self._remove(rel_path)
+        if self.walker.is_ignored(rel_path, False):
+            return
+        data = self._read(full_path)
+        if data is not None:
+            self._add(rel_path, data)
+
+    def update_paths(self, paths: List[str]):
+        """
+        Re-index changed files and directories, absolute or relative to the
+        workspace. Missing paths, and everything indexed below them, are
+        dropped; directories are walked again.
+        """
+        with self._lock:
+            for path in paths:
+                full_path = os.path.abspath(os.path.join(self.root, path))
+                rel_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                if rel_path.startswith(os.pardir) or rel_path == '.':
+                    continue
+
+                if os.path.isfile(full_path):
+                    self._refresh(rel_path, full_path)
+                    continue
+                # A directory, or a path that no longer exists
+                prefix = rel_path + '/'
+                for indexed in [p for p in self.doc_ids if p == rel_path or p.startswith(prefix)]:
+                    self._remove(indexed)
+                if os.path.isdir(full_path) and not self.walker.is_ignored(rel_path, True):
+                    for entry in self.walker.walk(rel_path):
+                        self._refresh(entry.rel_path.replace(os.sep, '/'), entry.path)
+            self._merge_if_needed()
+
+    @classmethod
+    def _literal_runs(cls, parsed) -> List[str]:
+        """Collect literal strings that every match of a parsed regex must contain."""
+        runs = []
+        current = []
+        repeats = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT,
+                   getattr(sre_parse, 'POSSESSIVE_REPEAT', sre_parse.MAX_REPEAT)}
+        for op, av in parsed:
+            if op == sre_parse.LITERAL:
+                current.append(chr(av))
+                continue
+            if op == sre_parse.AT:
+                # Zero-width assertions do not break a literal run
+                continue
+            if current:
+                runs.append(''.join(current))
+                current = []
+            if op == sre_parse.SUBPATTERN:
+                runs.extend(cls._literal_runs(av[-1]))
+            elif op in repeats and av[0] >= 1:
+                runs.extend(cls._literal_runs(av[2]))
+        if current:
+            runs.append(''.join(current))
+        return runs
+
+    def _required_trigrams(self, query: str, regex: bool) -> np.ndarray:
+        """Trigrams every match must contain; ASCII only, since only ASCII is case folded."""
+        runs = self._literal_runs(sre_parse.parse(query)) if regex else [query]
+        grams = [trigrams(run.encode('utf-8').lower()) for run in runs]
+        grams = np.unique(np.concatenate(grams)) if grams else np.empty(0, dtype=np.uint32)
+        return grams[(grams & 0x808080) == 0]
+
+    def _candidates(self, grams: np.ndarray, content: bool) -> np.ndarray:
+        """Return the live documents whose postings hold every required trigram."""
+        with self._lock:
+            alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).view(bool)
+            if not len(grams):
+                return np.flatnonzero(alive)
+            postings = self.content_postings if content else self.path_postings
+            lists = sorted((postings.lookup(int(gram)) for gram in grams), key=len)
+        candidates = lists[0]
+        for docs in lists[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, docs, assume_unique=True)
+        return candidates[alive[candidates]]
+
+    def search(self, query: str, content: bool = False, regex: bool = False) -> Iterator[Optional[Dict]]:
+        """
+        Find case-insensitive substring or regex matches.
+        The pattern is checked and the candidate files are chosen up front;
+        the returned iterator then reads and verifies candidates lazily.
+        Path search yields {'name', 'path'}; content search adds 'line'
+        (1-based), 'column' and 'text' for each matching line. None is
+        yielded after candidates that did not match, so a ResultPager can
+        keep to its time budget. Raises re.error for invalid patterns.
+        """
+        if content and not self.index_content:
+            raise ValueError("Content search is not enabled for this TrigramIndex")
+        pattern = re.compile(query if regex else re.escape(query), re.IGNORECASE | re.MULTILINE)
+        candidates = self._candidates(self._required_trigrams(query, regex), content)
+        return self._verify(pattern, candidates.tolist(), content)
+
+    def _verify(self, pattern: re.Pattern, candidates: List[int], content: bool) -> Iterator[Optional[Dict]]:
+        """Check candidate files against the full pattern, yielding what actually matches."""
+        for doc_id in candidates:
+            rel_path = self.paths[doc_id]
+            if rel_path is None:
+                continue
+            name = rel_path.rpartition('/')[2]
+            if not content:
+                yield {'name': name, 'path': rel_path} if pattern.search(rel_path) else None
+                continue
+
+            data = self._read(os.path.join(self.root, rel_path.replace('/', os.sep)))
+            text = data.decode('utf-8', errors='replace') if data else ''
+            matches = 0
+            line, line_start, last_line = 1, 0, 0
+            for match in pattern.finditer(text):
+                line += text.count('\n', line_start, match.start())
+                line_start = text.rfind('\n', 0, match.start()) + 1
+                if line == last_line:
+                    continue
+                if matches == self.MAX_MATCHES_PER_FILE:
+                    break
+                last_line = line
+                matches += 1
+                line_end = text.find('\n', match.start())
+                yield {
+                    'name': name,
+                    'path': rel_path,
+                    'line': line,
+                    'column': match.start() - line_start,
+                    'text': text[line_start:line_end if line_end != -1 else len(text)].rstrip('\r')
+                }
+            if not matches:
+                yield None
@@ -0,0 +1,231 @@
+"""
+Workspace Walker
+Lazily walks a workspace with os.scandir, honoring .gitignore files, a
+project .nakulignore file and built-in ignores for dependency and cache
+directories. Oversized files can be skipped, and binary files are
+detected by sniffing their first bytes.
+"""
+
+import os
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+class IgnoreRules:
+    """Patterns from one ignore file, matched relative to the file's directory."""
+
+    def __init__(self, base: str, lines: List[str]):
+        self.base = base
+        # (regex, negated, directories_only)
+        self.patterns: List[Tuple[re.Pattern, bool, bool]] = []
+        for line in lines:
+            pattern = self._compile(line)
+            if pattern:
+                self.patterns.append(pattern)
+
+    @staticmethod
+    def _translate(glob: str) -> str:
+        """Translate a gitignore glob into a regular expression body."""
+        regex = ''
+        i = 0
+        while i < len(glob):
+            char = glob[i]
+            if glob.startswith('**/', i):
+                regex += '(?:.*/)?'
+                i += 3
+                continue
+            if glob.startswith('**', i):
+                regex += '.*'
+                i += 2
+                continue
+            if char == '*':
+                regex += '[^/]*'
+            elif char == '?':
+                regex += '[^/]'
+            elif char == '[':
+                end = glob.find(']', i + 1)
+                if end == -1:
+                    regex += re.escape(char)
+                else:
+                    body = glob[i + 1:end]
+                    if body.startswith('!'):
+                        body = '^' + body[1:]
+                    regex += '[' + body.replace('\\', '\\\\') + ']'
+                    i = end
+            elif char == '\\' and i + 1 < len(glob):
+                i += 1
+                regex += re.escape(glob[i])
+            else:
+                regex += re.escape(char)
+            i += 1
+        return regex
+
+    def _compile(self, line: str) -> Optional[Tuple[re.Pattern, bool, bool]]:
+        line = line.rstrip('\n').rstrip()
+        if not line or line.startswith('#'):
+            return None
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        if line.startswith('\\'):
+            line = line[1:]
+        directories_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            return None
+        anchored = '/' in line
+        body = self._translate(line.lstrip('/'))
+        regex = ('^' if anchored else '^(?:.*/)?') + body + '$'
+        return re.compile(regex), negated, directories_only
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Return True if the path is ignored, False if it is explicitly
+        re-included, or None if no pattern applies.
+        rel_path uses forward slashes and is relative to the workspace root.
+        """
+        if self.base:
+            if not rel_path.startswith(self.base + '/'):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        result = None
+        for regex, negated, directories_only in self.patterns:
+            if directories_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negated
+        return result
+
+class WalkEntry:
+    def __init__(self, name: str, path: str, rel_path: str, is_dir: bool,
+                 stat: Optional[os.stat_result] = None):
+        self.name = name
+        self.path = path
+        # Relative to the workspace root, using the OS separator
+        self.rel_path = rel_path
+        self.is_dir = is_dir
+        self.stat = stat
+
+class WorkspaceWalker:
+    DEFAULT_IGNORES = [
+        '.git/', '.hg/', '.svn/', 'node_modules/', 'venv/', '.venv/', 'env/',
+        '__pycache__/', '.mypy_cache/', '.pytest_cache/', '.ruff_cache/', '.tox/',
+        '.nakul/', '*.pyc', '*.pyo'
+    ]
+    IGNORE_FILES = ('.gitignore', '.nakulignore')
+    MAX_FILE_SIZE = 1024 * 1024
+    SNIFF_BYTES = 8192
+
+    def __init__(self, root: str, max_file_size: Optional[int] = MAX_FILE_SIZE,
+                 skip_binary: bool = True, file_filter: Optional[Callable[[str], bool]] = None):
+        """
+        max_file_size skips larger files (None disables the cap); file_filter
+        receives each file name and can reject it before it is stat'ed.
+        """
+        self.root = os.path.abspath(root)
+        self.max_file_size = max_file_size
+        self.skip_binary = skip_binary
+        self.file_filter = file_filter
+        self._default_rules = IgnoreRules('', self.DEFAULT_IGNORES)
+        self._rules_cache: Dict[str, List[IgnoreRules]] = {}
+
+    @classmethod
+    def is_binary(cls, path: str) -> bool:
+        """Treat a file as binary if its first bytes contain a NUL byte."""
+        try:
+            with open(path, 'rb') as f:
+                return b'\0' in f.read(cls.SNIFF_BYTES)
+        except OSError:
+            return True
+
+    def _load_rules(self, rel_dir: str) -> List[IgnoreRules]:
+        """Read the ignore files that live directly in a directory."""
+        rules = []
+        directory = os.path.join(self.root, rel_dir.replace('/', os.sep)) if rel_dir else self.root
+        for name in self.IGNORE_FILES:
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8', errors='replace') as f:
+                    rules.append(IgnoreRules(rel_dir, f.readlines()))
+            except OSError:
+                continue
+        return rules
+
+    def _rules_for(self, rel_dir: str) -> List[IgnoreRules]:
+        """Return the rules in effect inside a directory, outermost first."""
+        rules = self._rules_cache.get(rel_dir)
+        if rules is None:
+            parent = [self._default_rules] if not rel_dir else self._rules_for(rel_dir.rpartition('/')[0])
+            rules = parent + self._load_rules(rel_dir)
+            self._rules_cache[rel_dir] = rules
+        return rules
+
+    def _matches(self, rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        for rules in self._rules_for(rel_path.rpartition('/')[0]):
+            result = rules.match(rel_path, is_dir)
+            if result is not None:
+                ignored = result
+        return ignored
+
+    def is_ignored(self, rel_path: str, is_dir: bool, check_parents: bool = True) -> bool:
+        """
+        Check a workspace-relative path against every applicable ignore file.
+        With check_parents, a path inside an ignored directory is ignored too.
+        """
+        rel_path = rel_path.replace(os.sep, '/').strip('/')
+        if check_parents:
+            parts = rel_path.split('/')
+            for depth in range(1, len(parts)):
+                if self._matches('/'.join(parts[:depth]), True):
+                    return True
+        return self._matches(rel_path, is_dir)
+
+    def _accept_file(self, entry: os.DirEntry, rel_path: str) -> Optional[os.stat_result]:
+        """Apply the name filter, size cap and binary sniffing to a file."""
+        if self.file_filter and not self.file_filter(entry.name):
+            return None
+        try:
+            stat = entry.stat()
+        except OSError:
+            return None
+        if self.max_file_size is not None and stat.st_size > self.max_file_size:
+            return None
+        if self.skip_binary and self.is_binary(entry.path):
+            return None
+        return stat
+
+    def list_dir(self, rel_dir: str = '') -> List[WalkEntry]:
+        """List the non-ignored entries of one directory, without recursing."""
+        rel_dir = rel_dir.replace(os.sep, '/').strip('/')
+        directory = os.path.join(self.root, rel_dir.replace('/', os.sep)) if rel_dir else self.root
+        entries = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+                    if self.is_ignored(rel_path, is_dir, check_parents=False):
+                        continue
+                    if is_dir:
+                        entries.append(WalkEntry(entry.name, entry.path, rel_path.replace('/', os.sep), True))
+                        continue
+                    stat = self._accept_file(entry, rel_path)
+                    if stat is not None:
+                        entries.append(WalkEntry(entry.name, entry.path, rel_path.replace('/', os.sep),
+                                                 False, stat))
+        except OSError as e:
+            print(f"Error reading directory {directory}: {e}")
+        return entries
+
+    def walk(self, rel_dir: str = '') -> Iterator[WalkEntry]:
+        """Lazily yield every accepted file below a directory, depth first."""
+        pending = [rel_dir.replace(os.sep, '/').strip('/')]
+        while pending:
+            current = pending.pop()
+            subdirs = []
+            for entry in self.list_dir(current):
+                if entry.is_dir:
+                    subdirs.append(entry.rel_path.replace(os.sep, '/'))
+                else:
+                    yield entry
+            # Reverse so directories are visited in listing order
+            pending.extend(reversed(subdirs))
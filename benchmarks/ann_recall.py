@@ -0,0 +1,66 @@
+"""
+ANN Recall Benchmark
+Compares IVFIndex against exact cosine search on synthetic clustered
+embeddings and reports recall@k and per-query latency for each n_probe.
+
+Usage: python benchmarks/ann_recall.py [--size 200000] [--dim 384]
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_services.ann_index import IVFIndex
+
+def make_vectors(rng, size: int, dim: int, clusters: int) -> np.ndarray:
+    """Generate normalized vectors scattered around random cluster centres."""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centres[labels] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=200000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--clusters', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = make_vectors(rng, args.size, args.dim, args.clusters)
+    queries = make_vectors(rng, args.queries, args.dim, args.clusters)
+    keys = [str(i) for i in range(args.size)]
+
+    start = time.perf_counter()
+    index = IVFIndex(args.dim)
+    index.add(keys, vectors)
+    print(f"Built IVF index over {args.size} x {args.dim} vectors "
+          f"({len(index.centroids)} lists) in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    truth = [set(exact_top_k(vectors, q, args.k).tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+    print(f"{'exact':>10}  recall@{args.k}=1.000  {exact_ms:8.3f} ms/query")
+
+    for n_probe in (1, 2, 4, 8, 16, 32, 64):
+        start = time.perf_counter()
+        hits = 0
+        for query, expected in zip(queries, truth):
+            found = {int(key) for key, _ in index.search(query, args.k, n_probe=n_probe)}
+            hits += len(found & expected)
+        latency_ms = (time.perf_counter() - start) / args.queries * 1000
+        recall = hits / (args.queries * args.k)
+        print(f"{'n_probe=' + str(n_probe):>10}  recall@{args.k}={recall:.3f}  {latency_ms:8.3f} ms/query")
+
+if __name__ == '__main__':
+    main()
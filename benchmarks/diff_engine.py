@@ -0,0 +1,115 @@
+"""
+Diff Engine Benchmark
+Compares ai_services.line_diff.unified_diff with difflib.unified_diff on
+generated source code, JSON fixtures and minified JavaScript of 1k to 100k
+lines, each with scattered edits. Reports the time and the number of
+changed lines each diff reports.
+
+Usage: python benchmarks/diff_engine.py [--sizes 1000,10000,100000] [--difflib-timeout 60]
+difflib runs in a subprocess and is abandoned after --difflib-timeout seconds.
+"""
+
+import os
+import sys
+import time
+import random
+import difflib
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_services.line_diff import unified_diff
+
+def make_code(lines: int, rng: random.Random):
+    """Python-like source with many repeated short lines."""
+    out = []
+    while len(out) < lines:
+        name = f'handler_{rng.randint(0, lines)}'
+        out.append(f'def {name}(request):\n')
+        for _ in range(rng.randint(3, 12)):
+            out.append(rng.choice([
+                '    if not request:\n', '        return None\n', '    try:\n',
+                '    except Exception as e:\n', '        raise\n', '\n',
+                f'    value = compute({rng.randint(0, 50)})\n', '    return value\n'
+            ]))
+    return out[:lines]
+
+def make_json(lines: int, rng: random.Random):
+    """A fixture of near-identical records."""
+    out = ['[\n']
+    while len(out) < lines - 1:
+        out += ['  {\n', f'    "id": {len(out)},\n', f'    "kind": "{rng.choice("abc")}",\n',
+                '    "active": true,\n', '    "tags": []\n', '  },\n']
+    return out[:lines - 1] + [']\n']
+
+def make_minified(lines: int, rng: random.Random):
+    """Long lines built from a small vocabulary of statements."""
+    statements = [f'var a{i}=b({i});' for i in range(40)] + ['if(x){y()}', 'return z;', '}']
+    return [''.join(rng.choices(statements, k=20)) + '\n' for _ in range(lines)]
+
+def edit(lines, rng: random.Random, ratio: float = 0.01):
+    """Insert, delete and change about ratio of the lines, plus one moved block."""
+    out = list(lines)
+    for _ in range(max(1, int(len(out) * ratio))):
+        i = rng.randrange(len(out))
+        op = rng.random()
+        if op < 0.4:
+            out.insert(i, f'# inserted {rng.random()}\n')
+        elif op < 0.7:
+            del out[i]
+        else:
+            out[i] = out[i].rstrip('\n') + ' # changed\n'
+    start = rng.randrange(len(out) // 2)
+    block = out[start:start + len(out) // 50]
+    del out[start:start + len(block)]
+    out[len(out) // 2:len(out) // 2] = block
+    return out
+
+def changed_lines(diff):
+    return sum(1 for line in diff if line[:1] in '+-' and not line.startswith(('+++', '---')))
+
+def _run_difflib(a, b, queue):
+    start = time.perf_counter()
+    diff = list(difflib.unified_diff(a, b, 'Original', 'Modified', n=3))
+    queue.put((time.perf_counter() - start, changed_lines(diff)))
+
+def time_difflib(a, b, timeout: float):
+    """Time difflib in a subprocess; returns (seconds, changed) or None on timeout."""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_difflib, args=(a, b, queue))
+    process.start()
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return None
+    return queue.get()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--difflib-timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generators = [('code', make_code), ('json', make_json), ('minified', make_minified)]
+    print(f"{'input':>16}  {'line_diff':>10} {'changed':>8}  {'difflib':>10} {'changed':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        for kind, generate in generators:
+            rng = random.Random(args.seed)
+            a = generate(size, rng)
+            b = edit(a, rng)
+
+            start = time.perf_counter()
+            ours = changed_lines(unified_diff(a, b, 'Original', 'Modified', n=3))
+            ours_time = time.perf_counter() - start
+
+            result = time_difflib(a, b, args.difflib_timeout)
+            if result is None:
+                theirs = f"{'>' + format(args.difflib_timeout, '.0f') + 's':>10} {'-':>8}"
+            else:
+                theirs = f"{result[0] * 1000:8.1f}ms {result[1]:8d}"
+            print(f"{kind + ' ' + str(size):>16}  {ours_time * 1000:8.1f}ms {ours:8d}  {theirs}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Index Memory Benchmark
+Measures the resident footprint of the search index with tracemalloc.
+The previous layout (content kept per file, a term Counter per file and
+dict-of-dict postings for files and chunks) is rebuilt from the same
+tokens and compared with the current SearchService.
+
+Usage: python benchmarks/index_memory.py [workspace] [--files 5000]
+Without a workspace a synthetic corpus is generated in a temporary directory.
+"""
+
+import gc
+import os
+import sys
+import random
+import argparse
+import tempfile
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_services.search import SearchService
+
+def make_corpus(root: str, files: int, seed: int = 0):
+    """Write a synthetic Python project with a Zipf-like vocabulary."""
+    rng = random.Random(seed)
+    vocabulary = [f'name{i}' for i in range(20000)]
+    weights = [1.0 / (i + 1) for i in range(len(vocabulary))]
+    for i in range(files):
+        directory = os.path.join(root, f'pkg{i % 50}')
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        for f in range(rng.randint(2, 12)):
+            lines.append(f'def function_{f}(value):')
+            for _ in range(rng.randint(3, 25)):
+                words = rng.choices(vocabulary, weights, k=6)
+                lines.append(f'    {words[0]} = {words[1]}({words[2]}, {words[3]}) + {words[4]}.{words[5]}')
+            lines.append('')
+        with open(os.path.join(directory, f'module{i}.py'), 'w') as f:
+            f.write('\n'.join(lines))
+
+def measure(build):
+    """Return (result, bytes still allocated after build() returns)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def build_legacy(tokenized):
+    """Rebuild the dict-based layout the index used before the compact store."""
+    file_cache = {}
+    postings = {}
+    chunks = {}
+    chunk_postings = {}
+    next_chunk_id = 0
+    for path, content, chunk_terms in tokenized:
+        terms = Counter()
+        chunk_ids = []
+        for kind, name, start, end, counts in chunk_terms:
+            chunks[next_chunk_id] = (path, kind, name, start, end, sum(counts.values()))
+            for term, freq in counts.items():
+                chunk_postings.setdefault(term, {})[next_chunk_id] = freq
+            terms.update(counts)
+            chunk_ids.append(next_chunk_id)
+            next_chunk_id += 1
+        # Content was read with its own decode, so each file held a private copy
+        file_cache[path] = {'content': content.encode().decode(), 'terms': terms,
+                            'length': sum(terms.values()), 'chunks': chunk_ids}
+        for term, freq in terms.items():
+            postings.setdefault(term, {})[path] = freq
+    return file_cache, postings, chunks, chunk_postings
+
+def index_workspace(workspace: str) -> SearchService:
+    service = SearchService(persist=False, workers=1)
+    service.index_workspace(workspace)
+    return service
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('workspace', nargs='?')
+    parser.add_argument('--files', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workspace = args.workspace
+        if workspace is None:
+            workspace = tmp
+            make_corpus(workspace, args.files)
+
+        service, current = measure(lambda: index_workspace(workspace))
+        tokenizer = SearchService(persist=False, workers=1)
+        tokenized = []
+        for path in service.documents:
+            content = service._get_file_content(os.path.join(service.workspace_path, path))
+            tokenized.append((path, content, tokenizer._tokenize_chunks(path, content)))
+        content_bytes = sum(sys.getsizeof(content) for _, content, _ in tokenized)
+        _, legacy = measure(lambda: build_legacy(tokenized))
+
+    stats = service.index_stats()
+    print(f"{stats['files']} files, {stats['chunks']} chunks, {stats['terms']} distinct terms, "
+          f"{content_bytes / 2 ** 20:.1f} MiB of content")
+    print(f"{'legacy dict index':>24}  {legacy / 2 ** 20:8.1f} MiB")
+    print(f"{'compact index':>24}  {current / 2 ** 20:8.1f} MiB  "
+          f"(content cache {stats['content_bytes'] / 2 ** 20:.1f} MiB, "
+          f"postings {stats['postings_bytes'] / 2 ** 20:.1f} MiB)")
+    print(f"{'reduction':>24}  {legacy / max(current, 1):8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Trigram Search Benchmark
+Builds a TrigramIndex over a workspace and reports the latency of the first
+result page and of the full result set for path, substring and regex
+queries.
+
+Usage: python benchmarks/trigram_search.py [workspace] [--files 100000]
+Without a workspace a synthetic tree is generated in a temporary directory.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_services.trigram_index import TrigramIndex
+from ai_services.pager import ResultPager
+
+QUERIES = [
+    ('handler', False, False),
+    ('module_42', False, False),
+    ('render_widget', True, False),
+    ('name123(', True, False),
+    (r'def \w+_17\(', True, True),
+    (r'config\.(get|set)', True, True),
+]
+
+def make_tree(root: str, files: int, seed: int = 0):
+    """Write a synthetic source tree of small Python files."""
+    rng = random.Random(seed)
+    vocabulary = [f'name{i}' for i in range(5000)] + ['render_widget', 'config.get', 'config.set']
+    kinds = ['handler', 'model', 'view', 'service', 'util']
+    for i in range(files):
+        directory = os.path.join(root, f'pkg{i % 100}', f'sub{i % 7}')
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        for f in range(rng.randint(1, 6)):
+            lines.append(f'def {rng.choice(kinds)}_{rng.randint(0, 99)}(value):')
+            for _ in range(rng.randint(2, 10)):
+                words = rng.choices(vocabulary, k=4)
+                lines.append(f'    {words[0]} = {words[1]}({words[2]}) + {words[3]}')
+        name = f'{rng.choice(kinds)}_module_{i}.py'
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('workspace', nargs='?')
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=ResultPager.PAGE_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workspace = args.workspace
+        if workspace is None:
+            workspace = tmp
+            start = time.perf_counter()
+            make_tree(workspace, args.files)
+            print(f"Generated {args.files} files in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = TrigramIndex(workspace)
+        index.build()
+        print(f"Indexed {len(index)} files in {time.perf_counter() - start:.1f}s")
+
+        pager = ResultPager(page_size=args.page_size)
+        for query, content, regex in QUERIES:
+            start = time.perf_counter()
+            page = pager.start(index.search(query, content=content, regex=regex))
+            first_ms = (time.perf_counter() - start) * 1000
+            pager.cancel(page['id'])
+
+            start = time.perf_counter()
+            total = sum(1 for result in index.search(query, content=content, regex=regex) if result)
+            all_ms = (time.perf_counter() - start) * 1000
+            label = f"{'content' if content else 'path'}{' regex' if regex else ''}: {query}"
+            print(f"{label:>32}  first page {len(page['items']):4d} in {first_ms:7.2f} ms  "
+                  f"all {total:6d} in {all_ms:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,6 @@
 import os
-from together import Together
-import google.generativeai as genai
 from dotenv import load_dotenv
+from ai_providers import providers
 import logging
 import time
 from collections import deque
@@ -94,8 +93,9 @@ class AIChat:
             logger.error("TOGETHER_API_TOKEN not found in environment variables")
             raise ValueError("TOGETHER_API_TOKEN not found in environment variables")
         
-        self.together_client = Together(api_key=together_api_key)
+        self.together_client = providers.together(together_api_key)
         self.together_model = "meta-llama/Meta-Llama-3.1-405B-Instruct-Turbo"
+        self.gemini_model = "gemini-pro"
         
         # Initialize Gemini key manager
         self.gemini_manager = GeminiKeyManager()
@@ -105,26 +105,35 @@ class AIChat:
         
         logger.info("AIChat initialized successfully")
     
-    async def send_message(self, message, model_preference="gemini"):
+    async def send_message(self, message, model_preference="gemini", context=None, on_delta=None):
         """
         Send a message to the AI chat system
         
         Args:
             message (str): The user's message
             model_preference (str): Preferred model to use ("gemini" or "together")
+            context (list): Optional files as {"path", "content"} dicts to include in the prompt
+            on_delta (callable): Optional, called with each piece of the reply as it streams in
             
         Returns:
             dict: Response containing the AI's reply and metadata
         """
         try:
             logger.info(f"Processing message with {model_preference} preference")
+            streamed = False
+            
+            def forward(delta):
+                nonlocal streamed
+                streamed = True
+                if on_delta:
+                    on_delta(delta)
             
             # Try Gemini first if it's the preference and keys are available
             if model_preference == "gemini":
                 gemini_key = self.gemini_manager.get_available_key()
                 if gemini_key:
                     try:
-                        response = await self._send_to_gemini(message, gemini_key)
+                        response = await self._send_to_gemini(message, gemini_key, context, forward)
                         return {
                             "status": "success",
                             "data": {
@@ -133,10 +142,13 @@ class AIChat:
                             }
                         }
                     except Exception as e:
+                        # Once part of the reply is shown, another model's reply cannot follow it
+                        if streamed:
+                            raise
                         logger.warning(f"Gemini request failed, falling back to Together: {str(e)}")
             
             # Fall back to Together AI
-            response = await self._send_to_together(message)
+            response = await self._send_to_together(message, context, forward)
             return {
                 "status": "success",
                 "data": {
@@ -149,17 +161,18 @@ class AIChat:
             logger.error(f"Error in send_message: {str(e)}", exc_info=True)
             return {"status": "error", "message": str(e)}
     
-    async def _send_to_gemini(self, message, api_key):
-        """Send message to Gemini"""
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-pro')
-        
-        # Include relevant conversation history
-        context = self._get_conversation_context()
-        prompt = f"{context}\n\nUser: {message}\nAssistant:"
-        
-        response = await model.generate_content_async(prompt)
-        reply = response.text
+    async def _send_to_gemini(self, message, api_key, context=None, on_delta=None):
+        """Send message to Gemini, passing each streamed piece of the reply to on_delta"""
+        # Each key has its own pooled client, so no global configuration is changed
+        client = providers.gemini(api_key)
+        prompt = self._build_prompt(message, context)
+        
+        parts = []
+        async for delta in client.stream_generate(self.gemini_model, prompt):
+            parts.append(delta)
+            if on_delta:
+                on_delta(delta)
+        reply = "".join(parts)
         
         # Update conversation history
         self.conversation_history.append({"role": "user", "content": message})
@@ -167,28 +180,25 @@ class AIChat:
         
         return reply
     
-    async def _send_to_together(self, message):
-        """Send message to Together AI"""
-        # Include relevant conversation history
-        context = self._get_conversation_context()
-        prompt = f"{context}\n\nUser: {message}\nAssistant:"
-        
-        response = self.together_client.chat.completions.create(
-            model=self.together_model,
-            messages=[{"role": "user", "content": prompt}],
+    async def _send_to_together(self, message, context=None, on_delta=None):
+        """Send message to Together AI, passing each streamed piece of the reply to on_delta"""
+        prompt = self._build_prompt(message, context)
+        
+        parts = []
+        async for delta in self.together_client.stream_chat(
+            self.together_model,
+            [{"role": "user", "content": prompt}],
             max_tokens=1000,
             temperature=0.7,
             top_p=0.7,
             top_k=50,
             repetition_penalty=1,
-            stop=["<|eot_id|>", "<|eom_id|>", "User:", "\n\n"],
-            stream=True
-        )
-        
-        reply = ""
-        for token in response:
-            if hasattr(token, 'choices'):
-                reply += token.choices[0].delta.content
+            stop=["<|eot_id|>", "<|eom_id|>", "User:", "\n\n"]
+        ):
+            parts.append(delta)
+            if on_delta:
+                on_delta(delta)
+        reply = "".join(parts)
         
         # Update conversation history
         self.conversation_history.append({"role": "user", "content": message})
@@ -196,6 +206,13 @@ class AIChat:
         
         return reply
     
+    def _build_prompt(self, message, context=None):
+        """Build a prompt from the context files, the conversation history and the message"""
+        files = "".join(f"File: {file['path']}\n{file['content']}\n\n" for file in context or [])
+        # Include relevant conversation history
+        history = self._get_conversation_context()
+        return f"{files}{history}\n\nUser: {message}\nAssistant:"
+    
     def _get_conversation_context(self):
         """Get the relevant conversation history as context"""
         # Keep only last 10 messages for context
@@ -1,6 +1,8 @@
+import asyncio
 import os
-from together import Together
 from dotenv import load_dotenv
+from ai_providers import providers
+from completion_cache import CompletionCache
 import logging
 import re
 
@@ -15,6 +17,72 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 logger.info("Environment variables loaded")
 
+class CompletionCleaner:
+    """
+    Cleans a completion while it streams: markdown fences and explanatory
+    comments are removed and the indentation is adjusted one line at a time.
+    Text is passed on as soon as no later token can change it, and
+    everything passed on joins up to the final completion.
+    """
+    FENCE = re.compile(r'```[\w]*')
+
+    def __init__(self, base_indentation, on_text=None):
+        """
+        Args:
+            base_indentation (int): Indentation of the line at the cursor
+            on_text (callable): Optional, called with each piece of cleaned text
+        """
+        self.base_indentation = base_indentation
+        self.on_text = on_text
+        self.parts = []
+        # Raw text of the line still being generated
+        self.partial = ""
+        # Cleaned lines finished so far, and the characters of the current one already passed on
+        self.line_count = 0
+        self.shown = 0
+
+    def feed(self, delta):
+        """Add raw generated text"""
+        *lines, self.partial = (self.partial + delta).split('\n')
+        for line in lines:
+            self._show(self._clean_line(line), finished=True)
+        # Text from a fence or a comment onwards, and the spaces before it, may still be removed
+        cut = min([i for i in (self.partial.find('#'), self.partial.find('`')) if i >= 0], default=len(self.partial))
+        self._show(self.partial[:cut].rstrip(), finished=False)
+
+    def finish(self):
+        """Clean the last line and return the whole completion"""
+        self._show(self._clean_line(self.partial), finished=True)
+        self.partial = ""
+        return ''.join(self.parts)
+
+    def _clean_line(self, line):
+        # Remove markdown code blocks
+        line = self.FENCE.sub('', line)
+        # Remove comments that are explanatory (usually longer)
+        if '#' in line:
+            comment_start = line.find('#')
+            comment_text = line[comment_start:].strip()
+            # Keep short comments like "# noqa" or "# type: ignore"
+            if len(comment_text) > 20:  # Arbitrary length for explanatory comments
+                line = line[:comment_start].rstrip()
+        return line
+
+    def _show(self, line, finished):
+        if line.strip():  # Empty lines are dropped
+            # The first line gets the base indentation, later lines keep theirs relative to it
+            relative_indent = len(line) - len(line.lstrip()) if self.line_count else 0
+            text = ('\n' if self.line_count else '') + ' ' * (self.base_indentation + relative_indent) + line.lstrip()
+            if len(text) > self.shown:
+                self.parts.append(text[self.shown:])
+                if self.on_text:
+                    self.on_text(text[self.shown:])
+                self.shown = len(text)
+            if finished:
+                self.line_count += 1
+        if finished:
+            self.shown = 0
+
 class AICompletion:
     def __init__(self):
         logger.info("Initializing AICompletion...")
@@ -23,12 +91,14 @@ class AICompletion:
             logger.error("TOGETHER_API_TOKEN not found in environment variables")
             raise ValueError("TOGETHER_API_TOKEN not found in environment variables")
         
-        logger.info("Creating Together client...")
-        self.client = Together(api_key=api_key)
+        # Shares the pooled Together client with chat and formatting
+        self.client = providers.together(api_key)
         self.model = "Qwen/Qwen2.5-Coder-32B-Instruct"
+        # Completions the user can type ahead into without another request
+        self.cache = CompletionCache()
         logger.info("AICompletion initialized successfully")
         
-    def get_completion(self, code_context, cursor_position, file_type):
+    async def get_completion(self, code_context, cursor_position, file_type, on_delta=None, document=None):
         """
         Get code completion suggestions based on the current context
         
@@ -36,6 +106,8 @@ class AICompletion:
             code_context (str): The code before and after the cursor
             cursor_position (int): Current cursor position
             file_type (str): Type of file (python, javascript, etc.)
+            on_delta (callable): Optional, called with cleaned completion text as it streams in
+            document: Optional, identifies the document for the completion cache
             
         Returns:
             str: The completion suggestion
@@ -49,12 +121,28 @@ class AICompletion:
             code_before = code_context[:cursor_position]
             code_after = code_context[cursor_position:]
             
+            # Served locally when the same context, or the start of a cached completion, was seen
+            cached = self.cache.get(document, code_before, code_after)
+            if cached is not None:
+                logger.info(f"Serving cached completion (length: {len(cached)})")
+                if on_delta:
+                    on_delta(cached)
+                return {"status": "success", "data": cached}
+            
+            # Text a cancelled completion streamed here is shown at once, and generation resumes after it
+            resumed = self.cache.get_partial(document, code_before, code_after) or ""
+            if resumed:
+                logger.info(f"Resuming after cached partial completion (length: {len(resumed)})")
+                if on_delta:
+                    on_delta(resumed)
+            context_before = code_before + resumed
+            
             # Get the current line and indentation
-            current_line = code_before.split('\n')[-1] if code_before else ""
+            current_line = context_before.split('\n')[-1] if context_before else ""
             indentation = len(current_line) - len(current_line.lstrip())
             
             # Get the previous few lines for better context
-            lines_before = code_before.split('\n')
+            lines_before = context_before.split('\n')
             context_lines = lines_before[-10:] if len(lines_before) > 10 else lines_before
             
             # Get function/class context if we're inside one
@@ -90,31 +178,29 @@ Complete from here (no comments or explanations):
             logger.info("Sending request to Together API...")
             logger.debug(f"Using model: {self.model}")
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,  # Increased max tokens for longer completions
-                temperature=0.7,
-                top_p=0.7,
-                top_k=50,
-                repetition_penalty=1,
-                stop=["<|eot_id|>", "<|eom_id|>"],
-                stream=True
-            )
-            
-            logger.info("Received streaming response from Together API")
-            
-            completion = ""
-            for token in response:
-                if hasattr(token, 'choices'):
-                    completion += token.choices[0].delta.content
-                    logger.debug(f"Received token: {token.choices[0].delta.content}")
-            
-            # Clean up the completion
-            completion = self._clean_completion(completion)
-            
-            # Post-process the completion to maintain indentation
-            completion = self._post_process_completion(completion, indentation)
+            # Cleaned and indented while streaming, so partial text can be shown
+            cleaner = CompletionCleaner(indentation, on_delta)
+            try:
+                async for delta in self.client.stream_chat(
+                    self.model,
+                    [{"role": "user", "content": prompt}],
+                    max_tokens=500,  # Increased max tokens for longer completions
+                    temperature=0.7,
+                    top_p=0.7,
+                    top_k=50,
+                    repetition_penalty=1,
+                    stop=["<|eot_id|>", "<|eom_id|>"]
+                ):
+                    cleaner.feed(delta)
+                    logger.debug(f"Received token: {delta}")
+            except asyncio.CancelledError:
+                # Replaced by a newer request, which can show this text and resume after it
+                self.cache.put(document, code_before, code_after, resumed + "".join(cleaner.parts), partial=True)
+                raise
+            
+            logger.info("Received streamed response from Together API")
+            completion = resumed + cleaner.finish()
+            self.cache.put(document, code_before, code_after, completion)
             
             logger.info(f"Generated completion (length: {len(completion)})")
             logger.debug(f"Complete completion text: {completion}")
@@ -125,28 +211,6 @@ Complete from here (no comments or explanations):
             logger.error(f"Error generating completion: {str(e)}", exc_info=True)
             return {"status": "error", "message": str(e)}
     
-    def _clean_completion(self, completion):
-        """Clean up the completion by removing markdown and unnecessary elements"""
-        # Remove markdown code blocks
-        completion = re.sub(r'```[\w]*\n?', '', completion)
-        completion = re.sub(r'```\n?', '', completion)
-        
-        # Remove trailing comments that explain the code
-        lines = completion.split('\n')
-        cleaned_lines = []
-        for line in lines:
-            # Remove comments that are explanatory (usually longer)
-            if '#' in line:
-                comment_start = line.find('#')
-                comment_text = line[comment_start:].strip()
-                # Keep short comments like "# noqa" or "# type: ignore"
-                if len(comment_text) > 20:  # Arbitrary length for explanatory comments
-                    line = line[:comment_start].rstrip()
-            if line.strip():  # Only add non-empty lines
-                cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
-            
     def _get_function_context(self, lines):
         """Extract the current function name if we're inside a function"""
         for line in reversed(lines):
@@ -162,31 +226,6 @@ Complete from here (no comments or explanations):
             if line.startswith('class '):
                 return line[6:line.find('(') if '(' in line else -1]
         return None
-        
-    def _post_process_completion(self, completion, base_indentation):
-        """Post-process the completion to maintain proper indentation"""
-        if not completion:
-            return completion
-            
-        lines = completion.split('\n')
-        processed_lines = []
-        
-        for i, line in enumerate(lines):
-            if not line.strip():  # Empty line
-                processed_lines.append('')
-                continue
-                
-            # Calculate the relative indentation of this line
-            relative_indent = len(line) - len(line.lstrip())
-            
-            # For the first line, use the base indentation
-            if i == 0:
-                processed_lines.append(' ' * base_indentation + line.lstrip())
-            else:
-                # For subsequent lines, maintain relative indentation from the first line
-                processed_lines.append(' ' * (base_indentation + relative_indent) + line.lstrip())
-        
-        return '\n'.join(processed_lines)
 
 # Create a singleton instance
 logger.info("Creating AICompletion singleton instance")
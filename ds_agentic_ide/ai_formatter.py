@@ -1,6 +1,6 @@
 import os
-from together import Together
 from dotenv import load_dotenv
+from ai_providers import providers
 import logging
 import re
 
@@ -23,18 +23,19 @@ class AIFormatter:
             logger.error("TOGETHER_API_TOKEN not found in environment variables")
             raise ValueError("TOGETHER_API_TOKEN not found in environment variables")
         
-        logger.info("Creating Together client...")
-        self.client = Together(api_key=api_key)
+        # Shares the pooled Together client with chat and completion
+        self.client = providers.together(api_key)
         self.model = "Qwen/Qwen2.5-Coder-32B-Instruct"
         logger.info("AIFormatter initialized successfully")
     
-    async def format_code(self, code, file_type):
+    async def format_code(self, code, file_type, on_delta=None):
         """
         Format the given code block using AI suggestions
         
         Args:
             code (str): The code to format
             file_type (str): The type of file (python, javascript, etc.)
+            on_delta (callable): Optional, called with the raw formatted text as it streams in
             
         Returns:
             dict: A dictionary containing the formatted code and diff information
@@ -70,27 +71,25 @@ Formatted version (no explanations, just the formatted code):"""
             
             logger.info("Sending format request to Together API...")
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            parts = []
+            async for delta in self.client.stream_chat(
+                self.model,
+                [{"role": "user", "content": prompt}],
                 max_tokens=2000,  # Large token limit for whole files
                 temperature=0.3,  # Lower temperature for more consistent formatting
                 top_p=0.2,
                 top_k=40,
                 repetition_penalty=1,
-                stop=["<|eot_id|>", "<|eom_id|>"],
-                stream=True
-            )
+                stop=["<|eot_id|>", "<|eom_id|>"]
+            ):
+                parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
             
-            logger.info("Received streaming response from Together API")
-            
-            formatted_code = ""
-            for token in response:
-                if hasattr(token, 'choices'):
-                    formatted_code += token.choices[0].delta.content
+            logger.info("Received streamed response from Together API")
             
             # Clean up the formatted code
-            formatted_code = self._clean_formatting(formatted_code)
+            formatted_code = self._clean_formatting("".join(parts))
             
             # Generate diff information
             diff_info = self._generate_diff(code, formatted_code)
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import threading
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+class ProviderError(Exception):
+    """Raised when a provider answers with an error status or an error event"""
+    def __init__(self, provider, status, message):
+        super().__init__(f"{provider} error {status}: {message}")
+        self.provider = provider
+        self.status = status
+
+class ProviderClient:
+    """
+    Async HTTP client for one provider and API key. Requests share one
+    aiohttp session per event loop, so connections are pooled and kept
+    alive between calls made on the same loop.
+    """
+    name = "provider"
+    base_url = ""
+    # Concurrent connections kept per client
+    POOL_SIZE = 8
+    # Seconds an idle connection is kept open for the next request
+    KEEPALIVE_SECONDS = 60
+    # Seconds to connect, and to wait between streamed chunks
+    CONNECT_TIMEOUT = 10
+    READ_TIMEOUT = 60
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        # event loop -> session; a session cannot be used from another loop
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _headers(self):
+        return {"Content-Type": "application/json"}
+
+    def _get_session(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for old_loop in [old_loop for old_loop in self._sessions if old_loop.is_closed()]:
+                del self._sessions[old_loop]
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=self.POOL_SIZE, keepalive_timeout=self.KEEPALIVE_SECONDS)
+                timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.CONNECT_TIMEOUT,
+                                                sock_read=self.READ_TIMEOUT)
+                session = self._sessions[loop] = aiohttp.ClientSession(
+                    base_url=self.base_url, connector=connector, timeout=timeout, headers=self._headers()
+                )
+            return session
+
+    async def _stream_events(self, path, payload, params=None):
+        """
+        POST a request and yield the JSON payload of each server-sent event
+        as it arrives, without blocking the event loop.
+        """
+        session = self._get_session()
+        async with session.post(path, json=payload, params=params) as response:
+            if response.status != 200:
+                raise ProviderError(self.name, response.status, await response.text())
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                event = json.loads(data)
+                if "error" in event:
+                    raise ProviderError(self.name, response.status, event["error"])
+                yield event
+
+    async def close(self):
+        """Close the pooled connections of the running event loop"""
+        with self._lock:
+            session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+class TogetherClient(ProviderClient):
+    name = "together"
+    base_url = "https://api.together.xyz"
+
+    def _headers(self):
+        headers = super()._headers()
+        headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    async def stream_chat(self, model, messages, **params):
+        """
+        Stream a chat completion, yielding text deltas as they arrive
+
+        Args:
+            model (str): Model name
+            messages (list): Chat messages as {"role", "content"} dicts
+            **params: Sampling parameters such as max_tokens or stop
+        """
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        async for event in self._stream_events("/v1/chat/completions", payload):
+            for choice in event.get("choices", []):
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
+
+    async def chat(self, model, messages, **params):
+        """Return a whole chat completion, streamed and joined"""
+        return "".join([delta async for delta in self.stream_chat(model, messages, **params)])
+
+class GeminiClient(ProviderClient):
+    name = "gemini"
+    base_url = "https://generativelanguage.googleapis.com"
+
+    def _headers(self):
+        headers = super()._headers()
+        # The key is sent per client, so keys never share global configuration
+        headers["x-goog-api-key"] = self.api_key
+        return headers
+
+    async def stream_generate(self, model, prompt, **generation_config):
+        """
+        Stream generated text for a prompt, yielding text deltas as they arrive
+
+        Args:
+            model (str): Model name, e.g. "gemini-pro"
+            prompt (str): The prompt text
+            **generation_config: Options such as temperature or maxOutputTokens
+        """
+        payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        path = f"/v1beta/models/{model}:streamGenerateContent"
+        async for event in self._stream_events(path, payload, params={"alt": "sse"}):
+            for candidate in event.get("candidates", []):
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        yield part["text"]
+
+    async def generate(self, model, prompt, **generation_config):
+        """Return the whole generated text, streamed and joined"""
+        return "".join([delta async for delta in self.stream_generate(model, prompt, **generation_config)])
+
+class ProviderPool:
+    """One client per provider and API key, shared by chat, completion and formatting"""
+    def __init__(self):
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, client_class, api_key):
+        key = (client_class.name, api_key)
+        with self._lock:
+            client = self.clients.get(key)
+            if client is None:
+                logger.info(f"Creating {client_class.name} client")
+                client = self.clients[key] = client_class(api_key)
+            return client
+
+    def together(self, api_key):
+        return self._client(TogetherClient, api_key)
+
+    def gemini(self, api_key):
+        return self._client(GeminiClient, api_key)
+
+    async def close(self):
+        """Close every client's connections"""
+        for client in list(self.clients.values()):
+            await client.close()
+
+# Create a singleton instance
+providers = ProviderPool()
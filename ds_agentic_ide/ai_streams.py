@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class AIStreams:
+    """
+    Runs AI requests on the background loop and pushes their text to the
+    frontend as it is generated. Streams are identified by ids the frontend
+    chooses, so no delta can arrive before the page knows which request it
+    belongs to. Cancelling a stream cancels its task, which closes the
+    upstream response and stops the generation.
+    """
+    # Seconds deltas are batched for before being pushed to the frontend
+    FLUSH_SECONDS = 0.03
+
+    def __init__(self, loop, push_delta, push_end):
+        """
+        Args:
+            loop (BackgroundLoop): The loop requests run on
+            push_delta (callable): Called with (stream_id, text) for new text
+            push_end (callable): Called with (stream_id, result) once a stream ends
+        """
+        self.loop = loop
+        self.push_delta = push_delta
+        self.push_end = push_end
+        # stream id -> concurrent.futures.Future of the running request
+        self.streams = {}
+        self._lock = threading.Lock()
+
+    def start(self, stream_id, request):
+        """
+        Start a streaming request, replacing any stream with the same id
+
+        Args:
+            stream_id (str): Id chosen by the frontend
+            request (callable): Takes an on_delta callback and returns the
+                coroutine producing the final response
+        """
+        self.cancel(stream_id)
+        # Held until the future is registered, so a request that ends at once cannot unregister first
+        with self._lock:
+            self.streams[stream_id] = self.loop.submit(self._run(stream_id, request))
+
+    def cancel(self, stream_id):
+        """Cancel a stream; returns False if it had already ended"""
+        with self._lock:
+            future = self.streams.pop(stream_id, None)
+        return future is not None and future.cancel()
+
+    def active(self):
+        """Return the ids of the streams still running"""
+        with self._lock:
+            return list(self.streams)
+
+    async def _run(self, stream_id, request):
+        pending = []
+        last_flush = time.monotonic()
+
+        def on_delta(text):
+            nonlocal last_flush
+            pending.append(text)
+            now = time.monotonic()
+            if now - last_flush >= self.FLUSH_SECONDS:
+                self._push(self.push_delta, stream_id, "".join(pending))
+                pending.clear()
+                last_flush = now
+
+        try:
+            result = await request(on_delta)
+        except asyncio.CancelledError:
+            logger.info(f"AI stream {stream_id} cancelled")
+            self._push(self.push_end, stream_id, {"status": "cancelled"})
+            raise
+        except Exception as e:
+            logger.error(f"Error in AI stream {stream_id}: {str(e)}", exc_info=True)
+            result = {"status": "error", "message": str(e)}
+        finally:
+            with self._lock:
+                self.streams.pop(stream_id, None)
+
+        if pending:
+            self._push(self.push_delta, stream_id, "".join(pending))
+        self._push(self.push_end, stream_id, result)
+        return result
+
+    def _push(self, push, stream_id, value):
+        try:
+            push(stream_id, value)
+        except Exception as e:
+            # The page may be reloading or closed
+            logger.debug(f"Could not push to AI stream {stream_id}: {str(e)}")
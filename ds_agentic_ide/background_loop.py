@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class BackgroundLoop:
+    """
+    A long-lived asyncio event loop on a daemon thread. Eel handlers submit
+    coroutines to it and get concurrent.futures.Future objects back, so
+    requests overlap on one loop and connections opened by one request are
+    kept alive for the next.
+    """
+    def __init__(self, name="ai-event-loop"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the loop thread if it is not running yet"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            logger.info("Background event loop started")
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coroutine):
+        """
+        Schedule a coroutine on the loop
+
+        Args:
+            coroutine: The coroutine to run
+
+        Returns:
+            concurrent.futures.Future: Resolves to the coroutine's result
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self, cleanup=None, timeout=5):
+        """
+        Stop the loop, first running an optional cleanup coroutine on it
+
+        Args:
+            cleanup: Coroutine to await before stopping, e.g. closing sessions
+            timeout (float): Seconds to wait for the cleanup and the thread
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if cleanup is not None:
+                    cleanup.close()
+                return
+            if cleanup is not None:
+                try:
+                    asyncio.run_coroutine_threadsafe(cleanup, self.loop).result(timeout)
+                except Exception as e:
+                    logger.warning(f"Error cleaning up background event loop: {str(e)}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+
+# Create a singleton instance
+background_loop = BackgroundLoop()
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def text_hash(text):
+    """Hash editor text for cache keys"""
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+class CompletionCache:
+    """
+    Completions keyed by document and by the text before and after the
+    cursor, which stand for the document version and the cursor context.
+    When the user has typed the start of a cached completion, the rest of
+    it is served without a network call. The text a cancelled completion
+    streamed before it was stopped is kept as a partial entry, which is
+    not served as a completion but can be shown while generation resumes
+    after it. Entries are evicted least recently used first, and once they
+    are older than MAX_AGE_SECONDS.
+    """
+    MAX_ENTRIES = 64
+    # Seconds a completion is served for after it was generated
+    MAX_AGE_SECONDS = 120
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_age_seconds=MAX_AGE_SECONDS):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        # (document, before hash, after hash) -> (length of the text before, completion, created, partial)
+        self.entries = OrderedDict()
+        # document -> key of its latest completion, the one typing can run ahead into
+        self.latest = {}
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+        # Requests that resumed after the text of a cancelled completion
+        self.resumed = 0
+        self.evictions = 0
+
+    def get(self, document, code_before, code_after):
+        """
+        Return the completion to show at the cursor, or None
+
+        Args:
+            document: Identifies the document, e.g. its path
+            code_before (str): Text before the cursor
+            code_after (str): Text after the cursor
+
+        Returns:
+            str: The cached completion, or the part of it not typed yet
+        """
+        self._evict_expired()
+        after_hash = text_hash(code_after)
+        key = (document, text_hash(code_before), after_hash)
+        entry = self.entries.get(key)
+        if entry is not None and not entry[3]:
+            self.entries.move_to_end(key)
+            # It is the completion shown now, so typing runs ahead into it
+            self.latest[document] = key
+            self.hits += 1
+            return entry[1]
+
+        suffix = self._typed_ahead(document, code_before, after_hash, partial=False)
+        if suffix is None:
+            self.misses += 1
+            return None
+        self.prefix_hits += 1
+        # The rest is cached at the new cursor, so typing can go on running ahead
+        created = self.entries[self.latest[document]][2]
+        self._put(key, (len(code_before), suffix, created, False))
+        self.latest[document] = key
+        return suffix
+
+    def get_partial(self, document, code_before, code_after):
+        """
+        Return the text of a cancelled completion to resume after, or None
+
+        Args:
+            document: Identifies the document, e.g. its path
+            code_before (str): Text before the cursor
+            code_after (str): Text after the cursor
+
+        Returns:
+            str: The partial completion, or the part of it not typed yet
+        """
+        self._evict_expired()
+        after_hash = text_hash(code_after)
+        key = (document, text_hash(code_before), after_hash)
+        entry = self.entries.get(key)
+        if entry is not None and entry[3]:
+            text = entry[1]
+        else:
+            text = self._typed_ahead(document, code_before, after_hash, partial=True)
+        if text is not None:
+            self.resumed += 1
+        return text
+
+    def _typed_ahead(self, document, code_before, after_hash, partial):
+        """Return what is left of the document's latest completion if it was typed up to the cursor"""
+        key = self.latest.get(document)
+        entry = self.entries.get(key) if key is not None else None
+        if entry is None or key[2] != after_hash or entry[3] != partial:
+            return None
+        before_length, completion, _, _ = entry
+        typed = code_before[before_length:]
+        if len(code_before) <= before_length or len(typed) >= len(completion) or not completion.startswith(typed):
+            return None
+        if text_hash(code_before[:before_length]) != key[1]:
+            return None
+        return completion[len(typed):]
+
+    def put(self, document, code_before, code_after, completion, partial=False):
+        """
+        Cache a completion generated at the cursor
+
+        Args:
+            document: Identifies the document, e.g. its path
+            code_before (str): Text before the cursor
+            code_after (str): Text after the cursor
+            completion (str): The completion text
+            partial (bool): True for the text of a completion cancelled while streaming
+        """
+        if not completion:
+            return
+        key = (document, text_hash(code_before), text_hash(code_after))
+        existing = self.entries.get(key)
+        if partial and existing is not None and not existing[3]:
+            # A complete completion is never replaced by a cut-off one
+            return
+        self._put(key, (len(code_before), completion, time.monotonic(), partial))
+        self.latest[document] = key
+
+    def _put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self._evict(next(iter(self.entries)))
+
+    def _evict_expired(self):
+        oldest = time.monotonic() - self.max_age_seconds
+        for key in [key for key, entry in self.entries.items() if entry[2] < oldest]:
+            self._evict(key)
+
+    def _evict(self, key):
+        del self.entries[key]
+        if self.latest.get(key[0]) == key:
+            del self.latest[key[0]]
+        self.evictions += 1
+
+    def stats(self):
+        """Return hit counters, the hit ratio, the network round-trips saved and the resumed requests"""
+        lookups = self.hits + self.prefix_hits + self.misses
+        saved = self.hits + self.prefix_hits
+        return {
+            "hits": self.hits,
+            "prefix_hits": self.prefix_hits,
+            "misses": self.misses,
+            "hit_ratio": saved / lookups if lookups else None,
+            "saved_round_trips": saved,
+            "resumed": self.resumed,
+            "entries": len(self.entries),
+            "evictions": self.evictions
+        }
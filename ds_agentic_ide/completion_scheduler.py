@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CompletionScheduler:
+    """
+    Latest-wins scheduling of completion requests, per document. A new
+    request for a document cancels the one in flight, which closes its
+    upstream stream, and waits for it to finish before sending its own.
+    Requests arriving during that wait replace the waiting one, so a burst
+    sends only its last request upstream. A request only returns a result
+    if no newer request for its document has started. Runs on the
+    background event loop.
+    """
+    def __init__(self):
+        # document -> task of its latest request
+        self.tasks = {}
+        # document -> task of the request sent upstream, until its stream is closed
+        self.sending = {}
+        self.requests = 0
+        # Requests cancelled, by a newer one or by the editor, after and before reaching the provider
+        self.cancelled_in_flight = 0
+        self.coalesced = 0
+
+    async def run(self, document, request, on_delta=None):
+        """
+        Run a completion request as the latest one for a document
+
+        Args:
+            document: Identifies the document, e.g. its path
+            request (callable): Takes an on_delta callback and returns the
+                coroutine producing the completion response
+            on_delta (callable): Optional, called with completion text as it streams in
+
+        Returns:
+            dict: The completion response
+
+        Raises:
+            asyncio.CancelledError: If a newer request for the document replaced this one
+        """
+        task = asyncio.current_task()
+        previous = self.tasks.get(document)
+        self.tasks[document] = task
+        self.requests += 1
+        sent = False
+        try:
+            if previous is not None and not previous.done():
+                previous.cancel()
+            # The replaced request, and the one it was waiting on, release
+            # their connection before this one is sent
+            waiting = [other for other in (previous, self.sending.get(document))
+                       if other is not None and not other.done()]
+            if waiting:
+                await asyncio.wait(waiting)
+            sent = True
+            self.sending[document] = task
+            return await request(on_delta)
+        except asyncio.CancelledError:
+            if sent:
+                self.cancelled_in_flight += 1
+            else:
+                self.coalesced += 1
+            logger.debug(f"Completion for {document} cancelled")
+            raise
+        finally:
+            if self.tasks.get(document) is task:
+                del self.tasks[document]
+            if self.sending.get(document) is task:
+                del self.sending[document]
+
+    def stats(self):
+        """Return how many requests were made, and how many were cancelled after or before being sent"""
+        return {
+            "requests": self.requests,
+            "cancelled_in_flight": self.cancelled_in_flight,
+            "coalesced": self.coalesced,
+            "in_flight": len(self.tasks)
+        }
+
+# Create a singleton instance
+completion_scheduler = CompletionScheduler()
@@ -1,6 +1,9 @@
 import eel
 import os
+import sys
 import json
+import threading
+from concurrent.futures import CancelledError
 import tkinter as tk
 from tkinter import filedialog
 from pathlib import Path
@@ -9,6 +12,15 @@ from watchdog.events import FileSystemEventHandler
 from ai_completion import ai_completion
 from ai_formatter import ai_formatter
 from ai_chat import ai_chat
+from ai_providers import providers
+from background_loop import background_loop
+from ai_streams import AIStreams
+from completion_scheduler import completion_scheduler
+
+# The search index is shared with the main application's ai_services package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_services.trigram_index import TrigramIndex
+from ai_services.pager import ResultPager
 
 # Initialize eel with your web files directory
 web_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web')
@@ -17,32 +29,57 @@ eel.init(web_dir)
 # Global variables
 current_workspace = None
 observer = None
+# Trigram index for file search, built on the first search of a workspace
+search_index = None
+search_pager = ResultPager()
 
 class FileSystemHandler(FileSystemEventHandler):
     def __init__(self):
-        self.last_event_time = 0
         self.debounce_seconds = 0.1  # Debounce time in seconds
+        # Paths changed since the last flush, applied to the search index in one batch
+        self.pending_paths = set()
+        self.notify_ui = False
+        self.lock = threading.Lock()
+        self.timer = None
 
     def on_any_event(self, event):
-        import time
-        current_time = time.time()
-        
-        # Debounce the events
-        if current_time - self.last_event_time < self.debounce_seconds:
+        # Opening a file, or a directory's listing changing, does not change any indexed content
+        if event.event_type == 'opened' or (event.is_directory and event.event_type == 'modified'):
             return
         
-        self.last_event_time = current_time
+        with self.lock:
+            self.pending_paths.add(event.src_path)
+            if getattr(event, 'dest_path', None):
+                self.pending_paths.add(event.dest_path)
+            # Don't trigger the UI on directory changes or .swp files
+            if not event.is_directory and not event.src_path.endswith('.swp'):
+                self.notify_ui = True
+            # Debounce the events: flush once the burst has settled
+            if self.timer is None:
+                self.timer = threading.Timer(self.debounce_seconds, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """Apply the batched changes to the search index and notify the UI"""
+        with self.lock:
+            paths, self.pending_paths = list(self.pending_paths), set()
+            notify, self.notify_ui = self.notify_ui, False
+            self.timer = None
         
-        # Don't trigger on directory changes or .swp files
-        if event.is_directory or event.src_path.endswith('.swp'):
-            return
-            
-        try:
-            # Call the JavaScript function directly
-            eel.handleFileSystemChanged()  # This is a JavaScript function
-        except:
-            # If there's an error (like during shutdown), ignore it
-            pass
+        if search_index is not None:
+            try:
+                search_index.update_paths(paths)
+            except Exception as e:
+                print(f"Error updating search index: {e}")
+        
+        if notify:
+            try:
+                # Call the JavaScript function directly
+                eel.handleFileSystemChanged()  # This is a JavaScript function
+            except:
+                # If there's an error (like during shutdown), ignore it
+                pass
 
 @eel.expose
 def select_workspace():
@@ -56,6 +93,7 @@ def select_workspace():
         global current_workspace, observer
         current_workspace = os.path.abspath(folder_path)
         start_file_watcher(current_workspace)  # Start watching the new workspace
+        start_search_index(current_workspace)  # Index in the background so the first search is fast
         return {"status": "success", "data": current_workspace}
     return {"status": "error", "message": "No folder selected"}
 
@@ -189,11 +227,82 @@ def start_file_watcher(path):
     observer.schedule(event_handler, path, recursive=True)
     observer.start()
 
+def report_index_progress(done, total):
+    """Push background indexing progress to the status bar"""
+    try:
+        eel.updateIndexProgress(done, total)  # This is a JavaScript function
+    except:
+        # The page may be reloading or closed
+        pass
+
+def start_search_index(path):
+    """Start building the search index of a workspace on a background thread"""
+    global search_index
+    if search_index is not None:
+        search_index.cancel()
+    search_index = TrigramIndex(path)
+    threading.Thread(target=search_index.build, args=(report_index_progress,), daemon=True).start()
+    return search_index
+
+def get_search_index():
+    """Return the search index for the current workspace; it may still be building"""
+    if search_index is None or search_index.root != current_workspace:
+        return start_search_index(current_workspace)
+    return search_index
+
+@eel.expose
+def search_files(query, content=False, regex=False):
+    """Search file paths, or contents, and return the first page of matches"""
+    try:
+        if current_workspace is None:
+            return {"status": "error", "message": "No workspace selected"}
+        if not query:
+            return {"status": "success", "data": {"id": None, "items": [], "done": True}}
+        index = get_search_index()
+        page = search_pager.start(index.search(query, content=content, regex=regex))
+        # Results come from a partial index until the background build finishes
+        page["indexing"] = not index.ready
+        return {"status": "success", "data": page}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@eel.expose
+def search_files_page(search_id):
+    """Return the next page of a search started with search_files"""
+    try:
+        return {"status": "success", "data": search_pager.next_page(search_id)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@eel.expose
+def cancel_search(search_id):
+    """Drop a search whose results are no longer displayed"""
+    search_pager.cancel(search_id)
+    return {"status": "success"}
+
+# Seconds between checks while a handler waits on the background loop
+ASYNC_POLL_SECONDS = 0.01
+
+def run_async(coroutine):
+    """
+    Run a coroutine on the shared background event loop and return its result.
+    Since we can't use async/await with eel.expose directly, the handler
+    waits on the returned future with eel.sleep, which lets other eel
+    handlers run in the meantime, so requests overlap instead of queueing.
+    """
+    future = background_loop.submit(coroutine)
+    while not future.done():
+        eel.sleep(ASYNC_POLL_SECONDS)
+    return future.result()
+
 @eel.expose
-def get_code_completion(code_context, cursor_position, file_type):
-    """Get AI-powered code completion suggestions"""
+def get_code_completion(code_context, cursor_position, file_type, document=None):
+    """Get AI-powered code completion suggestions; a newer request for the same document replaces this one"""
     try:
-        return ai_completion.get_completion(code_context, cursor_position, file_type)
+        return run_async(completion_scheduler.run(document, lambda on_delta: ai_completion.get_completion(
+            code_context, cursor_position, file_type, on_delta, document)))
+    except CancelledError:
+        return {"status": "cancelled", "message": "Replaced by a newer completion request"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -201,14 +310,7 @@ def get_code_completion(code_context, cursor_position, file_type):
 def format_code(code, file_type):
     """Format code using AI suggestions"""
     try:
-        # Since we can't use async/await with eel.expose directly,
-        # we'll run the async function synchronously
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(ai_formatter.format_code(code, file_type))
-        loop.close()
-        return result
+        return run_async(ai_formatter.format_code(code, file_type))
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -216,16 +318,61 @@ def format_code(code, file_type):
 def send_chat_message(message, model_preference="gemini", context=None):
     """Send a message to the AI chat system"""
     try:
-        # Run the async function synchronously
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(ai_chat.send_message(message, model_preference, context))
-        loop.close()
-        return result
+        return run_async(ai_chat.send_message(message, model_preference, context))
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def push_stream_delta(stream_id, text):
+    """Push newly generated text of a stream to the page"""
+    eel.aiStreamDelta(stream_id, text)  # This is a JavaScript function
+
+def push_stream_end(stream_id, result):
+    """Push the final response of a stream, or its cancellation, to the page"""
+    eel.aiStreamEnd(stream_id, result)  # This is a JavaScript function
+
+# Streaming requests push their text to the page as it is generated
+ai_streams = AIStreams(background_loop, push_stream_delta, push_stream_end)
+
+@eel.expose
+def stream_code_completion(stream_id, code_context, cursor_position, file_type, document=None):
+    """
+    Start a code completion whose text is pushed to aiStreamDelta as it
+    streams in. A newer completion for the same document cancels this
+    stream, so its result is never delivered.
+    """
+    ai_streams.start(stream_id, lambda on_delta: completion_scheduler.run(
+        document, lambda on_delta: ai_completion.get_completion(
+            code_context, cursor_position, file_type, on_delta, document),
+        on_delta))
+    return {"status": "success", "data": {"stream_id": stream_id}}
+
+@eel.expose
+def stream_format_code(stream_id, code, file_type):
+    """Start formatting code, pushing the formatted text to aiStreamDelta as it streams in"""
+    ai_streams.start(stream_id, lambda on_delta: ai_formatter.format_code(code, file_type, on_delta))
+    return {"status": "success", "data": {"stream_id": stream_id}}
+
+@eel.expose
+def stream_chat_message(stream_id, message, model_preference="gemini", context=None):
+    """Send a chat message whose reply is pushed to aiStreamDelta as it streams in"""
+    ai_streams.start(stream_id, lambda on_delta: ai_chat.send_message(
+        message, model_preference, context, on_delta))
+    return {"status": "success", "data": {"stream_id": stream_id}}
+
+@eel.expose
+def cancel_ai_stream(stream_id):
+    """Stop a streaming request; the upstream generation is closed with it"""
+    ai_streams.cancel(stream_id)
+    return {"status": "success"}
+
+@eel.expose
+def get_completion_stats():
+    """Return completion scheduling counters and the completion cache's hit ratio and saved round-trips"""
+    return {"status": "success", "data": {
+        "scheduler": completion_scheduler.stats(),
+        "cache": ai_completion.cache.stats()
+    }}
+
 @eel.expose
 def clear_chat_history():
     """Clear the chat conversation history"""
@@ -237,4 +384,7 @@ eel.start('index.html', size=(1200, 800))
 # Stop the observer when the application closes
 if observer:
     observer.stop()
-    observer.join() 
\ No newline at end of file
+    observer.join()
+
+# Close pooled provider connections and stop the background loop
+background_loop.stop(providers.close()) 
\ No newline at end of file
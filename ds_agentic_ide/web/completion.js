@@ -5,6 +5,7 @@ class CodeCompletion {
         this.debounceTimeout = null;
         this.currentCompletion = null;
         this.isShowingCompletion = false;
+        this.stream = null;  // The completion being streamed, if any
         
         // Configure Ace editor for completions
         console.log('Configuring Ace editor for completions...');
@@ -130,12 +131,27 @@ class CodeCompletion {
                 cursorOffset
             });
             
-            const result = await eel.get_code_completion(code, cursorOffset, fileType)();
+            // Ghost text grows as the completion streams in
+            this.cancelStream();
+            const stream = this.stream = startAIStream(
+                // The backend cancels any older completion of the same file
+                id => eel.stream_code_completion(id, code, cursorOffset, fileType, currentFile || ''),
+                text => this.appendCompletion(text)
+            );
+            const result = await stream.result;
             console.log('Received completion result:', result);
             
+            // Typing or moving the cursor cancels the stream, so a finished one is still current
+            if (this.stream !== stream || result.status === 'cancelled') {
+                return;
+            }
+            this.stream = null;
+            
             if (result.status === 'success' && result.data) {
-                console.log('Showing completion:', result.data);
-                this.showCompletion(result.data);
+                if (!this.currentCompletion) {
+                    console.log('Showing completion:', result.data);
+                    this.showCompletion(result.data);
+                }
             } else {
                 console.error('Error getting completion:', result.message);
             }
@@ -189,6 +205,22 @@ class CodeCompletion {
         console.log('Ghost text displayed');
     }
     
+    appendCompletion(text) {
+        if (!this.currentCompletion) {
+            this.showCompletion(text);
+            return;
+        }
+        this.currentCompletion.text += text;
+        this.currentCompletion.element.textContent = this.currentCompletion.text;
+    }
+    
+    cancelStream() {
+        if (this.stream) {
+            this.stream.cancel();
+            this.stream = null;
+        }
+    }
+    
     acceptCompletion() {
         if (this.currentCompletion) {
             console.log("Accepting completion:", this.currentCompletion);
@@ -208,6 +240,7 @@ class CodeCompletion {
     
     clearCurrentCompletion() {
         console.log('Clearing current completion...');
+        this.cancelStream();
         if (this.currentCompletion) {
             console.log('Removing completion elements');
             // Remove the marker
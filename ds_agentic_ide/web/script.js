@@ -996,6 +996,69 @@ function updateCursorPosition() {
         `<i class="fas fa-map-marker-alt"></i> Ln ${line}, Col ${column}`;
 }
 
+// Called from Python while the workspace search index is built in the background
+function updateIndexProgress(done, total) {
+    const indexStatus = document.getElementById('index-status');
+    const indexing = done < total;
+    indexStatus.style.display = indexing ? '' : 'none';
+    indexStatus.innerHTML = `<i class="fas fa-sync fa-spin"></i> Indexing ${done}/${total}`;
+    
+    // Searches made during the build only saw part of the workspace
+    const searchInput = document.getElementById('context-search');
+    if (!indexing && searchInput && searchInput.value.trim()) {
+        searchContextFiles(searchInput.value.trim());
+    }
+}
+eel.expose(updateIndexProgress);
+
+// Streaming AI requests: stream id -> { onDelta, resolve }
+const aiStreams = new Map();
+let aiStreamCounter = 0;
+
+// Start a streaming AI request. startCall(streamId) makes the eel call and
+// onDelta receives the text as it is generated. The id is chosen here, so
+// text pushed before the eel call returns is not lost. Returns
+// { id, result, cancel }; result resolves to the final response, or to
+// { status: 'cancelled' } once the stream is cancelled.
+function startAIStream(startCall, onDelta) {
+    const id = `stream-${Date.now()}-${++aiStreamCounter}`;
+    const result = new Promise(resolve => aiStreams.set(id, { onDelta, resolve }));
+    startCall(id)().then(response => {
+        if (response.status !== 'success') finishAIStream(id, response);
+    }).catch(error => finishAIStream(id, { status: 'error', message: String(error) }));
+    
+    return {
+        id,
+        result,
+        cancel: () => {
+            if (!aiStreams.has(id)) return;
+            eel.cancel_ai_stream(id)();
+            finishAIStream(id, { status: 'cancelled' });
+        }
+    };
+}
+
+function finishAIStream(streamId, result) {
+    const stream = aiStreams.get(streamId);
+    if (!stream) return;
+    aiStreams.delete(streamId);
+    stream.resolve(result);
+}
+
+// Called from Python with text generated for a stream
+function aiStreamDelta(streamId, text) {
+    const stream = aiStreams.get(streamId);
+    // Text of cancelled streams may still be in flight
+    if (stream && stream.onDelta) stream.onDelta(text);
+}
+eel.expose(aiStreamDelta);
+
+// Called from Python with the final response of a stream
+function aiStreamEnd(streamId, result) {
+    finishAIStream(streamId, result);
+}
+eel.expose(aiStreamEnd);
+
 function updateFileStatus() {
     const fileStatus = document.getElementById('file-status');
     if (!currentFile) {
@@ -1087,8 +1150,17 @@ async function formatCurrentCode(silent = false) {
         const statusBar = document.getElementById('file-status');
         statusBar.innerHTML = '<i class="fas fa-sync fa-spin"></i> Formatting...';
         
-        // Use await here to properly handle the async call
-        const result = await eel.format_code(code, fileType)();
+        // Show how much has been formatted while the result streams in
+        let received = '';
+        const stream = startAIStream(
+            id => eel.stream_format_code(id, code, fileType),
+            text => {
+                received += text;
+                const lines = received.split('\n').length;
+                statusBar.innerHTML = `<i class="fas fa-sync fa-spin"></i> Formatting... ${lines} lines`;
+            }
+        );
+        const result = await stream.result;
         
         if (result.status === 'success') {
             const { formatted_code, diff } = result.data;
@@ -1265,7 +1337,19 @@ async function silentFormat() {
 }
 
 // Chat functionality
+let chatStream = null;  // The reply being streamed, if any
+
+function cancelChatStream() {
+    if (chatStream) {
+        chatStream.cancel();
+        chatStream = null;
+    }
+}
+
 function newChat() {
+    // A reply still streaming belongs to the chat being left
+    cancelChatStream();
+    
     // Clear the messages area
     const chatMessages = document.getElementById('chat-messages');
     chatMessages.innerHTML = '';
@@ -1330,6 +1414,7 @@ function loadChat(chatId) {
     const chat = chatHistory.get(chatId);
     if (!chat) return;
     
+    cancelChatStream();
     currentChatId = chatId;
     
     // Update messages
@@ -1399,8 +1484,25 @@ async function sendChatMessage() {
             content: contextFiles[index]
         })).filter(file => file.content !== null);
         
+        // The reply is shown as plain text while it streams, then rendered with its code blocks
+        const chatMessages = document.getElementById('chat-messages');
+        const replyDiv = document.createElement('div');
+        replyDiv.className = 'chat-message assistant-message';
+        replyDiv.style.whiteSpace = 'pre-wrap';
+        
         // Send message with context
-        const result = await eel.send_chat_message(message, selectedModel, context)();
+        cancelChatStream();
+        const stream = chatStream = startAIStream(
+            id => eel.stream_chat_message(id, message, selectedModel, context),
+            text => {
+                if (!replyDiv.isConnected) chatMessages.appendChild(replyDiv);
+                replyDiv.textContent += text;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            }
+        );
+        const result = await stream.result;
+        if (chatStream === stream) chatStream = null;
+        replyDiv.remove();
         
         if (result.status === 'success') {
             // Add AI response
@@ -1565,17 +1667,44 @@ async function updateContextFilesList() {
         const files = getAllFiles(result.data);
         renderContextFiles(files);
         
-        // Add search functionality
+        // Add search functionality: search the whole workspace, page by page
         searchInput.oninput = () => {
-            const searchTerm = searchInput.value.toLowerCase();
-            const filteredFiles = files.filter(file => 
-                file.path.toLowerCase().includes(searchTerm)
-            );
-            renderContextFiles(filteredFiles);
+            const searchTerm = searchInput.value.trim();
+            if (!searchTerm) {
+                contextSearchGeneration++;
+                renderContextFiles(files);
+                return;
+            }
+            searchContextFiles(searchTerm);
         };
     }
 }
 
+// Bumped on every query so pages of an older search are discarded
+let contextSearchGeneration = 0;
+
+async function searchContextFiles(query) {
+    const generation = ++contextSearchGeneration;
+    const matches = [];
+    let result = await eel.search_files(query)();
+    
+    while (result.status === "success") {
+        const page = result.data;
+        if (generation !== contextSearchGeneration) {
+            if (!page.done) eel.cancel_search(page.id)();
+            return;
+        }
+        page.items.forEach(item => matches.push({
+            ...item,
+            type: 'file',
+            extension: item.name.includes('.') ? item.name.split('.').pop() : ''
+        }));
+        renderContextFiles(matches);
+        if (page.done) return;
+        result = await eel.search_files_page(page.id)();
+    }
+}
+
 function getAllFiles(items, path = '') {
     let files = [];
     items.forEach(item => {
@@ -1,11 +1,15 @@
 import eel
 import os
 import json
-from pathlib import Path
 from tkinter import Tk, filedialog
 import sys
+import re
 import fnmatch
+import threading
 from ai_services.context_manager import ContextManager
+from ai_services.walker import WorkspaceWalker
+from ai_services.trigram_index import TrigramIndex
+from ai_services.pager import ResultPager
 from ai_services.ai_model import AIModelService, AIServiceError, ConfigurationError
 
 # Initialize eel with your web files directory
@@ -17,12 +21,21 @@ current_workspace = {
     'open_files': []
 }
 
-# Initialize context manager
+# Context manager for the AI features, indexed in the background when a folder is opened
 context_manager = None
 
 # Initialize AI service
 ai_service = None
 
+# Trigram index behind the search panel, built in the background when a folder is opened
+search_index = None
+search_pager = ResultPager()
+# Highlighted hunks of proposed changes, fetched as the diff view scrolls. Streams are
+# never evicted while the view pages through them; each proposal file has at most one,
+# dropped when it finishes, is cancelled, or the proposals are replaced
+diff_pager = ResultPager(page_size=20, max_streams=None)
+diff_streams = {}
+
 def is_valid_path(path):
     """Check if a path is valid and within the workspace"""
     try:
@@ -45,34 +58,98 @@ def choose_folder():
     
     if folder_path:
         current_workspace['path'] = folder_path
+        _start_indexing(folder_path)
         return {
             'path': folder_path,
             'files': get_directory_structure(folder_path)
         }
     return None
 
+def _report_index_progress(done, total):
+    """Push background indexing progress to the status bar"""
+    try:
+        eel.updateIndexProgress(done, total)
+    except Exception:
+        # The page may be reloading or closed
+        pass
+
+def _start_context_manager(workspace):
+    """Start indexing a workspace for the AI features without blocking"""
+    global context_manager
+    if context_manager is not None:
+        context_manager.cancel()
+    context_manager = ContextManager(workspace, progress=_report_index_progress, background=True)
+    return context_manager
+
+def _start_search_index(workspace):
+    """Start building the search index of a workspace on a background thread"""
+    global search_index
+    if search_index is not None:
+        search_index.cancel()
+    search_index = TrigramIndex(os.path.abspath(workspace))
+    threading.Thread(target=search_index.build, daemon=True).start()
+    return search_index
+
+def _start_indexing(workspace):
+    """Warm both indexes as soon as a workspace is opened"""
+    try:
+        _start_search_index(workspace)
+        _start_context_manager(workspace)
+    except Exception as e:
+        print(f"Error starting workspace indexing: {e}")
+
+def _get_search_index():
+    """Return the search index for the current workspace; it may still be building"""
+    workspace = os.path.abspath(current_workspace['path'])
+    if search_index is None or search_index.root != workspace:
+        return _start_search_index(workspace)
+    return search_index
+
+def _update_search_index(*paths):
+    """Re-index paths changed through the IDE so search results and AI contexts stay current"""
+    if not current_workspace['path']:
+        return
+    if search_index is not None:
+        try:
+            search_index.update_paths(list(paths))
+        except Exception as e:
+            print(f"Error updating search index: {e}")
+    # Moves the index generation on, which drops cached queries and contexts
+    if context_manager is not None and context_manager.workspace_path == current_workspace['path']:
+        try:
+            context_manager.refresh_index(list(paths))
+        except Exception as e:
+            print(f"Error updating context index: {e}")
+
+def _build_directory_structure(walker, rel_dir):
+    """Build the nested structure of one directory using a shared walker"""
+    structure = []
+    for entry in walker.list_dir(rel_dir):
+        if entry.name.startswith('.'):
+            continue
+        
+        item = {
+            'name': entry.name,
+            'path': entry.rel_path.replace('\\', '/'),
+            'type': 'folder' if entry.is_dir else 'file'
+        }
+        
+        if entry.is_dir:
+            item['children'] = _build_directory_structure(walker, entry.rel_path)
+        
+        structure.append(item)
+    
+    # Sort folders first, then files, both alphabetically
+    return sorted(structure, key=lambda x: (x['type'] != 'folder', x['name'].lower()))
+
 @eel.expose
 def get_directory_structure(path):
     """Get the directory structure as a nested dictionary"""
-    structure = []
     try:
-        for entry in os.scandir(path):
-            if entry.name.startswith('.'):
-                continue
-            
-            item = {
-                'name': entry.name,
-                'path': str(Path(entry.path).relative_to(current_workspace['path'])).replace('\\', '/'),
-                'type': 'folder' if entry.is_dir() else 'file'
-            }
-            
-            if entry.is_dir():
-                item['children'] = get_directory_structure(entry.path)
-            
-            structure.append(item)
-        
-        # Sort folders first, then files, both alphabetically
-        return sorted(structure, key=lambda x: (x['type'] != 'folder', x['name'].lower()))
+        # Ignored folders (.gitignore, node_modules, venv, ...) are left out
+        walker = WorkspaceWalker(current_workspace['path'], max_file_size=None, skip_binary=False)
+        rel_dir = os.path.relpath(path, current_workspace['path'])
+        return _build_directory_structure(walker, '' if rel_dir == '.' else rel_dir)
     except Exception as e:
         print(f"Error reading directory: {e}")
         return []
@@ -96,6 +173,7 @@ def save_file(file_path, content):
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
         with open(full_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        _update_search_index(file_path)
         return {'success': True}
     except Exception as e:
         return {'success': False, 'error': str(e)}
@@ -145,6 +223,7 @@ def create_file(file_path):
         # Create empty file
         with open(full_path, 'w', encoding='utf-8') as f:
             f.write('')
+        _update_search_index(file_path)
         
         return {
             'success': True,
@@ -160,35 +239,95 @@ def delete_file(file_path):
         full_path = os.path.join(current_workspace['path'], file_path)
         if os.path.exists(full_path):
             os.remove(full_path)
+            _update_search_index(file_path)
             return {'success': True}
         return {'success': False, 'error': 'File does not exist'}
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
 @eel.expose
-def search_files(query):
-    """Search for files in the workspace"""
+def search_files(query, content=False, regex=False):
+    """
+    Search file paths, or file contents, for a case-insensitive substring or
+    regular expression. Returns the first page of results; further pages
+    are fetched with search_files_page. 'indexing' is set while the index
+    is still being built and results may be incomplete.
+    """
     if not current_workspace['path'] or not query:
-        return []
-    
-    results = []
-    query = query.lower()
+        return {'id': None, 'items': [], 'done': True}
     
     try:
-        for root, _, files in os.walk(current_workspace['path']):
-            for file in files:
-                if query in file.lower():
-                    full_path = os.path.join(root, file)
-                    rel_path = str(Path(full_path).relative_to(current_workspace['path'])).replace('\\', '/')
-                    results.append({
-                        'name': file,
-                        'path': rel_path
-                    })
-        
-        return sorted(results, key=lambda x: x['name'].lower())
+        index = _get_search_index()
+        page = search_pager.start(index.search(query, content=content, regex=regex))
+        page['indexing'] = not index.ready
+        return page
+    except re.error as e:
+        return {'id': None, 'items': [], 'done': True, 'error': f'Invalid regular expression: {e}'}
     except Exception as e:
         print(f"Error searching files: {e}")
-        return []
+        return {'id': None, 'items': [], 'done': True, 'error': str(e)}
+
+@eel.expose
+def search_files_page(search_id):
+    """Return the next page of a search started with search_files"""
+    try:
+        return search_pager.next_page(search_id)
+    except Exception as e:
+        print(f"Error searching files: {e}")
+        return {'id': search_id, 'items': [], 'done': True, 'error': str(e)}
+
+@eel.expose
+def cancel_search(search_id):
+    """Drop a search whose results are no longer displayed"""
+    search_pager.cancel(search_id)
+
+@eel.expose
+def get_diff_hunks(file_path):
+    """
+    Start streaming the highlighted hunks of a proposed change and return
+    the first page as {'id', 'items', 'done'}; later pages are fetched with
+    get_diff_hunks_page. Hunks are only rendered when a page asks for them.
+    """
+    if context_manager is None:
+        return {'id': None, 'items': [], 'done': True}
+    try:
+        _cancel_diff_stream(file_path)
+        page = diff_pager.start(context_manager.iter_diff_hunks(file_path))
+        if not page['done']:
+            diff_streams[file_path] = page['id']
+        return page
+    except Exception as e:
+        print(f"Error rendering diff: {e}")
+        return {'id': None, 'items': [], 'done': True, 'error': str(e)}
+
+@eel.expose
+def get_diff_hunks_page(stream_id):
+    """Return the next page of hunks started with get_diff_hunks"""
+    try:
+        page = diff_pager.next_page(stream_id)
+        if page['done']:
+            _forget_diff_stream(stream_id)
+        return page
+    except Exception as e:
+        print(f"Error rendering diff: {e}")
+        return {'id': stream_id, 'items': [], 'done': True, 'error': str(e)}
+
+@eel.expose
+def cancel_diff_hunks(stream_id):
+    """Drop a hunk stream whose file is no longer displayed"""
+    diff_pager.cancel(stream_id)
+    _forget_diff_stream(stream_id)
+
+def _forget_diff_stream(stream_id):
+    for file_path, open_id in list(diff_streams.items()):
+        if open_id == stream_id:
+            del diff_streams[file_path]
+
+def _cancel_diff_stream(file_path):
+    """Close the open hunk stream of a proposal file, if any"""
+    stream_id = diff_streams.pop(file_path, None)
+    if stream_id is not None:
+        diff_pager.cancel(stream_id)
 
 @eel.expose
 def rename_item(old_path, new_name):
@@ -208,6 +347,7 @@ def rename_item(old_path, new_name):
             return {'success': False, 'error': 'An item with that name already exists'}
             
         os.rename(old_full_path, new_full_path)
+        _update_search_index(old_path, new_path)
         return {
             'success': True,
             'old_path': old_path,
@@ -232,11 +372,26 @@ def delete_item(path):
             shutil.rmtree(full_path)
         else:
             os.remove(full_path)
+        _update_search_index(path)
             
         return {'success': True}
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
+@eel.expose
+def get_index_status():
+    """Return the progress of the workspace index used by the AI features"""
+    if context_manager is None:
+        return {'indexing': False, 'done': 0, 'total': 0, 'files': 0, 'error': None}
+    return context_manager.index_status()
+
+@eel.expose
+def get_cache_stats():
+    """Return hit rates of the AI feature caches, such as rendered diffs"""
+    if context_manager is None:
+        return {}
+    return context_manager.cache_stats()
+
 @eel.expose
 async def process_build_prompt(prompt):
     global ai_service, context_manager
@@ -254,16 +409,22 @@ async def process_build_prompt(prompt):
             except AIServiceError as e:
                 return {'message': f'Failed to initialize AI service: {str(e)}'}
         
-        if not context_manager:
+        if not context_manager or context_manager.workspace_path != current_workspace['path']:
             try:
-                context_manager = ContextManager(current_workspace['path'])
+                _start_context_manager(current_workspace['path'])
             except Exception as e:
                 return {'message': f'Failed to initialize context manager: {str(e)}'}
         
+        # Answer from the files indexed so far rather than waiting for the build
+        indexing = context_manager.indexing
+        
         # Collect relevant file contexts
         try:
             contexts = context_manager.collect_file_contexts(prompt)
             if not contexts:
+                if indexing:
+                    return {'message': 'No relevant files found yet; the workspace is still being indexed.',
+                            'indexing': True}
                 return {'message': 'No relevant files found for the given prompt.'}
         except Exception as e:
             return {'message': f'Error collecting file contexts: {str(e)}'}
@@ -272,37 +433,36 @@ async def process_build_prompt(prompt):
         try:
             files_to_modify = context_manager.analyze_changes_needed(prompt)
             if not files_to_modify:
-                return {'message': 'No changes needed based on the prompt.'}
+                return {'message': 'No changes needed based on the prompt.', 'indexing': indexing}
         except Exception as e:
             return {'message': f'Error analyzing changes needed: {str(e)}'}
         
         # Generate changes using AI model
         try:
-            file_contexts = [
-                {'path': ctx.path, 'content': ctx.content}
-                for ctx in contexts
-                if ctx.path in files_to_modify
-            ]
+            packed = context_manager.pack_contexts(
+                prompt,
+                [ctx for ctx in contexts if ctx.path in files_to_modify],
+                ai_service.config.context_tokens
+            )
+            file_contexts = packed.to_prompt_contexts()
             changes = await ai_service.generate_changes(prompt, file_contexts)
         except AIServiceError as e:
             return {'message': f'AI service error: {str(e)}'}
         except Exception as e:
             return {'message': f'Error generating changes: {str(e)}'}
         
-        # Apply changes and generate diffs
+        # Summarize the changes; their highlighted hunks are fetched with get_diff_hunks
         try:
-            diffs = context_manager.apply_changes(changes)
+            # Streams of the previous proposals can no longer be shown
+            for file_path in list(diff_streams):
+                _cancel_diff_stream(file_path)
             return {
-                'changes': [
-                    {
-                        'file_path': path,
-                        'diff': diff
-                    }
-                    for path, diff in diffs.items()
-                ]
+                'changes': context_manager.propose_changes(changes),
+                'context_tokens': packed.report(),
+                'indexing': indexing
             }
         except Exception as e:
-            return {'message': f'Error applying changes: {str(e)}'}
+            return {'message': f'Error generating diffs: {str(e)}'}
         
     except Exception as e:
         print(f"Unexpected error in process_build_prompt: {str(e)}")
@@ -0,0 +1,114 @@
+"""
+Completion cache tests: completions must be served again at the same
+cursor, and the untyped rest of the latest one must be served while the
+user types its start, but never after the text around the cursor changed
+in any other way. Partial entries from cancelled completions must only be
+offered for resuming and never replace complete ones, and entries must be
+evicted least recently used first and once they are too old.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ds_agentic_ide'))
+
+import completion_cache
+from completion_cache import CompletionCache
+
+BEFORE = 'def total(items):\n    return '
+AFTER = '\n\nprint(total([1, 2]))\n'
+COMPLETION = 'sum(item.price for item in items)'
+
+@pytest.fixture
+def cache():
+    cache = CompletionCache()
+    cache.put('a.py', BEFORE, AFTER, COMPLETION)
+    return cache
+
+def test_same_cursor_is_served(cache):
+    assert cache.get('a.py', BEFORE, AFTER) == COMPLETION
+    assert cache.get('b.py', BEFORE, AFTER) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+def test_typing_ahead_serves_the_rest(cache):
+    assert cache.get('a.py', BEFORE + 'sum(', AFTER) == 'item.price for item in items)'
+    assert cache.get('a.py', BEFORE + 'sum(item.', AFTER) == 'price for item in items)'
+    # Deleting back to an earlier cursor serves the rest cached there
+    assert cache.get('a.py', BEFORE + 'sum(', AFTER) == 'item.price for item in items)'
+    assert cache.stats()['prefix_hits'] == 2 and cache.stats()['hits'] == 1
+
+@pytest.mark.parametrize('code_before, code_after', [
+    (BEFORE + 'max(', AFTER),
+    (BEFORE + COMPLETION, AFTER),
+    (BEFORE + COMPLETION + ' + 1', AFTER),
+    (BEFORE + 'sum(', AFTER + '# edited\n'),
+    (BEFORE.replace('total', 'tally') + 'sum(', AFTER),
+    (BEFORE[:-1], AFTER),
+])
+def test_other_edits_miss(cache, code_before, code_after):
+    assert cache.get('a.py', code_before, code_after) is None
+
+def test_typing_ahead_follows_the_shown_completion(cache):
+    cache.put('a.py', 'x = ', '', '42')
+
+    assert cache.get('a.py', BEFORE, AFTER) == COMPLETION
+    assert cache.get('a.py', BEFORE + 'sum', AFTER) == '(item.price for item in items)'
+
+def test_partial_is_only_resumed():
+    cache = CompletionCache()
+    cache.put('a.py', BEFORE, AFTER, 'sum(item.', partial=True)
+
+    assert cache.get('a.py', BEFORE, AFTER) is None
+    assert cache.get_partial('a.py', BEFORE, AFTER) == 'sum(item.'
+    assert cache.get_partial('a.py', BEFORE + 'sum(', AFTER) == 'item.'
+    assert cache.get_partial('a.py', BEFORE + 'max(', AFTER) is None
+    assert cache.stats()['resumed'] == 2
+
+def test_complete_entries_are_kept(cache):
+    cache.put('a.py', BEFORE, AFTER, 'sum(', partial=True)
+    assert cache.get('a.py', BEFORE, AFTER) == COMPLETION
+    assert cache.get_partial('a.py', BEFORE, AFTER) is None
+
+    cache.put('b.py', BEFORE, AFTER, 'sum(', partial=True)
+    cache.put('b.py', BEFORE, AFTER, COMPLETION)
+    assert cache.get('b.py', BEFORE, AFTER) == COMPLETION
+
+def test_least_recently_used_is_evicted():
+    cache = CompletionCache(max_entries=2)
+    cache.put('a.py', 'a = ', '', '1')
+    cache.put('b.py', 'b = ', '', '2')
+    cache.get('a.py', 'a = ', '')
+    cache.put('c.py', 'c = ', '', '3')
+
+    assert cache.get('b.py', 'b = ', '') is None
+    assert cache.get('a.py', 'a = ', '') == '1'
+    assert cache.stats()['evictions'] == 1
+
+def test_old_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(completion_cache.time, 'monotonic', lambda: now[0])
+    cache = CompletionCache(max_age_seconds=60)
+    cache.put('a.py', BEFORE, AFTER, COMPLETION)
+
+    now[0] += 30
+    assert cache.get('a.py', BEFORE + 'sum(', AFTER) == 'item.price for item in items)'
+    # Typed-ahead entries keep the age of the completion they came from
+    now[0] += 31
+    assert cache.get('a.py', BEFORE + 'sum(', AFTER) is None
+    assert cache.get('a.py', BEFORE, AFTER) is None
+    assert cache.stats()['entries'] == 0
+
+def test_stats():
+    cache = CompletionCache()
+    assert cache.stats()['hit_ratio'] is None
+
+    cache.put('a.py', BEFORE, AFTER, COMPLETION)
+    cache.get('a.py', BEFORE, AFTER)
+    cache.get('a.py', BEFORE + 's', AFTER)
+    cache.get('a.py', BEFORE + 'x', AFTER)
+    cache.get('a.py', '', '')
+
+    assert cache.stats() == {'hits': 1, 'prefix_hits': 1, 'misses': 2, 'hit_ratio': 0.5,
+                             'saved_round_trips': 2, 'resumed': 0, 'entries': 2, 'evictions': 0}
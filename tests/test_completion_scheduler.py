@@ -0,0 +1,126 @@
+"""
+Completion scheduler tests: a new request for a document must cancel the
+one in flight and wait for its upstream stream to close before sending,
+requests arriving meanwhile must be coalesced so only the last one is
+sent, replaced requests must never return a result, and documents must
+not affect each other.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ds_agentic_ide'))
+
+from completion_scheduler import CompletionScheduler
+
+class FakeUpstream:
+    """Streams a completion once released, recording sends and closes in order."""
+    def __init__(self, close_delay=0):
+        self.events = []
+        self.release = {}
+        self.close_delay = close_delay
+
+    def request(self, name):
+        async def send(on_delta):
+            self.events.append(('sent', name))
+            self.release[name] = asyncio.Event()
+            try:
+                if on_delta:
+                    on_delta(name)
+                await self.release[name].wait()
+                return {'status': 'success', 'data': name}
+            except asyncio.CancelledError:
+                # Closing the connection takes a while, like a real stream
+                await asyncio.sleep(self.close_delay)
+                self.events.append(('closed', name))
+                raise
+        return send
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+async def until_sent(upstream, name):
+    while name not in upstream.release:
+        await asyncio.sleep(0.005)
+
+def test_new_request_cancels_the_one_in_flight():
+    async def scenario():
+        scheduler = CompletionScheduler()
+        upstream = FakeUpstream(close_delay=0.01)
+        first = asyncio.create_task(scheduler.run('a.py', upstream.request('first')))
+        await settle()
+        second = asyncio.create_task(scheduler.run('a.py', upstream.request('second')))
+        await until_sent(upstream, 'second')
+        upstream.release['second'].set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == {'status': 'success', 'data': 'second'}
+        assert upstream.events == [('sent', 'first'), ('closed', 'first'), ('sent', 'second')]
+        assert scheduler.stats() == {'requests': 2, 'cancelled_in_flight': 1, 'coalesced': 0, 'in_flight': 0}
+
+    asyncio.run(scenario())
+
+def test_burst_sends_only_the_last_request():
+    async def scenario():
+        scheduler = CompletionScheduler()
+        upstream = FakeUpstream(close_delay=0.05)
+        tasks = [asyncio.create_task(scheduler.run('a.py', upstream.request('first')))]
+        await settle()
+        for name in ('second', 'third', 'fourth'):
+            tasks.append(asyncio.create_task(scheduler.run('a.py', upstream.request(name))))
+            await settle()
+        await until_sent(upstream, 'fourth')
+        upstream.release['fourth'].set()
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert [isinstance(result, asyncio.CancelledError) for result in results[:3]] == [True] * 3
+        assert results[3] == {'status': 'success', 'data': 'fourth'}
+        assert upstream.events == [('sent', 'first'), ('closed', 'first'), ('sent', 'fourth')]
+        assert scheduler.stats() == {'requests': 4, 'cancelled_in_flight': 1, 'coalesced': 2, 'in_flight': 0}
+
+    asyncio.run(scenario())
+
+def test_documents_are_independent():
+    async def scenario():
+        scheduler = CompletionScheduler()
+        upstream = FakeUpstream()
+        deltas = []
+        first = asyncio.create_task(scheduler.run('a.py', upstream.request('a'), deltas.append))
+        second = asyncio.create_task(scheduler.run('b.py', upstream.request('b'), deltas.append))
+        await settle()
+        assert scheduler.stats()['in_flight'] == 2
+        upstream.release['a'].set()
+        upstream.release['b'].set()
+
+        assert [await first, await second] == [{'status': 'success', 'data': 'a'},
+                                               {'status': 'success', 'data': 'b'}]
+        assert deltas == ['a', 'b']
+        assert scheduler.stats()['cancelled_in_flight'] == 0 and not scheduler.tasks
+
+    asyncio.run(scenario())
+
+def test_editor_cancel_closes_the_stream():
+    async def scenario():
+        scheduler = CompletionScheduler()
+        upstream = FakeUpstream()
+        task = asyncio.create_task(scheduler.run('a.py', upstream.request('first')))
+        await settle()
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert upstream.events == [('sent', 'first'), ('closed', 'first')]
+        assert scheduler.stats() == {'requests': 1, 'cancelled_in_flight': 1, 'coalesced': 0, 'in_flight': 0}
+
+        # A later request for the document runs normally
+        task = asyncio.create_task(scheduler.run('a.py', upstream.request('second')))
+        await settle()
+        upstream.release['second'].set()
+        assert await task == {'status': 'success', 'data': 'second'}
+
+    asyncio.run(scenario())
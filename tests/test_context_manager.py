@@ -0,0 +1,26 @@
+"""
+Context manager tests: refreshing the paths an edit touched moves the
+index generation on, so cached queries and contexts are dropped.
+"""
+
+import os
+
+from ai_services.context_manager import ContextManager
+
+def write(root, name, text):
+    with open(os.path.join(root, name), 'w') as f:
+        f.write(text)
+
+def test_refreshing_an_edited_file_drops_cached_contexts(tmp_path):
+    root = str(tmp_path)
+    write(root, 'billing.py', 'def charge_invoice(invoice):\n    return invoice.total\n')
+    write(root, 'shipping.py', 'def ship_parcel(parcel):\n    return parcel.weight\n')
+    manager = ContextManager(root, workers=1)
+    assert [c.path for c in manager.collect_file_contexts('charge_invoice')] == ['billing.py']
+
+    write(root, 'billing.py', 'def refund(payment):\n    return payment.amount\n')
+    write(root, 'shipping.py', 'def charge_invoice(parcel):\n    return parcel.weight\n')
+    manager.refresh_index(['billing.py', 'shipping.py'])
+
+    assert [c.path for c in manager.collect_file_contexts('charge_invoice')] == ['shipping.py']
+    assert manager.search_service.search('charge_invoice', mode='keyword')[0][0] == 'shipping.py'
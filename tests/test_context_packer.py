@@ -0,0 +1,89 @@
+"""
+Context packer tests: file costs are tracked per snippet and match the
+rendered prompt, ranked code chunks are packed with the files' sections,
+and a budget too small for any whole snippet still sends the best snippet
+of the top file that has one, truncated.
+"""
+
+import os
+
+import pytest
+
+from ai_services.context_manager import ContextManager
+from ai_services.context_packer import ContextPacker
+from ai_services.search import SearchService
+
+def make_workspace(root, files=6, functions=40):
+    for f in range(files):
+        with open(os.path.join(root, f'service_{f}.py'), 'w') as out:
+            for i in range(functions):
+                out.write(f'def handle_{f}_{i}(request):\n'
+                          f'    payload = parse_payload(request, index={i})\n'
+                          f'    return render_invoice(payload, "invoice_{f}")\n\n')
+
+@pytest.fixture
+def packer(tmp_path):
+    make_workspace(str(tmp_path))
+    service = SearchService(persist=False, workers=1)
+    service.index_workspace(str(tmp_path))
+    return ContextPacker(service)
+
+def ranked(packer, query):
+    return packer.search_service.search(query, limit=6, mode='keyword')
+
+def test_tracked_costs_match_rendered_files(packer):
+    query = 'render_invoice parse_payload'
+    packed = packer.pack(query, ranked(packer, query), token_budget=2000)
+
+    assert packed.snippets
+    for path, tokens in packed.file_tokens.items():
+        assert tokens == packer._header_tokens(path) + packer.count_tokens(packed.render(path))
+    assert packed.total_tokens == sum(packed.file_tokens.values()) <= 2000
+
+def test_best_snippet_is_truncated_when_nothing_fits(packer):
+    query = 'render_invoice parse_payload'
+    files = ranked(packer, query)
+    packed = packer.pack(query, files, token_budget=30)
+
+    path = files[0][0]
+    assert list(packed.snippets) == [path]
+    assert 0 < packed.total_tokens <= 30
+    assert packed.total_tokens == packer._header_tokens(path) + packer.count_tokens(packed.render(path))
+
+def test_truncation_skips_top_files_without_snippets(packer):
+    query = 'render_invoice parse_payload'
+    root = packer.search_service.workspace_path
+    with open(os.path.join(root, 'constants.py'), 'w') as out:
+        out.write(''.join(f'VALUE_{i} = {i}\n' for i in range(200)))
+    packer.search_service.update_paths(['constants.py'])
+    files = [('constants.py', 9.0)] + ranked(packer, query)
+
+    packed = packer.pack(query, files, token_budget=30)
+
+    assert list(packed.snippets) == [files[1][0]]
+    assert packed.skipped[0] == 'constants.py'
+
+def test_ranked_files_without_snippets_are_an_error(packer):
+    root = packer.search_service.workspace_path
+    with open(os.path.join(root, 'constants.py'), 'w') as out:
+        out.write(''.join(f'VALUE_{i} = {i}\n' for i in range(200)))
+    packer.search_service.update_paths(['constants.py'])
+
+    with pytest.raises(ValueError, match='None of the ranked files'):
+        packer.pack('render_invoice', [('constants.py', 1.0)], token_budget=30)
+
+def test_budget_below_any_line_is_an_error(packer):
+    query = 'render_invoice parse_payload'
+    with pytest.raises(ValueError, match='too small'):
+        packer.pack(query, ranked(packer, query), token_budget=5)
+
+def test_pack_contexts_offers_ranked_chunks(tmp_path):
+    make_workspace(str(tmp_path))
+    manager = ContextManager(str(tmp_path), workers=1)
+    query = 'handle_3_7 parse_payload'
+    contexts = manager.collect_file_contexts(query)
+
+    packed = manager.pack_contexts(query, contexts, token_budget=2000)
+
+    chunks = [snippet for snippet in packed.snippets['service_3.py'] if snippet.kind == 'chunk']
+    assert chunks and chunks[0].text.startswith('def handle_3_7(request):')
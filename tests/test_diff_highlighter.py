@@ -0,0 +1,105 @@
+"""
+Diff highlighter tests: each side of a diff is lexed as one document, so
+strings that open before a hunk are highlighted as strings inside it.
+"""
+
+import re
+
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+
+from ai_services.diff_highlighter import DiffHighlighter
+from ai_services.line_diff import unified_diff
+
+def make_module(lines, docstring_line=2600, edited=None):
+    """A module of simple assignments with a docstring opening well before its last lines."""
+    out = [f'value_{i} = {i}\n' for i in range(lines)]
+    out[docstring_line:docstring_line + 20] = (['"""\n'] + [f'def not_code_{i}():\n' for i in range(18)]
+                                               + ['"""\n'])
+    if edited is not None:
+        out[edited] = 'def changed():\n'
+    return ''.join(out)
+
+def rendered_lines(html):
+    return re.findall(r'<div class="diff-line">(.*?)</div>', html)
+
+def diff_of(original, modified):
+    return ''.join(unified_diff(original.splitlines(keepends=True), modified.splitlines(keepends=True),
+                                'Original', 'Modified', n=3))
+
+def test_docstring_spanning_hunk_boundary_in_large_file():
+    original = make_module(3000)
+    modified = make_module(3000, edited=2610)
+    diff = diff_of(original, modified)
+    # The opening quotes are outside the hunk
+    assert '"""' not in diff
+
+    html = DiffHighlighter().highlight_diff(diff, 'module.py', original, modified)
+    added = [line for line in rendered_lines(html) if line.startswith('+ ') and 'changed' in line]
+    assert len(added) == 1
+    assert 'class="sd"' in added[0] or 'class="s2"' in added[0]
+    assert 'class="k"' not in added[0]
+
+def test_lines_match_pygments_for_large_file():
+    original = make_module(2500, docstring_line=100)
+    modified = make_module(2500, docstring_line=100, edited=2400)
+    html = DiffHighlighter().highlight_diff(diff_of(original, modified), 'module.py', original, modified)
+    expected = highlight(modified, DiffHighlighter()._get_lexer_for_file('module.py'),
+                         HtmlFormatter(nowrap=True)).split('\n')
+    added = [line for line in rendered_lines(html) if line.startswith('+ ')]
+    assert added == ['+ ' + expected[2400]]
+
+def test_without_file_text_every_line_is_rendered():
+    original = make_module(3000)
+    modified = make_module(3000, edited=2610)
+    diff = diff_of(original, modified)
+
+    lines = rendered_lines(DiffHighlighter().highlight_diff(diff, 'module.py'))
+    text = [re.sub(r'<[^>]+>', '', line) for line in lines]
+    assert len(text) == len(diff.splitlines())
+    assert '+ def changed():' in text
+
+def test_huge_prefix_falls_back_to_hunks(monkeypatch):
+    monkeypatch.setattr(DiffHighlighter, 'MAX_LEX_BYTES', 1024)
+    original = make_module(3000)
+    modified = make_module(3000, edited=2610)
+    diff = diff_of(original, modified)
+
+    highlighter = DiffHighlighter()
+    assert highlighter.highlight_diff(diff, 'module.py', original, modified) == \
+        highlighter.highlight_diff(diff, 'module.py')
+
+class CountingLexer:
+    """Wraps a lexer and counts the tokens taken from it."""
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.tokens = 0
+
+    def get_tokens(self, text):
+        for token in self.lexer.get_tokens(text):
+            self.tokens += 1
+            yield token
+
+def test_iter_hunks_lexes_only_up_to_the_hunk_taken(monkeypatch):
+    lines = [f'value_{i} = {i}\n' for i in range(3000)]
+    original = ''.join(lines)
+    lines[10] = 'changed_early = 1\n'
+    lines[2900] = 'changed_late = 1\n'
+    modified = ''.join(lines)
+    diff = diff_of(original, modified)
+
+    highlighter = DiffHighlighter()
+    lexer = CountingLexer(highlighter._get_lexer_for_file('module.py'))
+    monkeypatch.setattr(highlighter, '_get_lexer_for_file', lambda filename: lexer)
+
+    hunks = highlighter.iter_hunks(diff, 'module.py', original, modified)
+    header, html = next(hunks)
+    assert header.startswith('@@ -8,')
+    assert 'changed_early' in html
+    # About 20 lines of both sides, far from the 3000 lines of each file
+    first_page_tokens = lexer.tokens
+    assert first_page_tokens < 1000
+
+    header, html = next(hunks)
+    assert 'changed_late' in html
+    assert lexer.tokens > 10 * first_page_tokens
@@ -0,0 +1,123 @@
+"""
+Line diff tests: opcodes from histogram splitting, patience anchors and
+the SequenceMatcher fallback must all be valid, turning the old lines into
+the new ones. Hunks and their formatting must match difflib's exactly for
+the same opcodes, and whole diffs must match difflib's wherever the
+alignment is unambiguous. Elsewhere the alignments may differ, since
+histogram diff anchors on rare lines.
+"""
+
+import difflib
+import random
+
+import pytest
+
+from ai_services import line_diff
+from ai_services.line_diff import diff_opcodes, diff_stats, format_unified, grouped_opcodes, unified_diff
+
+def random_pair(rng, unique=False):
+    """Return old and new lines, the new ones a few random edits away."""
+    if unique:
+        pool = [f'line {k}\n' for k in range(200)]
+        a = rng.sample(pool[:100], rng.randint(0, 40))
+        fresh = iter(pool[100:])
+    else:
+        pool = [f'l{k}\n' for k in range(rng.randint(1, 8))] + ['}\n', '\n', '    },\n']
+        a = [rng.choice(pool) for _ in range(rng.randint(0, 40))]
+    b = list(a)
+    for _ in range(rng.randint(0, 6)):
+        position = rng.randint(0, len(b))
+        edit = rng.choice(['insert', 'delete', 'replace'])
+        line = next(fresh) if unique else rng.choice(pool)
+        if edit == 'insert':
+            b.insert(position, line)
+        elif b:
+            position = min(position, len(b) - 1)
+            if edit == 'delete':
+                del b[position]
+            else:
+                b[position] = line
+    return a, b
+
+def assert_valid(a, b, codes):
+    """Check opcodes cover both sides in order, with no adjacent runs of the same kind."""
+    i = j = 0
+    previous = None
+    rebuilt = []
+    for tag, i1, i2, j1, j2 in codes:
+        assert (i1, j1) == (i, j)
+        assert tag != previous and not (tag != 'equal' and previous not in (None, 'equal'))
+        assert {'equal': i2 > i1 and a[i1:i2] == b[j1:j2],
+                'replace': i2 > i1 and j2 > j1,
+                'delete': i2 > i1 and j1 == j2,
+                'insert': i1 == i2 and j2 > j1}[tag]
+        rebuilt.extend(b[j1:j2])
+        i, j, previous = i2, j2, tag
+    assert (i, j) == (len(a), len(b))
+    assert rebuilt == b
+
+@pytest.fixture(params=['histogram', 'patience', 'matcher', 'no_anchor'])
+def strategy(request, monkeypatch):
+    """Force diff_opcodes onto one of its alignment strategies."""
+    if request.param == 'patience':
+        monkeypatch.setattr(line_diff, 'HISTOGRAM_MAX_LINES', 0)
+    elif request.param == 'matcher':
+        monkeypatch.setattr(line_diff, 'MAX_CHAIN', 0)
+    elif request.param == 'no_anchor':
+        monkeypatch.setattr(line_diff, 'MAX_CHAIN', 0)
+        monkeypatch.setattr(line_diff, 'MATCHER_MAX_CELLS', 0)
+    return request.param
+
+def test_opcodes_are_valid(strategy):
+    rng = random.Random(0)
+    for _ in range(1500):
+        a, b = random_pair(rng)
+        assert_valid(a, b, diff_opcodes(a, b, timeout=None))
+
+def test_expired_timeout_falls_back_to_patience():
+    rng = random.Random(1)
+    for _ in range(500):
+        a, b = random_pair(rng)
+        assert_valid(a, b, diff_opcodes(a, b, timeout=0))
+
+def test_hunks_and_format_match_difflib_for_the_same_opcodes():
+    rng = random.Random(2)
+    for _ in range(1500):
+        a, b = random_pair(rng)
+        for n in (0, 1, 3):
+            # get_grouped_opcodes edits the matcher's cached opcodes, so each call gets its own matcher
+            codes = difflib.SequenceMatcher(None, a, b).get_opcodes()
+            expected = difflib.SequenceMatcher(None, a, b).get_grouped_opcodes(n)
+            assert list(grouped_opcodes(codes, n)) == list(expected)
+            assert (list(format_unified(a, b, grouped_opcodes(codes, n), 'old', 'new'))
+                    == list(difflib.unified_diff(a, b, 'old', 'new', n=n)))
+
+# Without anchors or SequenceMatcher every changed region is replaced whole
+@pytest.mark.parametrize('strategy', ['histogram', 'patience', 'matcher'], indirect=True)
+def test_diff_matches_difflib_on_unique_lines(strategy):
+    rng = random.Random(3)
+    for _ in range(1500):
+        a, b = random_pair(rng, unique=True)
+        assert list(unified_diff(a, b, 'old', 'new', timeout=None)) == list(difflib.unified_diff(a, b, 'old', 'new'))
+
+def test_inserted_block_is_aligned_on_rare_lines():
+    a = ['{\n', 'alpha\n', '}\n', '{\n', 'beta\n', '}\n']
+    b = ['{\n', 'alpha\n', '}\n', '{\n', 'gamma\n', '}\n', '{\n', 'beta\n', '}\n']
+
+    codes = diff_opcodes(a, b, timeout=None)
+
+    assert_valid(a, b, codes)
+    assert [code for code in codes if code[0] != 'equal'] == [('insert', 4, 4, 4, 7)]
+
+def test_identical_and_empty_inputs():
+    assert list(unified_diff([], [])) == []
+    assert list(unified_diff(['same\n'], ['same\n'])) == []
+    assert list(unified_diff([], ['new\n'], 'old', 'new')) == ['--- old\n', '+++ new\n', '@@ -0,0 +1 @@\n', '+new\n']
+
+def test_diff_stats():
+    a = [f'{k}\n' for k in range(20)]
+    b = a[:2] + ['x\n'] + a[3:15] + a[16:] + ['y\n', 'z\n']
+
+    groups = list(grouped_opcodes(diff_opcodes(a, b)))
+
+    assert diff_stats(groups) == (2, 3, 2)
@@ -0,0 +1,80 @@
+"""
+Result pager tests: streams must be paged in order until their iterator
+is exhausted, None placeholders must never reach a page, pages must be
+returned short once the time budget runs out, only the least recently
+read streams may be evicted, and cancelled streams must be closed.
+"""
+
+from ai_services.pager import ResultPager
+
+def test_pages_until_exhausted():
+    pager = ResultPager(page_size=4)
+
+    first = pager.start(iter(range(10)))
+    second = pager.next_page(first['id'])
+    third = pager.next_page(first['id'])
+
+    assert first['items'] == [0, 1, 2, 3] and not first['done']
+    assert second['items'] == [4, 5, 6, 7] and not second['done']
+    assert third == {'id': first['id'], 'items': [8, 9], 'done': True}
+    assert pager.next_page(first['id']) == {'id': first['id'], 'items': [], 'done': True}
+
+def test_start_page_size_overrides_default():
+    pager = ResultPager(page_size=4)
+
+    page = pager.start(iter(range(10)), page_size=7)
+
+    assert page['items'] == list(range(7))
+
+def test_none_is_skipped():
+    pager = ResultPager(page_size=2)
+
+    page = pager.start(iter([None, 'a', None, None, 'b', None]))
+
+    assert page['items'] == ['a', 'b']
+    assert pager.next_page(page['id']) == {'id': page['id'], 'items': [], 'done': True}
+
+def test_budget_returns_short_pages():
+    pager = ResultPager(page_size=100, page_budget=-1)
+
+    page = pager.start(iter([None, 'a', 'b']))
+    pages = [page]
+    while not page['done']:
+        page = pager.next_page(page['id'])
+        pages.append(page)
+
+    assert [p['items'] for p in pages] == [[], ['a'], ['b'], []]
+
+def test_least_recently_read_stream_is_evicted():
+    pager = ResultPager(page_size=1, max_streams=2)
+    first = pager.start(iter(range(10)))
+    second = pager.start(iter(range(10)))
+    pager.next_page(first['id'])
+    pager.start(iter(range(10)))
+
+    assert pager.next_page(second['id']) == {'id': second['id'], 'items': [], 'done': True}
+    assert pager.next_page(first['id'])['items'] == [2]
+
+def test_unbounded_streams_are_kept():
+    pager = ResultPager(page_size=1, max_streams=None)
+
+    ids = [pager.start(iter(range(3)))['id'] for _ in range(ResultPager.MAX_STREAMS * 2)]
+
+    assert all(pager.next_page(stream_id)['items'] == [1] for stream_id in ids)
+
+def test_cancel_closes_the_iterator():
+    closed = []
+
+    def results():
+        try:
+            yield from range(10)
+        finally:
+            closed.append(True)
+
+    pager = ResultPager(page_size=2)
+    page = pager.start(results())
+    pager.cancel(page['id'])
+
+    assert closed == [True]
+    assert pager.next_page(page['id']) == {'id': page['id'], 'items': [], 'done': True}
+    pager.cancel(page['id'])
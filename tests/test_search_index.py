@@ -0,0 +1,186 @@
+"""
+Search index tests: parallel indexing must index and persist every walked
+file, even when the process pool breaks partway through the walk,
+removed files must be freed from every index array, updates of renamed and
+deleted folders must reach every file below them, cancelled builds must
+stop without dropping the files they did not reach, and embeddings must be
+encoded without blocking keyword queries.
+"""
+
+import os
+import shutil
+import threading
+import zlib
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from ai_services import search, semantic
+from ai_services.search import SearchService
+
+class BreakingPool:
+    """Runs tasks in-process and breaks on the given submit, like a crashed worker."""
+    def __init__(self, max_workers=None, break_on=3):
+        self.submits = 0
+        self.break_on = break_on
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+    def submit(self, fn, *args):
+        self.submits += 1
+        if self.submits >= self.break_on:
+            raise BrokenProcessPool('worker died')
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+def make_workspace(root, count):
+    for i in range(count):
+        with open(os.path.join(root, f'module_{i}.py'), 'w') as f:
+            f.write(f'def handler_{i}(request):\n    return unique_term_{i}\n')
+
+@pytest.fixture
+def service():
+    service = SearchService(workers=2)
+    service.PARALLEL_MIN_FILES = 4
+    service.PARALLEL_BATCH_SIZE = 2
+    return service
+
+def test_broken_pool_indexes_every_walked_file(tmp_path, monkeypatch, service):
+    make_workspace(str(tmp_path), 20)
+    monkeypatch.setattr(search, 'ProcessPoolExecutor', BreakingPool)
+
+    stats = service.index_workspace(str(tmp_path))
+
+    assert stats == {'indexed': 20, 'unchanged': 0, 'removed': 0}
+    assert len(service.documents) == 20
+    assert service.search('unique_term_17', mode='keyword')[0][0] == 'module_17.py'
+
+def test_broken_pool_persists_every_walked_file(tmp_path, monkeypatch, service):
+    make_workspace(str(tmp_path), 20)
+    monkeypatch.setattr(search, 'ProcessPoolExecutor', BreakingPool)
+    service.index_workspace(str(tmp_path))
+    service.store.close()
+
+    reloaded = SearchService(workers=1)
+    stats = reloaded.index_workspace(str(tmp_path))
+
+    assert stats == {'indexed': 0, 'unchanged': 20, 'removed': 0}
+    assert len(reloaded.documents) == 20
+
+def test_compaction_frees_removed_files(tmp_path):
+    make_workspace(str(tmp_path), 20)
+    service = SearchService(persist=False, workers=1)
+    service.index_workspace(str(tmp_path))
+    for i in range(12):
+        os.remove(os.path.join(str(tmp_path), f'module_{i}.py'))
+    with open(os.path.join(str(tmp_path), 'module_15.py'), 'a') as f:
+        f.write('def edited(): return edited_term\n')
+
+    service.update_paths([f'module_{i}.py' for i in range(12)] + ['module_15.py'])
+
+    assert len(service.doc_paths) == len(service.file_index.lengths) < 20
+    assert len(service.chunk_docs) == len(service.chunk_index.lengths) == len(service.chunk_names)
+    for i in range(12, 20):
+        assert service.search(f'unique_term_{i}', mode='keyword')[0][0] == f'module_{i}.py'
+        path, start, end, _ = service.search_chunks(f'handler_{i}')[0]
+        assert path == f'module_{i}.py' and start == 1
+    assert service.search('edited_term', mode='keyword')[0][0] == 'module_15.py'
+    assert service.search('unique_term_3', mode='keyword') == []
+
+def test_update_paths_follows_folder_rename_and_delete(tmp_path):
+    os.makedirs(os.path.join(str(tmp_path), 'pkg', 'sub'))
+    make_workspace(os.path.join(str(tmp_path), 'pkg'), 3)
+    make_workspace(os.path.join(str(tmp_path), 'pkg', 'sub'), 2)
+    service = SearchService(persist=False, workers=1)
+    service.index_workspace(str(tmp_path))
+    assert len(service.documents) == 5
+
+    os.rename(os.path.join(str(tmp_path), 'pkg'), os.path.join(str(tmp_path), 'lib'))
+    stats = service.update_paths(['pkg', 'lib'])
+
+    assert stats == {'indexed': 5, 'unchanged': 0, 'removed': 5}
+    assert sorted(service.documents) == ['lib/module_0.py', 'lib/module_1.py', 'lib/module_2.py',
+                                         'lib/sub/module_0.py', 'lib/sub/module_1.py']
+    assert service.search('unique_term_2', mode='keyword')[0][0] == 'lib/module_2.py'
+
+    shutil.rmtree(os.path.join(str(tmp_path), 'lib', 'sub'))
+    assert service.update_paths(['lib/sub'])['removed'] == 2
+    os.remove(os.path.join(str(tmp_path), 'lib', 'module_0.py'))
+    assert service.update_paths(['lib/module_0.py'])['removed'] == 1
+    assert sorted(service.documents) == ['lib/module_1.py', 'lib/module_2.py']
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_cancel_stops_the_build_between_files(tmp_path, monkeypatch, service, workers):
+    make_workspace(str(tmp_path), 20)
+    monkeypatch.setattr(search, 'ProcessPoolExecutor', lambda max_workers: BreakingPool(break_on=100))
+    reports = []
+
+    def progress(done, total):
+        reports.append(done)
+        service.cancel()
+
+    stats = service.index_workspace(str(tmp_path), workers=workers, progress=progress)
+
+    assert reports == [2]
+    assert stats['indexed'] == len(service.documents) < 20
+    assert stats['removed'] == 0
+
+def test_cancelled_rebuild_keeps_stored_files(tmp_path, service):
+    make_workspace(str(tmp_path), 20)
+    service.index_workspace(str(tmp_path), workers=1)
+    service.store.close()
+
+    reloaded = SearchService(workers=1)
+    reloaded.cancel()
+    stats = reloaded.index_workspace(str(tmp_path))
+
+    assert stats == {'indexed': 0, 'unchanged': 0, 'removed': 0}
+    assert len(reloaded.documents) == 20
+
+class FakeEncoder:
+    """Embeds text by hashing its words; calls on_encode while encoding files."""
+    def __init__(self, model_name, on_encode=None):
+        self.on_encode = on_encode
+
+    def encode(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), 256), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.split():
+                vectors[row, zlib.crc32(word.encode()) % 256] += 1.0
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+        if self.on_encode is not None and kwargs.get('batch_size'):
+            self.on_encode()
+        return vectors
+
+def test_keyword_queries_run_while_embeddings_encode(tmp_path, monkeypatch):
+    make_workspace(str(tmp_path), 8)
+    keyword_results = []
+
+    def keyword_query():
+        # Runs on another thread and would deadlock if the encode held the index lock
+        worker = threading.Thread(
+            target=lambda: keyword_results.append(service.search('unique_term_3', mode='keyword')))
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+
+    monkeypatch.setattr(semantic, 'SentenceTransformer',
+                        lambda name: FakeEncoder(name, on_encode=keyword_query))
+    service = SearchService(persist=False, workers=1, semantic=True)
+    service.index_workspace(str(tmp_path))
+
+    results = service.search('handler_5 request unique_term_5', mode='semantic')
+
+    assert keyword_results[0][0][0] == 'module_3.py'
+    assert results[0][0] == 'module_5.py'
+    assert len(service.semantic_index.file_chunks) == 8
@@ -0,0 +1,175 @@
+"""
+Trigram index tests: substring and regex searches over paths and contents
+must find exactly what a brute-force scan of the workspace finds, whether
+postings are still pending or already merged, and updates after deleted,
+renamed and edited files and folders must leave no stale matches behind.
+"""
+
+import os
+import random
+import re
+import shutil
+
+import pytest
+
+from ai_services.trigram_index import TrigramIndex, TrigramPostings
+
+WORDS = ['alpha', 'beta', 'gamma', 'Delta', 'abc', 'ABD', 'cab', 'bad_cab', 'x1', 'y22', 'a.b']
+REGEX_PIECES = ['ab', 'ca', 'Del', 'ta', '.', '[ab]', '(ab|ga)', 'm?', 'a+', r'\d', '^', '$',
+                '(?:ab)+', 'a{2}', r'\w*', ' ', '_c', 'b.d', '(bad|ma)',
+                '(?:beta )?', '(gamma)*', 'cab{0,2}']
+
+def make_workspace(root, count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        folder = os.path.join(root, rng.choice(['', 'src', 'src/alpha', 'docs', 'tests/gamma']))
+        os.makedirs(folder, exist_ok=True)
+        name = f'{rng.choice(WORDS)}_{i}.{rng.choice(["py", "txt", "md"])}'
+        lines = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 6)))
+                 for _ in range(rng.randint(0, 8))]
+        with open(os.path.join(folder, name), 'w', newline='') as f:
+            f.write(rng.choice(['\n', '\r\n']).join(lines))
+
+def brute_force(root, query, content=False, regex=False):
+    """Scan every file the slow way, keeping the first match on each line."""
+    pattern = re.compile(query if regex else re.escape(query), re.IGNORECASE | re.MULTILINE)
+    found = set()
+    for directory, _, files in os.walk(root):
+        for name in files:
+            full_path = os.path.join(directory, name)
+            rel_path = os.path.relpath(full_path, root).replace(os.sep, '/')
+            if not content:
+                if pattern.search(rel_path):
+                    found.add(rel_path)
+                continue
+            with open(full_path, 'rb') as f:
+                text = f.read().decode('utf-8')
+            lines = set()
+            for match in pattern.finditer(text):
+                line_start = text.rfind('\n', 0, match.start()) + 1
+                line = text.count('\n', 0, match.start()) + 1
+                if line not in lines:
+                    lines.add(line)
+                    found.add((rel_path, line, match.start() - line_start))
+    return found
+
+def indexed(index, query, content=False, regex=False):
+    results = [r for r in index.search(query, content=content, regex=regex) if r is not None]
+    if content:
+        return {(r['path'], r['line'], r['column']) for r in results}
+    return {r['path'] for r in results}
+
+def random_queries(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        text = ' '.join(WORDS)
+        start = rng.randrange(len(text))
+        yield text[start:start + rng.randint(1, 6)], False
+        yield ''.join(rng.choice(REGEX_PIECES) for _ in range(rng.randint(1, 4))), True
+
+@pytest.fixture(params=['pending', 'merged'])
+def merge_threshold(request, monkeypatch):
+    # A zero threshold merges after every update, so both posting paths are searched
+    if request.param == 'merged':
+        monkeypatch.setattr(TrigramPostings, 'MERGE_THRESHOLD', 0)
+    return request.param
+
+def assert_matches_brute_force(index, root, seed):
+    for query, regex in random_queries(seed, 60):
+        for content in (False, True):
+            assert indexed(index, query, content, regex) == brute_force(root, query, content, regex), \
+                (query, regex, content)
+
+def test_search_matches_brute_force(tmp_path, merge_threshold):
+    make_workspace(str(tmp_path), 80)
+    index = TrigramIndex(str(tmp_path))
+    index.build()
+
+    assert index.ready
+    assert len(index) == 80
+    assert_matches_brute_force(index, str(tmp_path), seed=1)
+
+def test_candidates_are_narrowed_by_trigrams(tmp_path):
+    make_workspace(str(tmp_path), 80)
+    with open(os.path.join(str(tmp_path), 'needle.txt'), 'w') as f:
+        f.write('only here: zebra_quokka\n')
+    index = TrigramIndex(str(tmp_path))
+    index.build()
+
+    results = list(index.search('ZEBRA_quokka', content=True))
+
+    assert results == [{'name': 'needle.txt', 'path': 'needle.txt', 'line': 1, 'column': 11,
+                        'text': 'only here: zebra_quokka'}]
+
+def test_update_after_file_delete_and_rename(tmp_path, merge_threshold):
+    root = str(tmp_path)
+    make_workspace(root, 40)
+    index = TrigramIndex(root)
+    index.build()
+    deleted, renamed = sorted(index.doc_ids)[:2]
+
+    os.remove(os.path.join(root, deleted))
+    os.rename(os.path.join(root, renamed), os.path.join(root, 'docs', 'moved_gamma.txt'))
+    index.update_paths([os.path.join(root, deleted), renamed, 'docs/moved_gamma.txt'])
+
+    assert len(index) == 39
+    assert indexed(index, 'moved_gamma') == {'docs/moved_gamma.txt'}
+    assert_matches_brute_force(index, root, seed=2)
+
+def test_update_after_folder_delete_and_rename(tmp_path, merge_threshold):
+    root = str(tmp_path)
+    make_workspace(root, 60)
+    index = TrigramIndex(root)
+    index.build()
+
+    shutil.rmtree(os.path.join(root, 'tests'))
+    os.rename(os.path.join(root, 'src'), os.path.join(root, 'lib'))
+    index.update_paths(['tests', 'src', 'lib'])
+
+    assert not indexed(index, 'src/') and not indexed(index, 'tests/')
+    assert all(not path.startswith(('src/', 'tests/')) for path in index.doc_ids)
+    assert_matches_brute_force(index, root, seed=3)
+
+def test_update_after_edit_and_create(tmp_path, merge_threshold):
+    root = str(tmp_path)
+    make_workspace(root, 20)
+    index = TrigramIndex(root)
+    index.build()
+    edited = os.path.join(root, 'docs', 'notes.md')
+    os.makedirs(os.path.dirname(edited), exist_ok=True)
+    with open(edited, 'w') as f:
+        f.write('first draft\n')
+    index.update_paths([edited])
+
+    with open(edited, 'w') as f:
+        f.write('final wording\n')
+    index.update_paths([edited])
+
+    assert not indexed(index, 'draft', content=True)
+    assert indexed(index, 'final', content=True) == {('docs/notes.md', 1, 0)}
+    assert_matches_brute_force(index, root, seed=4)
+
+def test_ignored_and_binary_files_are_not_indexed(tmp_path):
+    root = str(tmp_path)
+    with open(os.path.join(root, '.gitignore'), 'w') as f:
+        f.write('build/\n')
+    os.makedirs(os.path.join(root, 'build'))
+    with open(os.path.join(root, 'build', 'out.txt'), 'w') as f:
+        f.write('needle\n')
+    with open(os.path.join(root, 'blob.bin'), 'wb') as f:
+        f.write(b'needle\0\0')
+    with open(os.path.join(root, 'keep.txt'), 'w') as f:
+        f.write('needle\n')
+    index = TrigramIndex(root)
+    index.build()
+
+    index.update_paths(['build/out.txt', 'blob.bin'])
+
+    assert indexed(index, 'needle', content=True) == {('keep.txt', 1, 0)}
+
+def test_invalid_regex_raises(tmp_path):
+    index = TrigramIndex(str(tmp_path))
+    index.build()
+
+    with pytest.raises(re.error):
+        index.search('(unclosed', regex=True)
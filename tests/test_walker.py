@@ -0,0 +1,130 @@
+"""
+Workspace walker tests: walks must skip the built-in ignores and follow
+.gitignore and .nakulignore rules the way git does, with nested files
+applying only below their own directory, anchored, directory-only,
+negated and ** patterns, and no re-inclusion inside an ignored directory.
+Oversized, binary and filtered files must be skipped, and walks of a
+subdirectory must stay below it.
+"""
+
+import os
+
+import pytest
+
+from ai_services.walker import IgnoreRules, WorkspaceWalker
+
+def write(root, rel_path, content='x\n'):
+    path = os.path.join(root, *rel_path.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb' if isinstance(content, bytes) else 'w') as f:
+        f.write(content)
+
+def walked(walker, rel_dir=''):
+    return sorted(entry.rel_path.replace(os.sep, '/') for entry in walker.walk(rel_dir))
+
+def make_workspace(root, files, ignores=None):
+    for rel_path in files:
+        write(root, rel_path)
+    for rel_path, lines in (ignores or {}).items():
+        write(root, rel_path, '\n'.join(lines) + '\n')
+
+def test_default_ignores(tmp_path):
+    make_workspace(str(tmp_path), [
+        'main.py', 'pkg/module.py', 'pkg/module.pyc', 'node_modules/lib/index.js',
+        '.git/config', 'pkg/__pycache__/module.cpython-311.pyc', 'venv/bin/python',
+        'web/node_modules/dep.js', '.nakul/index.db'
+    ])
+
+    assert walked(WorkspaceWalker(str(tmp_path))) == ['main.py', 'pkg/module.py']
+
+@pytest.mark.parametrize('ignore_file', ['.gitignore', '.nakulignore'])
+def test_root_ignore_file(tmp_path, ignore_file):
+    make_workspace(str(tmp_path), [
+        'app.py', 'debug.log', 'logs/important.log', 'logs/other.log', 'build/out.js',
+        'src/build/gen.py', 'dist/bundle.js', 'src/dist/keep.js', 'docs/a/b/notes.tmp',
+        'src/build.py'
+    ], {ignore_file: ['# comment', '', '*.log', '!logs/important.log', 'build/', '/dist',
+                      'docs/**/*.tmp']})
+
+    assert walked(WorkspaceWalker(str(tmp_path))) == sorted([
+        ignore_file, 'app.py', 'logs/important.log', 'src/build.py', 'src/dist/keep.js'
+    ])
+
+def test_nested_gitignore_applies_below_its_directory(tmp_path):
+    make_workspace(str(tmp_path), [
+        'data.json', 'web/data.json', 'web/static/data.json', 'web/app.js', 'api/data.json',
+        'web/gen/out.js', 'gen/out.js'
+    ], {'web/.gitignore': ['*.json', '/gen/']})
+
+    assert walked(WorkspaceWalker(str(tmp_path))) == sorted([
+        'api/data.json', 'data.json', 'gen/out.js', 'web/.gitignore', 'web/app.js'
+    ])
+
+def test_nested_negation_overrides_parent(tmp_path):
+    make_workspace(str(tmp_path), ['a.log', 'keep/a.log', 'keep/b.log'],
+                   {'.gitignore': ['*.log'], 'keep/.gitignore': ['!a.log']})
+
+    assert walked(WorkspaceWalker(str(tmp_path))) == ['.gitignore', 'keep/.gitignore', 'keep/a.log']
+
+def test_ignored_directory_cannot_be_reincluded(tmp_path):
+    make_workspace(str(tmp_path), ['out/keep.txt', 'out/drop.txt'],
+                   {'.gitignore': ['out/', '!out/keep.txt']})
+    walker = WorkspaceWalker(str(tmp_path))
+
+    assert walked(walker) == ['.gitignore']
+    assert walker.is_ignored('out/keep.txt', False)
+    assert walker.is_ignored('out/keep.txt', False, check_parents=False) is False
+
+def test_directory_only_pattern_skips_files(tmp_path):
+    make_workspace(str(tmp_path), ['cache', 'sub/cache/x.txt'], {'.gitignore': ['cache/']})
+
+    assert walked(WorkspaceWalker(str(tmp_path))) == ['.gitignore', 'cache']
+
+def test_size_binary_and_name_filters(tmp_path):
+    root = str(tmp_path)
+    write(root, 'small.py', 'print(1)\n')
+    write(root, 'large.js', 'x' * 2048)
+    write(root, 'image.png', b'\x89PNG\r\n\x1a\n\0\0')
+    write(root, 'notes.md', '# notes\n')
+
+    assert walked(WorkspaceWalker(root, max_file_size=1024)) == ['notes.md', 'small.py']
+    assert walked(WorkspaceWalker(root, max_file_size=None, skip_binary=False)) == [
+        'image.png', 'large.js', 'notes.md', 'small.py'
+    ]
+    assert walked(WorkspaceWalker(root, file_filter=lambda name: name.endswith('.py'))) == ['small.py']
+
+def test_walk_below_a_directory(tmp_path):
+    make_workspace(str(tmp_path), ['top.py', 'src/a.py', 'src/deep/b.py', 'src/deep/skip.tmp'],
+                   {'src/.gitignore': ['*.tmp']})
+    walker = WorkspaceWalker(str(tmp_path))
+
+    assert walked(walker, 'src/deep') == ['src/deep/b.py']
+    assert walked(walker, 'src') == ['src/.gitignore', 'src/a.py', 'src/deep/b.py']
+
+def test_walk_is_lazy(tmp_path):
+    make_workspace(str(tmp_path), [f'dir_{i}/file.py' for i in range(5)])
+    walker = WorkspaceWalker(str(tmp_path))
+    listed = []
+    list_dir = walker.list_dir
+    walker.list_dir = lambda rel_dir='': listed.append(rel_dir) or list_dir(rel_dir)
+
+    next(walker.walk())
+
+    assert len(listed) == 2
+
+@pytest.mark.parametrize('pattern, path, ignored', [
+    ('*.py', 'a/b/c.py', True),
+    ('a/*.py', 'a/b/c.py', False),
+    ('a/**/c.py', 'a/c.py', True),
+    ('a/**/c.py', 'a/x/y/c.py', True),
+    ('**/c.py', 'c.py', True),
+    ('file?.txt', 'file1.txt', True),
+    ('file?.txt', 'file10.txt', False),
+    ('[!a]*.txt', 'b.txt', True),
+    ('[!a]*.txt', 'a.txt', False),
+    ('\\#hash', '#hash', True),
+    ('\\!bang', '!bang', True),
+    ('trailing   ', 'trailing', True),
+])
+def test_glob_translation(pattern, path, ignored):
+    assert IgnoreRules('', [pattern]).match(path, False) is (True if ignored else None)
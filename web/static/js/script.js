@@ -528,6 +528,12 @@ function updateStatusBar(message) {
         `<span><i class="fas fa-check-circle"></i> ${message}</span>`;
 }
 
+// Called from Python while the workspace is indexed in the background
+function updateIndexProgress(done, total) {
+    updateStatusBar(done < total ? `Indexing workspace... ${done}/${total} files` : `Indexed ${total} files`);
+}
+eel.expose(updateIndexProgress);
+
 // AI Panel
 function toggleAIPanel() {
     const panel = document.querySelector('.ai-panel');
@@ -565,6 +571,8 @@ function switchPanel(panelName) {
 
 // Search functionality
 let searchTimeout = null;
+// Bumped on every new query so pages of an older search are discarded
+let searchGeneration = 0;
 async function handleSearch(query) {
     if (!state.workspace) return;
     
@@ -572,22 +580,58 @@ async function handleSearch(query) {
         clearTimeout(searchTimeout);
     }
     
-    searchTimeout = setTimeout(async () => {
-        const results = await eel.search_files(query)();
-        displaySearchResults(results);
-    }, 300);
+    searchTimeout = setTimeout(() => runSearch(query), 100);
 }
 
-function displaySearchResults(results) {
-    const container = document.getElementById('search-results');
-    container.innerHTML = '';
+async function runSearch(query) {
+    const generation = ++searchGeneration;
+    const content = document.getElementById('search-content').checked;
+    const regex = document.getElementById('search-regex').checked;
     
-    if (!results || results.length === 0) {
+    let page = await eel.search_files(query, content, regex)();
+    if (generation !== searchGeneration) {
+        if (page.id) eel.cancel_search(page.id)();
+        return;
+    }
+    displaySearchResults(page, true);
+    
+    // Keep fetching pages while this is still the latest query
+    while (!page.done) {
+        page = await eel.search_files_page(page.id)();
+        if (generation !== searchGeneration) {
+            if (!page.done) eel.cancel_search(page.id)();
+            return;
+        }
+        displaySearchResults(page, false);
+    }
+    
+    const container = document.getElementById('search-results');
+    if (!container.querySelector('.search-result-item')) {
         container.innerHTML = '<div class="search-result-item">No results found</div>';
+    }
+}
+
+function displaySearchResults(page, reset) {
+    const container = document.getElementById('search-results');
+    if (reset) {
+        container.innerHTML = '';
+        if (page.indexing) {
+            const note = document.createElement('div');
+            note.className = 'search-indexing';
+            note.textContent = 'Indexing workspace, results may be incomplete';
+            container.appendChild(note);
+        }
+    }
+    
+    if (page.error) {
+        const error = document.createElement('div');
+        error.className = 'search-result-item';
+        error.textContent = page.error;
+        container.appendChild(error);
         return;
     }
     
-    results.forEach(result => {
+    page.items.forEach(result => {
         const item = document.createElement('div');
         item.className = 'search-result-item';
         
@@ -595,14 +639,27 @@ function displaySearchResults(results) {
         icon.className = 'fas fa-file-code';
         
         const content = document.createElement('div');
-        content.innerHTML = `
-            ${result.name}
-            <div class="search-result-path">${result.path}</div>
-        `;
+        const path = document.createElement('div');
+        path.className = 'search-result-path';
+        path.textContent = result.line ? `${result.path}:${result.line}` : result.path;
+        content.append(result.name, path);
+        if (result.text !== undefined) {
+            const line = document.createElement('div');
+            line.className = 'search-result-line';
+            line.textContent = result.text.trim();
+            content.appendChild(line);
+        }
         
         item.appendChild(icon);
         item.appendChild(content);
-        item.addEventListener('click', () => openFile(result.path));
+        item.addEventListener('click', async () => {
+            await openFile(result.path);
+            if (result.line) {
+                editor.setCursor({ line: result.line - 1, ch: result.column });
+                editor.scrollIntoView(null, 100);
+                editor.focus();
+            }
+        });
         
         container.appendChild(item);
     });
@@ -721,6 +778,12 @@ document.getElementById('search-input').addEventListener('input', (e) => {
     handleSearch(e.target.value);
 });
 
+['search-content', 'search-regex'].forEach(id => {
+    document.getElementById(id).addEventListener('change', () => {
+        handleSearch(document.getElementById('search-input').value);
+    });
+});
+
 // Initialize
 editor.on('change', () => {
     if (state.currentFile) {
@@ -1587,7 +1650,16 @@ document.addEventListener('DOMContentLoaded', () => {
 });
 
 // Diff View Management
+// Open hunk streams of the diff view, cancelled when the view is replaced
+const diffStreams = new Set();
+
+function cancelDiffStreams() {
+    diffStreams.forEach(id => eel.cancel_diff_hunks(id)());
+    diffStreams.clear();
+}
+
 function showDiffView(changes) {
+    cancelDiffStreams();
     const buildTab = document.getElementById('build-tab');
     buildTab.innerHTML = `
         <div class="diff-view">
@@ -1613,6 +1685,11 @@ function showDiffView(changes) {
         diffContainer.innerHTML = `
             <div class="diff-file-header">
                 <span class="diff-file-name">${change.file_path}</span>
+                <span class="diff-file-stats">
+                    <span class="diff-stat-add">+${change.added}</span>
+                    <span class="diff-stat-remove">-${change.removed}</span>
+                    ${change.hunks} ${change.hunks === 1 ? 'hunk' : 'hunks'}
+                </span>
                 <div class="diff-file-actions">
                     <button class="diff-action-btn accept" data-index="${index}">
                         <i class="fas fa-check"></i> Accept
@@ -1622,15 +1699,20 @@ function showDiffView(changes) {
                     </button>
                 </div>
             </div>
-            <div class="diff-content syntax-highlighted"></div>
+            <div class="diff-content syntax-highlighted" style="display: none;"></div>
         `;
         
+        // Hunks are only fetched once the file is expanded
         const diffContent = diffContainer.querySelector('.diff-content');
-        // The diff is now HTML with syntax highlighting
-        diffContent.innerHTML = change.diff;
+        diffContainer.querySelector('.diff-file-name').addEventListener('click', () => {
+            toggleDiffFile(change.file_path, diffContent);
+        });
         
         diffFiles.appendChild(diffContainer);
     });
+    if (changes.length) {
+        toggleDiffFile(changes[0].file_path, diffFiles.querySelector('.diff-content'));
+    }
     
     // Add event listeners
     document.getElementById('accept-all').addEventListener('click', acceptAllChanges);
@@ -1649,6 +1731,58 @@ function showDiffView(changes) {
     });
 }
 
+function toggleDiffFile(filePath, diffContent) {
+    const expanded = diffContent.style.display !== 'none';
+    diffContent.style.display = expanded ? 'none' : 'block';
+    if (!expanded && !diffContent.dataset.loaded) {
+        diffContent.dataset.loaded = 'true';
+        loadDiffHunks(filePath, diffContent);
+    }
+}
+
+async function loadDiffHunks(filePath, diffContent) {
+    // Marks the end of the loaded hunks; the next page is fetched when it scrolls into view
+    const more = document.createElement('div');
+    more.className = 'diff-more';
+    more.textContent = 'Loading hunks...';
+    diffContent.appendChild(more);
+    
+    let page = await eel.get_diff_hunks(filePath)();
+    const streamId = page.id;
+    if (!page.done) diffStreams.add(streamId);
+    while (true) {
+        // The view was replaced while the page loaded
+        if (!diffContent.isConnected) {
+            if (!page.done) eel.cancel_diff_hunks(streamId)();
+            diffStreams.delete(streamId);
+            return;
+        }
+        page.items.forEach(hunk => more.insertAdjacentHTML('beforebegin', hunk.html));
+        if (page.error) {
+            more.textContent = page.error;
+            return;
+        }
+        if (page.done) break;
+        await whenVisible(more);
+        if (!diffStreams.has(streamId)) return;
+        page = await eel.get_diff_hunks_page(streamId)();
+    }
+    diffStreams.delete(streamId);
+    more.remove();
+}
+
+function whenVisible(element) {
+    return new Promise(resolve => {
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                observer.disconnect();
+                resolve();
+            }
+        });
+        observer.observe(element);
+    });
+}
+
 async function acceptAllChanges() {
     await eel.accept_all_changes()();
     await applyAcceptedChanges();
@@ -1680,6 +1814,7 @@ async function applyAcceptedChanges() {
 }
 
 function resetBuildTab() {
+    cancelDiffStreams();
     const buildTab = document.getElementById('build-tab');
     buildTab.innerHTML = `
         <div class="build-content">
@@ -1767,6 +1902,10 @@ async function handleBuildPrompt() {
         const messages = document.getElementById('build-messages');
         messages.removeChild(messages.lastChild);
         
+        if (response.indexing) {
+            addBuildMessage('The workspace is still being indexed, so some files may have been missed.', 'assistant');
+        }
+        
         // Show response
         if (response.changes) {
             showDiffView(response.changes);